@@ -0,0 +1,97 @@
+import io
+import os
+import sys
+import time
+import numpy as np
+from slay.chunk_codec import CODECS
+from slay.measurement_loader import MeasurementLoader
+
+# Vergleicht die Codecs der ChunkStore (siehe SAVE_CODEC) mit np.savez_compressed, wie Measurement.save ohne Chunks:
+#   python benchmark_codecs.py [<messung.npz> ...]
+# Ohne Angabe alle Messungen in messungen/, gibt es dort keine, ein künstliches Spektrum mit Rauschen.
+
+CHUNK_SIZE = 256
+
+
+def measurement_paths():
+    if len(sys.argv) > 1:
+        return sys.argv[1:]
+    measurements_dir = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "messungen/"
+    )
+    paths = []
+    for root, _, files in os.walk(measurements_dir):
+        for file_name in sorted(files):
+            if file_name.endswith(".npz") and not file_name.endswith("-stats.npz"):
+                paths.append(os.path.join(root, file_name))
+    return paths
+
+
+def synthetic():
+    rng = np.random.default_rng(0)
+    spectrum = 1000 + 500 * np.sin(np.linspace(0, 20, 2048))
+    return np.rint(spectrum + rng.normal(0, 5, size=(4, 500, 2048)))
+
+
+def benchmark(spectra):
+    """Größe (Bytes), Zeit zum Schreiben und Lesen (s) pro Verfahren."""
+    results = {}
+
+    buffer = io.BytesIO()
+    start_time = time.perf_counter()
+    np.savez_compressed(buffer, spectra)
+    save_time = time.perf_counter() - start_time
+    buffer.seek(0)
+    start_time = time.perf_counter()
+    np.load(buffer)["arr_0"]
+    results["npz"] = (buffer.getbuffer().nbytes, save_time, time.perf_counter() - start_time)
+
+    rows = spectra.reshape(-1, spectra.shape[-1])
+    for name, codec in CODECS.items():
+        start_time = time.perf_counter()
+        chunks = [
+            codec.encode(rows[start : start + CHUNK_SIZE])
+            for start in range(0, len(rows), CHUNK_SIZE)
+        ]
+        save_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        decoded = np.concatenate(
+            [
+                codec.decode(chunk, (len(rows[start : start + CHUNK_SIZE]), rows.shape[1]), rows.dtype)
+                for start, chunk in zip(range(0, len(rows), CHUNK_SIZE), chunks)
+            ]
+        )
+        load_time = time.perf_counter() - start_time
+        assert np.array_equal(decoded, rows, equal_nan=True), f"{name} is not lossless"
+        results[name] = (sum(len(chunk) for chunk in chunks), save_time, load_time)
+    return results
+
+
+def print_results(title, raw_size, results):
+    print(f"{title} ({raw_size / 2**20:.1f} MiB raw)")
+    npz_size = results["npz"][0]
+    for name, (size, save_time, load_time) in results.items():
+        print(
+            f"  {name:15s} {size / 2**20:8.2f} MiB  {size / npz_size:7.1%} of npz  "
+            f"save {save_time:6.2f} s  load {load_time:6.2f} s"
+        )
+
+
+if __name__ == "__main__":
+
+    paths = measurement_paths()
+    totals = {}
+    raw_total = 0
+    if paths:
+        for path in paths:
+            spectra = MeasurementLoader(path).read()
+            results = benchmark(spectra)
+            print_results(os.path.basename(path), spectra.nbytes, results)
+            raw_total += spectra.nbytes
+            for name, values in results.items():
+                totals[name] = np.add(totals.get(name, 0), values)
+        if len(paths) > 1:
+            print_results(f"all {len(paths)} measurements", raw_total, totals)
+    else:
+        spectra = synthetic()
+        print_results("synthetic", spectra.nbytes, benchmark(spectra))
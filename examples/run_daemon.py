@@ -0,0 +1,45 @@
+import os
+import sys
+from appdirs import user_cache_dir
+from slay.measurement import Measurement
+from slay.settings import MeasurementSettings
+from slay.daemon import MeasurementDaemon
+
+# wie run_measurement.py: <serial> <nkt> <ltb> <cam> <cache dir> (jeweils "none" für nicht vorhanden),
+# dazu die Einstellungen der ersten Messung als JSON (z. B. die .json einer früheren Messung)
+#
+# Clients (Skripte, Notebooks) messen dann ohne eigene Initialisierung:
+#   from slay.daemon import DaemonClient
+#   client = DaemonClient(<socket path>)
+#   client.run(MeasurementSettings.from_json("messung.json"))
+#   for spectrum in client.stream(): ...
+
+paths = [None if arg == "none" else arg for arg in sys.argv[1:6]]
+paths += [None] * (5 - len(paths))
+SERIAL_PATH, NKT_PATH, LTB_PATH, CAM_PATH, CACHE_DIR = (path or "" for path in paths)
+
+if __name__ == "__main__":
+
+    if len(sys.argv) < 7:
+        print("usage: run_daemon.py <serial> <nkt> <ltb> <cam> <cache dir> <settings.json>")
+        sys.exit(1)
+
+    measurement_settings = MeasurementSettings.from_json(sys.argv[6])
+
+    measurements_dir = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "messungen/"
+    )
+
+    measurement = Measurement(
+        SERIAL_PATH,
+        NKT_PATH,
+        LTB_PATH,
+        CAM_PATH,
+        CACHE_DIR,
+        measurement_settings,
+        measurements_dir,
+    )
+
+    # im Cache-Ordner, damit der Socket bei Docker auch außerhalb des Containers erreichbar ist (der Ordner ist gemountet)
+    socket_path = os.path.join(CACHE_DIR or user_cache_dir("slay"), "slay.sock")
+    MeasurementDaemon(measurement, socket_path).serve_forever()
@@ -110,8 +110,16 @@ if __name__ == "__main__":
     # exit()
 
     try:
-        # aktuell kann man danach keine neue Messungg starten/muss ein neues Objekt initialisieren
+        # measure trennt danach die Geräte. Für mehrere Messungen nacheinander ohne neues Verbinden:
+        # from slay.measurement_session import MeasurementSession
+        # session = MeasurementSession(measurement)
+        # session.submit(measurement_settings)
+        # session.submit(<weitere MeasurementSettings>)
+        # session.run()
+        # session.close()
         measurement.measure()
+        # eine abgebrochene Messung aus dem Backup im Cache fortsetzen (gleiche Settings nötig):
+        # measurement.measure(resume_from=os.path.join(CACHE_DIR, "<name der Messung>.chunks"))
         measurement.save()
     except KeyboardInterrupt as e:
         print(e)
@@ -52,14 +52,37 @@ uint16_t MAX_DUTY_VAL_NITRO = (uint16_t)(pow(2, PWM_RES_BITS_NITRO) - 1);
 #define SERIAL_DATA_LENGTH 18
 // SERIAL_DATA_LENGTH - SERIAL_DATA_PREFIX_LENGTH ist demnach die maximal mögliche Anzahl an Ziffern
 #define SERIAL_DATA_PREFIX_LENGTH 7
+// Modus 5: mehrere Name=Wert-Paare, durch Kommas getrennt
+#define MAX_BATCH_VARIABLES 16
+#define BATCH_DATA_LENGTH (MAX_BATCH_VARIABLES * SERIAL_DATA_LENGTH)
+// Binärprotokoll (siehe slay/mcu_protocol.py): SOF | Typ | ID | Länge | Payload | Checksumme (Summe über Typ bis Payload)
+// Die Firmware antwortet auf jeden Frame mit einem ACK oder NACK mit der gleichen ID.
+#define FRAME_SOF 0xA5
+#define FRAME_VAR_NAME_LENGTH 6
+#define FRAME_VAR_LENGTH (FRAME_VAR_NAME_LENGTH + 4)
+#define FRAME_MAX_PAYLOAD (MAX_BATCH_VARIABLES * FRAME_VAR_LENGTH)
+#define FRAME_SET_VAR 0x01
+#define FRAME_SET_VARS 0x06
+#define FRAME_LASER_OFF 0x02
+#define FRAME_LASER_ON 0x03
+#define FRAME_START_SCHEDULE 0x05
+// Payload: ein Byte, FRAME_SESSION_BINARY oder FRAME_SESSION_TEXT. Sendet der Host zu Beginn jeder Sitzung
+// (der MCU wird beim Öffnen des Ports nicht zurückgesetzt)
+#define FRAME_SESSION 0x07
+#define FRAME_SESSION_TEXT 0
+#define FRAME_SESSION_BINARY 1
+#define FRAME_ACK 0x80
+#define FRAME_NACK 0x81
 #define POT_PIN 0
 #define POTI_SAMPLE_COUNT 51
 int potiReadings[POTI_SAMPLE_COUNT];
 
-// 0: Laser aus
+// 0: Laser aus (bricht auch eine laufende Pulsfolge ab)
 // 1: Laser an
 // 2: Es wird auf Daten zum setzen von Parametern gewartet.
 // 3: watchdog updaten (like a dead man's switch press)
+// 4: Pulsfolge starten (Parameter müssen zuvor über 2 gesetzt werden)
+// 5: mehrere Variablen auf einmal setzen (werden nur übernommen, wenn alle Namen bekannt sind)
 char mode = 'z'; // random init value
 bool modeChanged = false;
 
@@ -72,7 +95,33 @@ unsigned long lastUpdateTime = 0;
 
 bool lasersAreOn = false;
 
+// Hardware-getimte Pulsfolge: die Laser werden NumRep mal für OnTime ms an- und für OffTim ms ausgeschaltet.
+// SyncDl ms nach jedem Anschalten wird ein 'S' gesendet (der Host liest dann ein Spektrum), am Ende ein 'E'.
+unsigned long pulseOnTime = 0;
+unsigned long pulseOffTime = 0;
+unsigned long pulseSyncDelay = 0;
+unsigned long pulseRepetitions = 0;
+bool scheduleRunning = false;
+bool syncSent = false;
+unsigned long scheduleRepetition = 0;
+unsigned long phaseStartTime = 0;
+
+// um erneut gesendete Frames (deren ACK verloren ging) nicht doppelt auszuführen
+// (0 ist kein gültiger Typ, nach einem FRAME_SESSION gilt also kein Frame als Wiederholung)
+byte lastFrameType = 0;
+byte lastFrameId = 0;
+// im Binärmodus werden Bytes außerhalb von Frames (z. B. Reste abgewiesener Frames) verworfen, nur der watchdog ('3') bleibt
+bool binaryMode = false;
+
 void readSerial();
+void readFrame();
+void sendFrame(byte type, byte id);
+bool setVariable(const char *name, long value);
+bool isKnownVariable(const char *name);
+bool setVariables(char names[][FRAME_VAR_NAME_LENGTH + 1], long *values, int count);
+void readBatchSerial();
+void startSchedule();
+void runSchedule();
 void setLED(byte r, byte g, byte b);
 void enableLocks();
 void disableLocks();
@@ -143,11 +192,13 @@ void loop()
 
   // disableLocks();
   readSerial();
+  runSchedule();
 
   // return;
   // watchdog
   if (lasersAreOn && millis() - lastUpdateTime >= expectedDelay)
   {
+    scheduleRunning = false;
     turnLasersOff();
     mode = '0';
   }
@@ -184,9 +235,18 @@ void readSerial()
     // varSerialData[m] = '\0';
     // // LaserSerial.println(varSerialData);
 
+    if (LaserSerial.peek() == FRAME_SOF)
+    {
+      readFrame();
+      return;
+    }
+
     char newMode = LaserSerial.read();
     // LaserSerial.println(newMode);
 
+    if (binaryMode && newMode != '3')
+      return;
+
     // update (bei einem continuousMeasurement)
     if (continuousMeasurement && newMode == '3')
     {
@@ -194,8 +254,8 @@ void readSerial()
       return;
     }
 
-    // es könnte mehrmals nacheinander eine Variable gesetzt werden
-    if (newMode != mode || (mode == '2' && newMode == '2'))
+    // es könnte mehrmals nacheinander eine Variable gesetzt bzw. eine Pulsfolge gestartet werden
+    if (newMode != mode || (mode == '2' && newMode == '2') || newMode == '4' || newMode == '5')
     {
       mode = newMode;
       modeChanged = true;
@@ -210,6 +270,7 @@ void readSerial()
   {
 
   case '0':
+    scheduleRunning = false;
     turnLasersOff();
     break;
 
@@ -219,6 +280,14 @@ void readSerial()
     // LaserSerial.println("turned on!");
     break;
 
+  case '4':
+    startSchedule();
+    break;
+
+  case '5':
+    readBatchSerial();
+    break;
+
   case '2':
     byte m = LaserSerial.readBytesUntil('\n', varSerialData, SERIAL_DATA_LENGTH);
 
@@ -243,102 +312,342 @@ void readSerial()
       varValueData[i] = varSerialData[SERIAL_DATA_PREFIX_LENGTH + i];
     }
 
-    if (strcmp(varNameData, "Dut405") == 0)
-    {
-      pwmDutyVal405 = atoi(varValueData);
-      ledcWrite(LASER_PIN_405, pwmDutyVal405);
-      // LaserSerial.println("Setting pwmDutyVal405");
-      // LaserSerial.println(pwmDutyVal405, DEC);
-    }
-    else if (strcmp(varNameData, "Dut445") == 0)
+    setVariable(varNameData, atol(varValueData));
+
+    // reset array
+    memset(varSerialData, 0x00, SERIAL_DATA_LENGTH);
+    memset(varNameData, 0x00, SERIAL_DATA_PREFIX_LENGTH);
+    memset(varValueData, 0x00, SERIAL_DATA_LENGTH - SERIAL_DATA_PREFIX_LENGTH);
+
+    break;
+  }
+}
+
+void sendFrame(byte type, byte id)
+{
+  byte frame[5] = {FRAME_SOF, type, id, 0, (byte)(type + id)};
+  LaserSerial.write(frame, 5);
+}
+
+void readFrame()
+{
+  // SOF, Typ, ID, Länge
+  byte header[4];
+  if (LaserSerial.readBytes(header, 4) != 4 || header[3] > FRAME_MAX_PAYLOAD)
+    return; // ohne vollständigen Header ist die ID unbekannt, der Host sendet nach seinem Timeout erneut
+
+  byte type = header[1];
+  byte id = header[2];
+  byte length = header[3];
+  // Payload und Checksumme
+  byte payload[FRAME_MAX_PAYLOAD + 1];
+  if (LaserSerial.readBytes(payload, length + 1) != length + 1)
+  {
+    sendFrame(FRAME_NACK, id);
+    return;
+  }
+
+  byte sum = type + id + length;
+  for (int i = 0; i < length; i++)
+    sum += payload[i];
+  if (sum != payload[length])
+  {
+    sendFrame(FRAME_NACK, id);
+    return;
+  }
+
+  if (type == FRAME_SESSION && length == 1)
+  {
+    // neue Sitzung: die IDs des Hosts beginnen wieder bei 0
+    lastFrameType = 0;
+    binaryMode = payload[0] == FRAME_SESSION_BINARY;
+    sendFrame(FRAME_ACK, id);
+    return;
+  }
+
+  if (type == lastFrameType && id == lastFrameId)
+  {
+    sendFrame(FRAME_ACK, id);
+    return;
+  }
+
+  switch (type)
+  {
+  case FRAME_SET_VAR:
+  case FRAME_SET_VARS:
+  {
+    int count = length / FRAME_VAR_LENGTH;
+    if (length % FRAME_VAR_LENGTH != 0 || count == 0 || (type == FRAME_SET_VAR && count != 1))
     {
-      pwmDutyVal445 = atoi(varValueData);
-      if (!DISABLE_PWM_445)
-      {
-        ledcWrite(LASER_PIN_445, pwmDutyVal445);
-      }
-      // LaserSerial.println("Setting pwmDutyVal445");
-      // LaserSerial.println(pwmDutyVal445, DEC);
+      sendFrame(FRAME_NACK, id);
+      return;
     }
-    else if (strcmp(varNameData, "Frq405") == 0)
+    char names[MAX_BATCH_VARIABLES][FRAME_VAR_NAME_LENGTH + 1];
+    long values[MAX_BATCH_VARIABLES];
+    for (int i = 0; i < count; i++)
     {
-      pwmFreq405 = atoi(varValueData);
-
-      ledcChangeFrequency(LASER_PIN_405, pwmFreq405, pwmResBits405);
-      // LaserSerial.println("Setting pwmFreq405");
-      // LaserSerial.println(pwmFreq405, DEC);
+      memcpy(names[i], payload + i * FRAME_VAR_LENGTH, FRAME_VAR_NAME_LENGTH);
+      names[i][FRAME_VAR_NAME_LENGTH] = '\0';
+      // little endian, wie der ESP32 selbst
+      int32_t value;
+      memcpy(&value, payload + i * FRAME_VAR_LENGTH + FRAME_VAR_NAME_LENGTH, 4);
+      values[i] = value;
     }
-    else if (strcmp(varNameData, "Frq445") == 0)
+    if (!setVariables(names, values, count))
     {
-      pwmFreq445 = atoi(varValueData);
-      if (!DISABLE_PWM_445)
-      {
-        ledcChangeFrequency(LASER_PIN_445, pwmFreq445, pwmResBits445);
-      }
-      // LaserSerial.println("Setting pwmFreq445");
-      // LaserSerial.println(pwmFreq445, DEC);
+      sendFrame(FRAME_NACK, id);
+      return;
     }
-    else if (strcmp(varNameData, "Res405") == 0)
-    {
-      pwmResBits405 = atoi(varValueData);
+    mode = type == FRAME_SET_VAR ? '2' : '5';
+    break;
+  }
+  case FRAME_LASER_OFF:
+    scheduleRunning = false;
+    turnLasersOff();
+    mode = '0';
+    break;
+  case FRAME_LASER_ON:
+    lastUpdateTime = millis();
+    turnLasersOn();
+    mode = '1';
+    break;
+  case FRAME_START_SCHEDULE:
+    startSchedule();
+    mode = '4';
+    break;
+  default:
+    sendFrame(FRAME_NACK, id);
+    return;
+  }
 
-      // update
-      maxDutyVal405 = (uint16_t)(pow(2, pwmResBits405) - 1);
+  lastFrameType = type;
+  lastFrameId = id;
+  sendFrame(FRAME_ACK, id);
+}
 
-      ledcChangeFrequency(LASER_PIN_405, pwmFreq405, pwmResBits405);
+const char *knownVariables[] = {
+    "Dut405", "Dut445", "Frq405", "Frq445", "Res405", "Res445", "FrqLTB",
+    "SetLED", "ConMea", "ExpDel", "OnTime", "OffTim", "SyncDl", "NumRep"};
 
-      // LaserSerial.println("Setting pwmResBits405");
-      // LaserSerial.println(pwmResBits405, DEC);
-    }
-    else if (strcmp(varNameData, "Res445") == 0)
-    {
-      pwmResBits445 = atoi(varValueData);
-      // update
-      maxDutyVal445 = (uint16_t)(pow(2, pwmResBits445) - 1);
+bool isKnownVariable(const char *name)
+{
+  for (unsigned int i = 0; i < sizeof(knownVariables) / sizeof(knownVariables[0]); i++)
+  {
+    if (strcmp(name, knownVariables[i]) == 0)
+      return true;
+  }
+  return false;
+}
 
-      if (!DISABLE_PWM_445)
-      {
-        ledcChangeFrequency(LASER_PIN_445, pwmFreq445, pwmResBits445);
-      }
-      // LaserSerial.println("Setting pwmResBits445");
-      // LaserSerial.println(pwmResBits445, DEC);
+// übernimmt alle Variablen oder (wenn ein Name unbekannt ist) keine.
+// Da dazwischen nichts anderes bearbeitet wird, gibt es keinen Zustand, in dem nur ein Teil gesetzt ist.
+bool setVariables(char names[][FRAME_VAR_NAME_LENGTH + 1], long *values, int count)
+{
+  for (int i = 0; i < count; i++)
+  {
+    if (!isKnownVariable(names[i]))
+      return false;
+  }
+  for (int i = 0; i < count; i++)
+  {
+    setVariable(names[i], values[i]);
+  }
+  return true;
+}
+
+char batchSerialData[BATCH_DATA_LENGTH + 1];
+
+// 5Name=Wert,Name=Wert,...
+void readBatchSerial()
+{
+  int m = LaserSerial.readBytesUntil('\n', batchSerialData, BATCH_DATA_LENGTH);
+  batchSerialData[m] = '\0';
+
+  char names[MAX_BATCH_VARIABLES][FRAME_VAR_NAME_LENGTH + 1];
+  long values[MAX_BATCH_VARIABLES];
+  int count = 0;
+
+  char *pair = strtok(batchSerialData, ",");
+  while (pair != NULL && count < MAX_BATCH_VARIABLES)
+  {
+    char *separator = strchr(pair, '=');
+    if (separator == NULL || separator - pair > FRAME_VAR_NAME_LENGTH)
+      return;
+    *separator = '\0';
+    strcpy(names[count], pair);
+    values[count] = atol(separator + 1);
+    count++;
+    pair = strtok(NULL, ",");
+  }
+
+  setVariables(names, values, count);
+}
+
+// setzt eine Variable (Text- und Binärprotokoll). Gibt false zurück, wenn der Name unbekannt ist.
+bool setVariable(const char *name, long value)
+{
+  if (strcmp(name, "Dut405") == 0)
+  {
+    pwmDutyVal405 = value;
+    ledcWrite(LASER_PIN_405, pwmDutyVal405);
+    // LaserSerial.println("Setting pwmDutyVal405");
+    // LaserSerial.println(pwmDutyVal405, DEC);
+  }
+  else if (strcmp(name, "Dut445") == 0)
+  {
+    pwmDutyVal445 = value;
+    if (!DISABLE_PWM_445)
+    {
+      ledcWrite(LASER_PIN_445, pwmDutyVal445);
     }
-    else if (strcmp(varNameData, "FrqLTB") == 0)
+    // LaserSerial.println("Setting pwmDutyVal445");
+    // LaserSerial.println(pwmDutyVal445, DEC);
+  }
+  else if (strcmp(name, "Frq405") == 0)
+  {
+    pwmFreq405 = value;
+
+    ledcChangeFrequency(LASER_PIN_405, pwmFreq405, pwmResBits405);
+    // LaserSerial.println("Setting pwmFreq405");
+    // LaserSerial.println(pwmFreq405, DEC);
+  }
+  else if (strcmp(name, "Frq445") == 0)
+  {
+    pwmFreq445 = value;
+    if (!DISABLE_PWM_445)
     {
-      pwmFreqNitro = atoi(varValueData);
-      ledcChangeFrequency(LASER_PIN_NITROGEN, pwmFreqNitro, PWM_RES_BITS_NITRO);
-      // LaserSerial.println("Setting pwmFreqNitro");
-      // LaserSerial.println(pwmFreqNitro, DEC);
+      ledcChangeFrequency(LASER_PIN_445, pwmFreq445, pwmResBits445);
     }
-    else if (strcmp(varNameData, "SetLED") == 0)
+    // LaserSerial.println("Setting pwmFreq445");
+    // LaserSerial.println(pwmFreq445, DEC);
+  }
+  else if (strcmp(name, "Res405") == 0)
+  {
+    pwmResBits405 = value;
+
+    // update
+    maxDutyVal405 = (uint16_t)(pow(2, pwmResBits405) - 1);
+
+    ledcChangeFrequency(LASER_PIN_405, pwmFreq405, pwmResBits405);
+
+    // LaserSerial.println("Setting pwmResBits405");
+    // LaserSerial.println(pwmResBits405, DEC);
+  }
+  else if (strcmp(name, "Res445") == 0)
+  {
+    pwmResBits445 = value;
+    // update
+    maxDutyVal445 = (uint16_t)(pow(2, pwmResBits445) - 1);
+
+    if (!DISABLE_PWM_445)
     {
-      String data = (String)atoi(varValueData); // z. B. 0000000222 zu 222
-      // LaserSerial.println(data);
-      int r = data[0] - '0';
-      int g = data[1] - '0';
-      int b = data[2] - '0';
-      // 1 ist Null, weil sonst 002 zu 2 werden würde statt 002 (es soll sehr simpel sein)
-      setLED((r - 1) * 10, (g - 1) * 10, (b - 1) * 10);
+      ledcChangeFrequency(LASER_PIN_445, pwmFreq445, pwmResBits445);
     }
-    else if (strcmp(varNameData, "ConMea") == 0)
+    // LaserSerial.println("Setting pwmResBits445");
+    // LaserSerial.println(pwmResBits445, DEC);
+  }
+  else if (strcmp(name, "FrqLTB") == 0)
+  {
+    pwmFreqNitro = value;
+    ledcChangeFrequency(LASER_PIN_NITROGEN, pwmFreqNitro, PWM_RES_BITS_NITRO);
+    // LaserSerial.println("Setting pwmFreqNitro");
+    // LaserSerial.println(pwmFreqNitro, DEC);
+  }
+  else if (strcmp(name, "SetLED") == 0)
+  {
+    String data = String(value); // z. B. 0000000222 zu 222
+    // LaserSerial.println(data);
+    int r = data[0] - '0';
+    int g = data[1] - '0';
+    int b = data[2] - '0';
+    // 1 ist Null, weil sonst 002 zu 2 werden würde statt 002 (es soll sehr simpel sein)
+    setLED((r - 1) * 10, (g - 1) * 10, (b - 1) * 10);
+  }
+  else if (strcmp(name, "ConMea") == 0)
+  {
+    continuousMeasurement = value;
+    // LaserSerial.println("Setting continuousMeasurement");
+    // LaserSerial.println(continuousMeasurement);
+  }
+  else if (strcmp(name, "ExpDel") == 0)
+  {
+    expectedDelay = value;
+    // LaserSerial.println("Setting expectedDelay");
+    // LaserSerial.println(expectedDelay);
+  }
+  else if (strcmp(name, "OnTime") == 0)
+  {
+    pulseOnTime = value;
+  }
+  else if (strcmp(name, "OffTim") == 0)
+  {
+    pulseOffTime = value;
+  }
+  else if (strcmp(name, "SyncDl") == 0)
+  {
+    pulseSyncDelay = value;
+  }
+  else if (strcmp(name, "NumRep") == 0)
+  {
+    pulseRepetitions = value;
+  }
+  else
+  {
+    return false;
+  }
+  return true;
+}
+
+void startSchedule()
+{
+  if (pulseRepetitions == 0)
+  {
+    LaserSerial.write('E');
+    return;
+  }
+  scheduleRunning = true;
+  scheduleRepetition = 0;
+  syncSent = false;
+  phaseStartTime = millis();
+  lastUpdateTime = millis();
+  turnLasersOn();
+}
+
+// nicht blockierend, wird in jedem loop() aufgerufen
+void runSchedule()
+{
+  if (!scheduleRunning)
+    return;
+
+  unsigned long elapsed = millis() - phaseStartTime;
+
+  if (lasersAreOn)
+  {
+    if (!syncSent && elapsed >= pulseSyncDelay)
     {
-      continuousMeasurement = atoi(varValueData);
-      // LaserSerial.println("Setting continuousMeasurement");
-      // LaserSerial.println(continuousMeasurement);
+      LaserSerial.write('S');
+      syncSent = true;
     }
-    else if (strcmp(varNameData, "ExpDel") == 0)
+    if (elapsed >= pulseOnTime)
     {
-      expectedDelay = atol(varValueData);
-      // LaserSerial.println("Setting expectedDelay");
-      // LaserSerial.println(varValueData);
-      // LaserSerial.println(expectedDelay);
+      turnLasersOff();
+      // relativ zum geplanten (nicht zum tatsächlichen) Umschalten, damit sich die Verzögerungen von loop() nicht aufsummieren
+      phaseStartTime += pulseOnTime;
+      scheduleRepetition++;
+      if (scheduleRepetition >= pulseRepetitions)
+      {
+        scheduleRunning = false;
+        LaserSerial.write('E');
+      }
     }
-    // reset array
-    memset(varSerialData, 0x00, SERIAL_DATA_LENGTH);
-    memset(varNameData, 0x00, SERIAL_DATA_PREFIX_LENGTH);
-    memset(varValueData, 0x00, SERIAL_DATA_LENGTH - SERIAL_DATA_PREFIX_LENGTH);
-
-    break;
+  }
+  else if (elapsed >= pulseOffTime)
+  {
+    syncSent = false;
+    phaseStartTime += pulseOffTime;
+    // wie bei '1': den watchdog für die neue Wiederholung zurücksetzen
+    lastUpdateTime = millis();
+    turnLasersOn();
   }
 }
 
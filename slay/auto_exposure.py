@@ -0,0 +1,38 @@
+import numpy as np
+
+
+class AutoExposure:
+    """
+    Passt die Integrationszeit nach jedem Spektrum an: ist es gesättigt, wird sie verkürzt, sind die Counts zu gering
+    (vom Rauschen dominiert), so verlängert, dass das Maximum bei TARGET der Vollaussteuerung liegt.
+    """
+
+    # Vollaussteuerung des Detektors (16 Bit)
+    FULL_SCALE = 65535
+    # ab diesem Anteil der Vollaussteuerung gilt ein Spektrum als gesättigt
+    SATURATION = 0.95
+    # darunter ist das Spektrum vom Rauschen dominiert
+    LOW = 0.2
+    # wo das Maximum nach dem Anpassen liegen soll
+    TARGET = 0.6
+
+    def __init__(self, min_inttime: int, max_inttime: int):
+        assert 0 < min_inttime <= max_inttime
+        self.min_inttime = min_inttime
+        self.max_inttime = max_inttime
+
+    def is_saturated(self, spectrum) -> bool:
+        return np.max(spectrum) >= self.SATURATION * self.FULL_SCALE
+
+    def next_inttime(self, inttime: int, spectrum) -> int:
+        """Gibt die Integrationszeit (ms) für das nächste Spektrum zurück, gemessen wurde spectrum mit inttime."""
+        peak = float(np.max(spectrum))
+        if self.is_saturated(spectrum):
+            # wie weit das Spektrum übersteuert ist, ist unbekannt: halbieren und beim nächsten Spektrum erneut prüfen
+            new_inttime = inttime / 2
+        elif peak < self.LOW * self.FULL_SCALE:
+            # die Counts wachsen (abzüglich des Dunkelrauschens) linear mit der Integrationszeit
+            new_inttime = inttime * self.TARGET * self.FULL_SCALE / max(peak, 1)
+        else:
+            return inttime
+        return int(np.clip(round(new_inttime), self.min_inttime, self.max_inttime))
@@ -1,41 +1,109 @@
 # from slay.measurement import Measurement
 # from slay.measurement import SpectrumData
+from slay.chunk_store import ChunkStore
+from slay.running_stats import RunningStats
+import os
 import time
+import numpy as np
 
 
 class BackupService:
 
-    def __init__(self, measurement_manager, messdata, cache_dir: str):
+    def __init__(self, measurement_manager, messdata, cache_dir: str, chunk_size=256):
         self.measurement_manager = measurement_manager
         self.messdata = messdata
-        self.past_measurement_index = -1
         self.last_save_time = -1
-        self.cache_dir = cache_dir
-        # aktuell schreibe ich jedes Mal einfach den kompletten Array neu, statt nur zu appenden.
-        # das könnte bei größeren Messungen zu delays führen, da es aktuell nur ein Thread, kein Prozess ist...
+        # ohne Cache-Ordner landet das Backup (wie zuvor) im Messordner
+        self.cache_dir = cache_dir or self.measurement_manager.measurement_save_dir
+        self.store_path = os.path.join(
+            self.cache_dir,
+            self.measurement_manager.measurement_file_name + ChunkStore.SUFFIX,
+        )
+        self.chunk_size = chunk_size
+        self.store = None
+        # welche Zeilen (flacher Index) bereits in der Ablage sind. Es werden nur neue Zeilen angehängt.
+        self.flushed = np.zeros(self.messdata.timestamps.size, dtype=bool)
+        # ns, Zeitbasis dieses Laufs minus Zeitbasis der Ablage (nur bei einem fortgesetzten Backup nicht 0):
+        # die Ablage behält ihren time_anchor, die monotonen Zeitstempel werden vor dem Anhängen umgerechnet
+        self.time_offset_ns = 0
         self.max_save_interval = max(
             30, self.measurement_manager.MEASUREMENT_SETTINGS.measurement_time / 1000
         )
 
+    def resume(self, store: ChunkStore, done_rows, time_offset_ns=0):
+        """
+        An ein bestehendes Backup anhängen, statt ein neues anzulegen (siehe Measurement.load_progress).
+        time_offset_ns: um so viel wurden die übernommenen monotonen Zeitstempel in die Zeitbasis dieses Laufs verschoben.
+        """
+        self.store = store
+        self.store_path = store.path
+        self.flushed[done_rows] = True
+        self.time_offset_ns = time_offset_ns
+        if store.load_array("time_anchor") is None:
+            # ältere Backups ohne Anker: ab jetzt in der Zeitbasis dieses Laufs
+            store.save_array("time_anchor", self.messdata.time_anchor)
+            self.time_offset_ns = 0
+
     def start(self):
 
+        if self.store is None:
+            self.store = ChunkStore.create(
+                self.store_path,
+                self.messdata.measurements.shape,
+                self.messdata.wav,
+                self.messdata.measurements.dtype,
+                self.chunk_size,
+            )
+            with open(
+                os.path.join(self.store_path, "settings.json"), "w", encoding="utf-8"
+            ) as json_file:
+                self.measurement_manager.MEASUREMENT_SETTINGS.save_as_json(json_file)
+            self.store.save_array("time_anchor", self.messdata.time_anchor)
+        print(f"backing up to: {self.store_path}", flush=True)
+
         self.last_save_time = time.time()
         while True:
             if self.messdata.stop_event.is_set():
+                # den Rest noch sichern
+                self.flush()
                 return
 
-            if (
-                len(self.messdata.measurements) == 0
-                or self.messdata.curr_measurement_index < 0
-                or self.past_measurement_index == self.messdata.curr_measurement_index
-                or self.last_save_time + self.max_save_interval > time.time()
-            ):
-                time.sleep(self.max_save_interval / 2)
+            if self.last_save_time + self.max_save_interval > time.time():
+                # kehrt sofort zurück, wenn die Messung endet (measure wartet auf das letzte flush)
+                self.messdata.stop_event.wait(self.max_save_interval / 2)
                 continue
 
-            self.measurement_manager.save(
-                measurements_only=True, plt_only=False, cache_path=self.cache_dir
-            )
-
-            self.past_measurement_index = self.messdata.curr_measurement_index
+            self.flush()
             self.last_save_time = time.time()
+
+    def flush(self):
+        """Hängt alle seit dem letzten Aufruf fertig gemessenen Spektren an die Ablage an."""
+        # der Zeitstempel wird nach dem Spektrum geschrieben, ist er gesetzt, ist die Zeile also vollständig
+        new_rows = np.flatnonzero(
+            (self.messdata.timestamps.ravel() != 0) & ~self.flushed
+        )
+        if len(new_rows) == 0:
+            return
+
+        spectra = self.messdata.measurements.reshape(
+            -1, self.messdata.measurements.shape[-1]
+        )[new_rows]
+        timestamps = self.messdata.timestamps.ravel()[new_rows]
+        timestamps_ns = self.messdata.timestamps_ns.reshape(-1, 3)[new_rows]
+        # in die Zeitbasis der Ablage, 0 (nicht gemessen) bleibt 0
+        timestamps_ns = np.where(
+            timestamps_ns != 0, timestamps_ns - self.time_offset_ns, 0
+        )
+        inttimes = self.messdata.inttimes.ravel()[new_rows]
+        overflow = self.messdata.overflow.ravel()[new_rows]
+
+        self.store.append(
+            new_rows,
+            spectra,
+            timestamps,
+            timestamps_ns=timestamps_ns,
+            inttimes=inttimes,
+            overflow=overflow,
+        )
+        self.flushed[new_rows] = True
+        self.messdata.stats.save(os.path.join(self.store_path, RunningStats.STORE_FILE))
@@ -43,7 +43,7 @@ class USBCamera:
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
         cap.set(cv2.CAP_PROP_FPS, self.capture_fps)
 
-        ts_list, frame_list = [], []
+        ts_list, ts_ns_list, frame_list = [], [], []
         try:
             while not self.stop_event.is_set():
                 ret, frame = cap.read()
@@ -52,6 +52,8 @@ class USBCamera:
                     break
 
                 ts_list.append(time.time())
+                # gleiche Uhr wie SpectrumData.timestamps_ns (CLOCK_MONOTONIC gilt prozessübergreifend)
+                ts_ns_list.append(time.monotonic_ns())
                 frame_list.append(frame.copy())
 
                 cv2.imshow(f"{self.device_path} - press q to stop", frame)
@@ -70,6 +72,10 @@ class USBCamera:
             self.output_path + "-cam-timestamps.npy",
             np.array(ts_list, dtype=np.float64),
         )
+        np.save(
+            self.output_path + "-cam-timestamps-ns.npy",
+            np.array(ts_ns_list, dtype=np.int64),
+        )
 
         fourcc = cv2.VideoWriter_fourcc(*self.video_codec)
         vw = cv2.VideoWriter(
@@ -0,0 +1,108 @@
+import struct
+import zlib
+import numpy as np
+
+
+class ZlibCodec:
+    """
+    Die Spektren eines Chunks (siehe ChunkStore) als rohe Bytes mit zlib.
+    zlib gibt während des Komprimierens den GIL frei, mehrere Chunks lassen sich also in Threads parallel komprimieren.
+    """
+
+    NAME = "zlib"
+    # wie np.savez_compressed
+    LEVEL = 6
+
+    @staticmethod
+    def encode(spectra) -> bytes:
+        return zlib.compress(np.ascontiguousarray(spectra).tobytes(), ZlibCodec.LEVEL)
+
+    @staticmethod
+    def decode(data: bytes, shape, dtype):
+        return np.frombuffer(zlib.decompress(data), dtype=dtype).reshape(shape)
+
+
+class DeltaShuffleCodec:
+    """
+    Verlustfrei, für Spektren: Counts als Ganzzahlen, jede Wiederholung als Differenz zur vorherigen (aufeinanderfolgende
+    Wiederholungen unterscheiden sich kaum), die Differenzen im kleinsten passenden Ganzzahltyp und nach Bytes sortiert
+    (erst alle niederwertigen, dann alle höherwertigen Bytes), dann zlib.
+
+    Gleitkommazahlen, die nicht alle ganzzahlig sind (z. B. mit SMOOTH), werden nur nach Bytes sortiert.
+    """
+
+    NAME = "delta-shuffle"
+    LEVEL = ZlibCodec.LEVEL
+    # vor den komprimierten Daten: Modus und Bytes pro Wert
+    HEADER = struct.Struct("<BB")
+    RAW = 0
+    DELTA = 1
+    # Ganzzahlen darüber werden nicht umgewandelt (die Differenzen müssen in int64 passen)
+    MAX_INTEGER = 2**62
+
+    @staticmethod
+    def encode(spectra) -> bytes:
+        spectra = np.ascontiguousarray(spectra)
+        integers = DeltaShuffleCodec._to_integers(spectra)
+        if integers is None:
+            mode, values = DeltaShuffleCodec.RAW, spectra
+        else:
+            mode = DeltaShuffleCodec.DELTA
+            deltas = np.diff(integers, axis=0, prepend=0)
+            values = deltas.astype(DeltaShuffleCodec._smallest_int(deltas))
+        return DeltaShuffleCodec.HEADER.pack(mode, values.itemsize) + zlib.compress(
+            DeltaShuffleCodec._shuffle(values), DeltaShuffleCodec.LEVEL
+        )
+
+    @staticmethod
+    def decode(data: bytes, shape, dtype):
+        dtype = np.dtype(dtype)
+        mode, itemsize = DeltaShuffleCodec.HEADER.unpack_from(data)
+        shuffled = zlib.decompress(data[DeltaShuffleCodec.HEADER.size :])
+        if mode == DeltaShuffleCodec.RAW:
+            return DeltaShuffleCodec._unshuffle(shuffled, dtype).reshape(shape)
+        deltas = DeltaShuffleCodec._unshuffle(shuffled, np.dtype(f"<i{itemsize}"))
+        return np.cumsum(deltas.reshape(shape), axis=0, dtype=np.int64).astype(dtype)
+
+    @staticmethod
+    def _to_integers(spectra):
+        """Die Spektren als int64, oder None, wenn das nicht verlustfrei geht."""
+        if spectra.dtype.kind in "ui":
+            if spectra.size and spectra.max() > DeltaShuffleCodec.MAX_INTEGER:
+                return None
+            return spectra.astype(np.int64)
+        with np.errstate(invalid="ignore"):
+            if (
+                not np.all(np.abs(spectra) <= DeltaShuffleCodec.MAX_INTEGER)
+                or not np.array_equal(spectra, np.rint(spectra))
+                # -0.0 würde zu 0.0
+                or np.signbit(spectra[spectra == 0]).any()
+            ):
+                return None
+        return spectra.astype(np.int64)
+
+    @staticmethod
+    def _smallest_int(values):
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if values.size == 0 or (
+                values.min() >= info.min and values.max() <= info.max
+            ):
+                return np.dtype(dtype).newbyteorder("<")
+        return np.dtype("<i8")
+
+    @staticmethod
+    def _shuffle(values) -> bytes:
+        # (Werte, Bytes) -> (Bytes, Werte)
+        return np.ascontiguousarray(
+            values.reshape(-1).view(np.uint8).reshape(-1, values.itemsize).T
+        ).tobytes()
+
+    @staticmethod
+    def _unshuffle(data: bytes, dtype):
+        shuffled = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1)
+        return np.ascontiguousarray(shuffled.T).view(dtype).reshape(-1)
+
+
+# Name (in meta.json einer ChunkStore) -> Codec. Ohne Codec liegen die Spektren als Array in einer komprimierten .npz
+CODECS = {ZlibCodec.NAME: ZlibCodec, DeltaShuffleCodec.NAME: DeltaShuffleCodec}
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from slay.chunk_codec import CODECS
+
+
+class ChunkStore:
+    """
+    Append-only Ablage für Messdaten: ein Ordner mit einer Datei pro Chunk (maximal chunk_size Spektren) und einem Index.
+
+    Die Zeilen werden über ihren flachen Index (gradient * REPETITIONS + repetition) adressiert.
+    Der Index wird erst nach dem Chunk geschrieben, ein Absturz hinterlässt also höchstens einen Chunk ohne Eintrag.
+
+    Mit einem codec (siehe chunk_codec.CODECS) werden die Spektren vom Codec kodiert und liegen als Bytes in der
+    (dann unkomprimierten) .npz des Chunks. Das Kodieren mehrerer Chunks kann parallel laufen (append(workers=...)).
+    """
+
+    META_FILE = "meta.json"
+    INDEX_FILE = "index.jsonl"
+    WAV_FILE = "wav.npy"
+    SUFFIX = ".chunks"
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, self.META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.shape = tuple(meta["shape"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.chunk_size = meta["chunk_size"]
+        # ältere Ablagen haben noch keinen Codec
+        self.codec = CODECS[meta["codec"]] if meta.get("codec") else None
+        self.num_chunks = len(self.index())
+
+    @staticmethod
+    def is_store(path: str) -> bool:
+        return os.path.isfile(os.path.join(path, ChunkStore.META_FILE))
+
+    @staticmethod
+    def create(path: str, shape, wav, dtype=float, chunk_size=256, codec=None):
+        """Legt eine neue (leere) Ablage an. Eine eventuell vorhandene alte Ablage wird überschrieben."""
+        if codec is not None and codec not in CODECS:
+            raise ValueError(
+                f"Unknown codec {codec}, expected one of {', '.join(CODECS)}."
+            )
+        os.makedirs(path, 0o777, exist_ok=True)
+        for file_name in os.listdir(path):
+            if file_name.startswith("chunk_") or file_name == ChunkStore.INDEX_FILE:
+                os.remove(os.path.join(path, file_name))
+
+        np.save(os.path.join(path, ChunkStore.WAV_FILE), np.array(wav))
+        with open(os.path.join(path, ChunkStore.META_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "shape": list(shape),
+                    "dtype": np.dtype(dtype).str,
+                    "chunk_size": chunk_size,
+                    "codec": codec,
+                },
+                f,
+            )
+        open(os.path.join(path, ChunkStore.INDEX_FILE), "w", encoding="utf-8").close()
+        return ChunkStore(path)
+
+    def index(self) -> list:
+        entries = []
+        with open(os.path.join(self.path, self.INDEX_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # unvollständig geschriebene letzte Zeile (Absturz während des Schreibens)
+                    break
+        return entries
+
+    def append(self, rows, spectra, timestamps, workers=1, **columns):
+        """
+        Hängt die Zeilen (flache Indizes) mit ihren Spektren und Zeitstempeln als neue Chunks an.
+        workers: so viele Chunks werden gleichzeitig kodiert (nur mit codec), geschrieben wird weiterhin der Reihe nach.
+        columns: weitere Werte pro Zeile (z. B. timestamps_ns), die mit read_column gelesen werden können.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = range(0, len(rows), self.chunk_size)
+
+        def encode(start):
+            return self.codec.encode(
+                np.asarray(spectra[start : start + self.chunk_size], dtype=self.dtype)
+            )
+
+        def encode_ahead(executor):
+            """Liefert in der Reihenfolge der Chunks, kodiert wird nur wenige Chunks im Voraus."""
+            pending = deque()
+            for start in starts:
+                pending.append(executor.submit(encode, start))
+                # sonst lägen alle kodierten Chunks im Speicher, wenn das Schreiben langsamer ist
+                if len(pending) > workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+        # die Threads werden erst mit dem ersten submit gestartet
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            if self.codec is None:
+                encoded_chunks = [None] * len(starts)
+            elif workers > 1:
+                encoded_chunks = encode_ahead(executor)
+            else:
+                encoded_chunks = map(encode, starts)
+
+            for start, encoded in zip(starts, encoded_chunks):
+                end = start + self.chunk_size
+                self._write_chunk(
+                    rows[start:end],
+                    spectra[start:end],
+                    timestamps[start:end],
+                    {
+                        name: np.asarray(column)[start:end]
+                        for name, column in columns.items()
+                    },
+                    encoded,
+                )
+
+    def _write_chunk(self, rows, spectra, timestamps, columns=None, encoded=None):
+        """encoded: die vom Codec kodierten Spektren (mit codec)."""
+        file_name = f"chunk_{self.num_chunks:06d}.npz"
+        tmp_path = os.path.join(self.path, file_name + ".tmp")
+        # savez hängt sonst ein .npz an den Namen
+        with open(tmp_path, "wb") as f:
+            if self.codec is None:
+                np.savez_compressed(
+                    f,
+                    rows=rows,
+                    spectra=np.asarray(spectra, dtype=self.dtype),
+                    timestamps=np.asarray(timestamps, dtype=float),
+                    **(columns or {}),
+                )
+            else:
+                # die Spektren sind schon komprimiert, der Rest ist klein
+                np.savez(
+                    f,
+                    rows=rows,
+                    spectra=np.frombuffer(encoded, dtype=np.uint8),
+                    timestamps=np.asarray(timestamps, dtype=float),
+                    **(columns or {}),
+                )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, file_name))
+
+        entry = {
+            "file": file_name,
+            "count": len(rows),
+            "first_row": int(rows[0]),
+            "last_row": int(rows[-1]),
+            "t_start": float(timestamps[0]),
+            "t_end": float(timestamps[-1]),
+            "written": time.time(),
+        }
+        with open(os.path.join(self.path, self.INDEX_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.num_chunks += 1
+
+    def read(self, spectra=True):
+        """
+        Setzt die Chunks wieder zu (measurements, wav, timestamps) im Format von SpectrumData zusammen.
+        spectra=False: measurements ist None, die Spektren werden dann nicht entpackt.
+        """
+        num_gradiants, repetitions, num_pixels = self.shape
+        measurements = (
+            np.zeros((num_gradiants * repetitions, num_pixels), dtype=self.dtype)
+            if spectra
+            else None
+        )
+        timestamps = np.zeros(num_gradiants * repetitions, dtype=float)
+
+        for entry in self.index():
+            with np.load(os.path.join(self.path, entry["file"])) as chunk:
+                rows = chunk["rows"]
+                if spectra:
+                    measurements[rows] = self._spectra(chunk, len(rows))
+                timestamps[rows] = chunk["timestamps"]
+
+        wav = np.load(os.path.join(self.path, self.WAV_FILE))
+        return (
+            measurements.reshape(self.shape) if spectra else None,
+            wav,
+            timestamps.reshape((num_gradiants, repetitions)),
+        )
+
+    def read_window(self, gradiants: slice, repetitions: slice, pixels: slice):
+        """
+        Wie read, aber nur der Ausschnitt (Gradienten, Wiederholungen, Pixel) der Messdaten.
+        Es werden nur die Chunks entpackt, die Zeilen aus dem Ausschnitt enthalten.
+        """
+        num_gradiants, num_repetitions, num_pixels = self.shape
+        gradiant_indices = np.arange(num_gradiants)[gradiants]
+        repetition_indices = np.arange(num_repetitions)[repetitions]
+        window = np.zeros(
+            (
+                len(gradiant_indices),
+                len(repetition_indices),
+                len(range(num_pixels)[pixels]),
+            ),
+            dtype=self.dtype,
+        )
+        flat_window = window.reshape(-1, window.shape[-1])
+
+        wanted_rows = (
+            gradiant_indices[:, np.newaxis] * num_repetitions + repetition_indices
+        ).ravel()
+        # flacher Index -> Zeile im Ausschnitt, -1 für nicht gewünschte Zeilen
+        positions = np.full(num_gradiants * num_repetitions, -1, dtype=np.int64)
+        positions[wanted_rows] = np.arange(len(wanted_rows))
+        wanted_rows = np.sort(wanted_rows)
+
+        for entry in self.index():
+            # liegt eine gewünschte Zeile zwischen first_row und last_row des Chunks?
+            i = np.searchsorted(wanted_rows, entry["first_row"])
+            if i == len(wanted_rows) or wanted_rows[i] > entry["last_row"]:
+                continue
+            with np.load(os.path.join(self.path, entry["file"])) as chunk:
+                chunk_positions = positions[chunk["rows"]]
+                in_window = chunk_positions >= 0
+                flat_window[chunk_positions[in_window]] = self._spectra(
+                    chunk, len(chunk_positions)
+                )[in_window][:, pixels]
+        return window
+
+    def _spectra(self, chunk, count):
+        """Die Spektren (count, Pixel) eines geöffneten Chunks."""
+        if self.codec is None:
+            return chunk["spectra"]
+        return self.codec.decode(
+            chunk["spectra"].tobytes(), (count, self.shape[-1]), self.dtype
+        )
+
+    def read_column(self, name: str):
+        """Liest eine mit append übergebene zusätzliche Spalte im Format (Gradienten, Wiederholungen, ...). None, wenn es sie nicht gibt."""
+        num_gradiants, repetitions, _ = self.shape
+        column = None
+        for entry in self.index():
+            with np.load(os.path.join(self.path, entry["file"])) as chunk:
+                if name not in chunk.files:
+                    continue
+                values = chunk[name]
+                if column is None:
+                    column = np.zeros(
+                        (num_gradiants * repetitions,) + values.shape[1:], dtype=values.dtype
+                    )
+                column[chunk["rows"]] = values
+        if column is None:
+            return None
+        return column.reshape((num_gradiants, repetitions) + column.shape[1:])
+
+    def save_array(self, name: str, array):
+        """Für Werte, die einmal pro Messung anfallen (wie die Wellenlängen)."""
+        np.save(os.path.join(self.path, name + ".npy"), np.asarray(array))
+
+    def load_array(self, name: str):
+        path = os.path.join(self.path, name + ".npy")
+        if not os.path.isfile(path):
+            return None
+        return np.load(path)
@@ -0,0 +1,41 @@
+import numpy as np
+from slay.running_stats import RunningStats
+
+
+class ConvergenceCheck:
+    """
+    Abbruchkriterium für die Wiederholungen eines Gradienten: die Messung gilt als konvergiert, sobald der relative
+    Standardfehler (Standardfehler / Mittelwert) der über ein Wellenlängenfenster summierten Intensität unter threshold
+    liegt, frühestens nach min_count Spektren. Die Obergrenze bleibt REPETITIONS.
+    """
+
+    def __init__(self, wav, wav_start, wav_end, threshold, min_count=2):
+        wav = np.asarray(wav)
+        self.window = (wav >= wav_start) & (wav <= wav_end)
+        if not self.window.any():
+            raise ValueError(
+                f"The convergence window {wav_start} nm to {wav_end} nm contains no wavelengths of the spectrometer."
+            )
+        self.threshold = threshold
+        # mit weniger als zwei Spektren gibt es keine Standardabweichung
+        self.min_count = max(2, min_count)
+        # nur ein Wert pro Spektrum: die Summe im Fenster
+        self.stats = RunningStats(1, 1)
+
+    @property
+    def count(self) -> int:
+        return int(self.stats.count[0])
+
+    def update(self, spectrum) -> bool:
+        """Nimmt ein Spektrum auf und gibt zurück, ob die Wiederholungen beendet werden können."""
+        self.stats.update(0, [np.sum(np.asarray(spectrum)[self.window])])
+        return self.converged()
+
+    def rse(self) -> float:
+        mean = self.stats.mean[0, 0]
+        if self.count < 2 or mean == 0:
+            return np.inf
+        return float(np.sqrt(self.stats.variance(ddof=1)[0, 0] / self.count) / abs(mean))
+
+    def converged(self) -> bool:
+        return self.count >= self.min_count and self.rse() <= self.threshold
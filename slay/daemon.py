@@ -0,0 +1,205 @@
+import json
+import os
+from queue import Empty
+import socket
+import socketserver
+from threading import Event, Thread
+import time
+import traceback
+from slay.measurement_session import MeasurementSession
+from slay.settings import MeasurementSettings
+
+
+class MeasurementDaemon:
+    """
+    Hält die Geräte einer Measurement dauerhaft verbunden und nimmt über einen lokalen Unix-Socket Aufträge an.
+    Skripte und Notebooks verbinden sich mit DaemonClient, statt selbst die Geräte zu initialisieren.
+
+    Protokoll: pro Zeile ein JSON-Objekt mit "command", die Antwort ist ebenfalls eine Zeile JSON:
+    - run: {"command": "run", "settings": MeasurementSettings.to_dict()} -> {"queued": Anzahl wartender Messungen}
+    - status: Zustand der aktuellen Messung und der Warteschlange
+    - stream: {"command": "stream", "since": seq} -> danach fortlaufend eine Zeile pro Spektrum (siehe SpectrumRingBuffer)
+    - shutdown: beendet den Daemon und trennt die Geräte
+    """
+
+    # s, wie oft stream nach neuen Spektren sieht
+    STREAM_INTERVAL = 0.05
+
+    def __init__(self, measurement, socket_path: str, save=True):
+        self.session = MeasurementSession(measurement, gui=False, save=save)
+        self.socket_path = socket_path
+        self.running = Event()
+        self.stopped = Event()
+        # ab dann nimmt der Socket Verbindungen an
+        self.listening = Event()
+        self.last_error = ""
+        self.server = None
+
+    @property
+    def measurement(self):
+        return self.session.measurement
+
+    def serve_forever(self):
+        """Blockiert, bis ein Client shutdown sendet."""
+        if os.path.exists(self.socket_path):
+            # von einem abgestürzten Daemon übrig geblieben
+            os.unlink(self.socket_path)
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon.handle(self.rfile, self.wfile)
+
+        self.server = socketserver.ThreadingUnixStreamServer(
+            self.socket_path, Handler, bind_and_activate=False
+        )
+        self.server.daemon_threads = True
+        self.server.server_bind()
+        # nur der eigene Benutzer darf Messungen starten (und damit die Laser anschalten).
+        # Vor listen, vorher nimmt der Socket keine Verbindungen an
+        os.chmod(self.socket_path, 0o600)
+        self.server.server_activate()
+        self.listening.set()
+        worker = Thread(target=self._work, daemon=True)
+        worker.start()
+        print(f"daemon: listening on {self.socket_path}", flush=True)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            os.unlink(self.socket_path)
+            self.stopped.set()
+            # eine laufende Messung noch zu Ende bringen
+            worker.join()
+            self.session.close()
+
+    def _work(self):
+        """Arbeitet die Warteschlange ab, solange der Daemon läuft."""
+        while not self.stopped.is_set():
+            try:
+                settings = self.session.queue.get(timeout=0.5)
+            except Empty:
+                continue
+            self.running.set()
+            try:
+                self.session.run_one(settings)
+            except Exception:  # pylint: disable=broad-except
+                # der Daemon soll weiterlaufen, der Fehler ist über status abrufbar
+                self.last_error = traceback.format_exc()
+                print(self.last_error, flush=True)
+                try:
+                    self.measurement.idle_devices()
+                except Exception:  # pylint: disable=broad-except
+                    print(traceback.format_exc(), flush=True)
+            finally:
+                self.running.clear()
+
+    def handle(self, rfile, wfile):
+        for line in rfile:
+            try:
+                request = json.loads(line)
+                command = request.get("command")
+                if command == "stream":
+                    self.stream(wfile, request.get("since", 0))
+                    return
+                if command == "run":
+                    self.session.submit(MeasurementSettings.from_dict(request["settings"]))
+                    response = {"queued": self.session.queue.qsize()}
+                elif command == "status":
+                    response = self.status()
+                elif command == "shutdown":
+                    response = {"shutdown": True}
+                    Thread(target=self.server.shutdown, daemon=True).start()
+                else:
+                    response = {"error": f"Unknown command: {command}"}
+            except Exception as e:  # pylint: disable=broad-except
+                response = {"error": str(e)}
+            wfile.write((json.dumps(response) + "\n").encode())
+            wfile.flush()
+
+    def status(self) -> dict:
+        messdata = self.measurement.messdata
+        return {
+            "running": self.running.is_set(),
+            "queued": self.session.queue.qsize(),
+            "measurement": self.measurement.measurement_file_name,
+            "gradiant": messdata.curr_gradiant,
+            "index": messdata.curr_measurement_index,
+            "shape": list(messdata.measurements.shape),
+            "finished": self.session.finished,
+            "last_error": self.last_error,
+        }
+
+    def stream(self, wfile, since):
+        """Schickt jedes neue Spektrum als eine Zeile JSON, bis der Client die Verbindung trennt."""
+        messdata = self.measurement.messdata
+        seq = since
+        while not self.stopped.is_set():
+            if self.measurement.messdata is not messdata:
+                # eine neue Messung hat begonnen, ihr Ringpuffer zählt wieder ab 0
+                messdata = self.measurement.messdata
+                seq = 0
+            entries, seq = messdata.ring.read_since(seq)
+            try:
+                for entry in entries:
+                    wfile.write(
+                        (
+                            json.dumps(
+                                {
+                                    "measurement": self.measurement.measurement_file_name,
+                                    "seq": entry.seq,
+                                    "gradiant": entry.gradiant,
+                                    "index": entry.index,
+                                    "times_ns": entry.times_ns.tolist(),
+                                    "spectrum": entry.spectrum.tolist(),
+                                }
+                            )
+                            + "\n"
+                        ).encode()
+                    )
+                wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            time.sleep(self.STREAM_INTERVAL)
+
+
+class DaemonClient:
+    """Verbindet sich mit einem MeasurementDaemon."""
+
+    def __init__(self, socket_path: str, timeout=10):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def request(self, request: dict) -> dict:
+        with self._connect() as sock:
+            sock.sendall((json.dumps(request) + "\n").encode())
+            with sock.makefile("rb") as rfile:
+                response = json.loads(rfile.readline())
+        if "error" in response:
+            raise RuntimeError(f"daemon: {response['error']}")
+        return response
+
+    def run(self, settings: MeasurementSettings) -> dict:
+        return self.request({"command": "run", "settings": settings.to_dict()})
+
+    def status(self) -> dict:
+        return self.request({"command": "status"})
+
+    def shutdown(self) -> dict:
+        return self.request({"command": "shutdown"})
+
+    def stream(self, since=0):
+        """Generator über die gemessenen Spektren (als dict, siehe MeasurementDaemon.stream)."""
+        with self._connect() as sock:
+            # Spektren kommen nur, während gemessen wird
+            sock.settimeout(None)
+            sock.sendall((json.dumps({"command": "stream", "since": since}) + "\n").encode())
+            with sock.makefile("rb") as rfile:
+                for line in rfile:
+                    yield json.loads(line)
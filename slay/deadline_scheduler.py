@@ -0,0 +1,56 @@
+import time
+
+
+class DeadlineScheduler:
+    """
+    Taktet die Wiederholungen einer Messung auf feste Zeitpunkte start + n * period (time.monotonic_ns),
+    statt nach jeder Wiederholung relativ zu schlafen. Die Dauer des Auslesens wird so ausgeglichen und die Periode
+    driftet über lange Messungen nicht weg. Für jede Wiederholung wird die Verspätung gegenüber dem Raster festgehalten.
+    """
+
+    # die letzten Mikrosekunden wird aktiv gewartet, da time.sleep teilweise zu spät aufwacht
+    SPIN_NS = 200_000
+
+    def __init__(self, period_ms):
+        self.period_ns = int(period_ms * 1_000_000)
+        self.start_ns = time.monotonic_ns()
+        # Verspätung pro Wiederholung in ns
+        self.lateness_ns = []
+        # ns, insgesamt in wait verbracht (die Pausen zwischen den Wiederholungen)
+        self.waited_ns = 0
+
+    def start(self):
+        self.start_ns = time.monotonic_ns()
+        self.lateness_ns = []
+        self.waited_ns = 0
+
+    def deadline(self, n) -> int:
+        return self.start_ns + n * self.period_ns
+
+    def wait(self, n) -> int:
+        """Wartet bis zum Zeitpunkt der Wiederholung n und gibt die Verspätung in ns zurück."""
+        deadline = self.deadline(n)
+        wait_start_ns = time.monotonic_ns()
+        remaining = deadline - wait_start_ns
+        # time.sleep nutzt unter Linux clock_nanosleep auf CLOCK_MONOTONIC
+        if remaining > self.SPIN_NS:
+            time.sleep((remaining - self.SPIN_NS) / 1e9)
+        while time.monotonic_ns() < deadline:
+            pass
+        self.waited_ns += time.monotonic_ns() - wait_start_ns
+        return self.mark(n)
+
+    def mark(self, n) -> int:
+        """Hält die Verspätung der Wiederholung n fest, ohne zu warten (wenn z. B. die Firmware taktet)."""
+        lateness = time.monotonic_ns() - self.deadline(n)
+        self.lateness_ns.append(lateness)
+        return lateness
+
+    def summary(self) -> str:
+        if not self.lateness_ns:
+            return "no repetitions"
+        lateness_ms = [lateness / 1e6 for lateness in self.lateness_ns]
+        return (
+            f"period {self.period_ns / 1e6:.3f} ms, lateness: "
+            f"mean {sum(lateness_ms) / len(lateness_ms):.3f} ms, max {max(lateness_ms):.3f} ms"
+        )
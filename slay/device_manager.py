@@ -0,0 +1,92 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+
+# start/stop: Funktionen ohne Argumente. depends: Geräte, die vor dem Start fertig sein müssen,
+# stop_after: Geräte, die vor dem Stoppen bereits gestoppt sein müssen
+Device = namedtuple("Device", ["name", "start", "stop", "depends", "stop_after"])
+
+
+class DeviceManager:
+    """
+    Startet und stoppt die Geräte einer Messung parallel, jeweils in einem eigenen Thread.
+
+    Ein Gerät wartet nur auf die Geräte, von denen es abhängt, statt auf alle vorherigen. Für jedes Gerät wird
+    festgehalten, wie lange der Start gedauert hat. Fehler werden erst weitergegeben, wenn alle anderen Geräte
+    fertig sind (beim Stoppen werden so trotzdem alle Geräte heruntergefahren).
+    """
+
+    # s, wie oft wait_until die Bedingung prüft
+    POLL_INTERVAL = 0.2
+
+    def __init__(self):
+        # Name -> Device, in der Reihenfolge von add
+        self.devices = {}
+        # Name -> Sekunden
+        self.init_times = {}
+
+    def add(self, name, start, stop=None, depends=(), stop_after=()):
+        for dependency in (*depends, *stop_after):
+            if dependency not in self.devices:
+                # so kann es keine zyklischen Abhängigkeiten geben
+                raise ValueError(f"{name} depends on {dependency}, which has to be added first.")
+        self.devices[name] = Device(name, start, stop, tuple(depends), tuple(stop_after))
+
+    def start_all(self):
+        self._run_all(lambda device: device.depends, self._start, "started")
+
+    def stop_all(self):
+        self._run_all(
+            lambda device: device.stop_after,
+            lambda device: device.stop is not None and device.stop(),
+            "stopped",
+        )
+
+    def _run_all(self, dependencies, run, verb):
+        # ein Worker pro Gerät: ein Gerät, das auf seine Abhängigkeiten wartet, blockiert so keine anderen
+        with ThreadPoolExecutor(max_workers=max(1, len(self.devices))) as executor:
+            futures = {}
+            for device in self.devices.values():
+                futures[device.name] = executor.submit(
+                    self._run_after,
+                    device,
+                    [futures[name] for name in dependencies(device)],
+                    run,
+                )
+            errors = []
+            for name, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:  # pylint: disable=broad-except
+                    print(f"{name} could not be {verb}: {e}", flush=True)
+                    errors.append(e)
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _run_after(device, dependencies, run):
+        # schlägt eine Abhängigkeit fehl, wird das Gerät nicht gestartet (der Fehler wird weitergegeben)
+        for dependency in dependencies:
+            dependency.result()
+        run(device)
+
+    def _start(self, device):
+        start_time = time.perf_counter()
+        device.start()
+        self.init_times[device.name] = time.perf_counter() - start_time
+
+    @staticmethod
+    def wait_until(condition, name, timeout, poll_interval=None):
+        """Prüft condition alle POLL_INTERVAL Sekunden, statt eine feste Zeit zu warten."""
+        poll_interval = poll_interval or DeviceManager.POLL_INTERVAL
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{name} not ready after {timeout} seconds.")
+            time.sleep(poll_interval)
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name} {seconds:.2f} s" for name, seconds in self.init_times.items()
+        )
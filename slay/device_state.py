@@ -0,0 +1,48 @@
+class DeviceStateCache:
+    """
+    Merkt sich den zuletzt gesetzten Wert jeder Firmware-Variable und jedes NKT-/LTB-Registers,
+    damit beim Wechsel des Gradienten nur noch geänderte Werte an die Geräte geschickt werden.
+
+    Ein Wert wird erst nach erfolgreichem Senden eingetragen (record). Nach einem Reset/Neuverbinden
+    eines Geräts muss dessen Eintrag mit invalidate verworfen werden.
+    """
+
+    def __init__(self):
+        # Gerät -> {Name: Wert}
+        self.values = {}
+
+    def diff(self, device: str, values: dict, depends: dict = None) -> dict:
+        """
+        Gibt die Einträge aus values zurück, die sich vom zuletzt gesetzten Wert unterscheiden (Reihenfolge bleibt erhalten).
+        depends: Name -> Namen, bei deren Änderung der Wert erneut gesendet werden muss, auch wenn er gleich geblieben ist.
+        """
+        known = self.values.get(device, {})
+        changed = {
+            name: value
+            for name, value in values.items()
+            if name not in known or known[name] != value
+        }
+        if depends:
+            for name, value in values.items():
+                if name not in changed and any(
+                    dependency in changed for dependency in depends.get(name, ())
+                ):
+                    changed[name] = value
+            changed = {name: changed[name] for name in values if name in changed}
+        return changed
+
+    def record(self, device: str, values: dict):
+        self.values.setdefault(device, {}).update(values)
+
+    def invalidate(self, device: str = None):
+        if device is None:
+            self.values.clear()
+        else:
+            self.values.pop(device, None)
+
+    def cached(self, device: str, name: str, read):
+        """Für Werte, die sich nicht ändern (z. B. max_frequency des NKT): read wird nur beim ersten Mal aufgerufen."""
+        known = self.values.setdefault(device, {})
+        if name not in known:
+            known[name] = read()
+        return known[name]
@@ -0,0 +1,76 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+
+# Einstellungen eines Gradienten pro Gerät (siehe Measurement.plan_gradient)
+GradientPlan = namedtuple(
+    "GradientPlan", ["index", "mcu_variables", "nkt_registers", "ltb_settings"]
+)
+
+
+class GradientScheduler:
+    """
+    Wechselt zwischen den Gradienten einer Messung.
+
+    Mit PIPELINE_GRADIENTS wird der nächste Gradient bereits während der Messung des aktuellen vorbereitet:
+    die Einstellungen werden berechnet und geprüft, und Geräte, die im aktuellen Gradienten nicht genutzt werden,
+    schon eingestellt (siehe Measurement.pre_apply_gradient). Beim Wechsel muss dann nur noch der Rest gesendet werden.
+    """
+
+    def __init__(self, measurement_manager):
+        self.measurement_manager = measurement_manager
+        # ein Worker, damit die Geräte nie von zwei Vorbereitungen gleichzeitig angesprochen werden
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        # Gradient -> Future mit (GradientPlan, Dauer der Vorbereitung)
+        self.pending = {}
+        # Sekunden
+        self.dead_time = 0.0
+        self.prepared_time = 0.0
+        self.switches = 0
+
+    def prepare_async(self, index):
+        """Bereitet den Gradienten index im Hintergrund vor (während index - 1 misst)."""
+        if (
+            index >= self.measurement_manager.MEASUREMENT_SETTINGS.laser.num_gradiants
+            or index in self.pending
+        ):
+            return
+        self.pending[index] = self.executor.submit(self._prepare, index, index - 1)
+
+    def _prepare(self, index, current_index):
+        start_time = time.perf_counter()
+        plan = self.measurement_manager.plan_gradient(index)
+        self.measurement_manager.pre_apply_gradient(plan, current_index)
+        return plan, time.perf_counter() - start_time
+
+    def switch_to(self, index):
+        """Stellt die Geräte auf den Gradienten index ein. Die Zeit bis dahin wird als Totzeit gezählt."""
+        start_time = time.perf_counter()
+
+        future = self.pending.pop(index, None)
+        if future is None:
+            plan = self.measurement_manager.plan_gradient(index)
+        else:
+            # Fehler der Vorbereitung werden hier weitergegeben
+            plan, prepared_time = future.result()
+            self.prepared_time += prepared_time
+        self.measurement_manager.apply_gradient(plan)
+
+        self.dead_time += time.perf_counter() - start_time
+        self.switches += 1
+
+    def finish(self):
+        # nicht mehr benötigte Vorbereitungen (z. B. nach einem Abbruch) abwarten
+        for future in self.pending.values():
+            future.cancel()
+        self.executor.shutdown(wait=True)
+        self.pending.clear()
+
+        if self.switches == 0:
+            return
+        print(
+            f"gradient switching: {self.dead_time * 1000:.1f} ms dead time for {self.switches} gradients, "
+            f"{self.prepared_time * 1000:.1f} ms saved by preparing during the acquisition",
+            flush=True,
+        )
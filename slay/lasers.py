@@ -265,22 +265,28 @@ class LTB:
     def turn_laser_off(self) -> None:
         self._send_command("X")
 
-    def turn_laser_on(self) -> None:
+    def turn_laser_on(self, wait: bool = True) -> None:
+        """wait=False: nur einschalten, ob er bereit ist, kann dann mit is_ready abgefragt werden."""
         self._send_command("g")
+        if not wait:
+            return
         start_time = time.time()
         while time.time() - start_time < 20:
             try:
-                status = self.get_extended_status()
-                if (
-                    status.flags1 & LaserFlags1.LASER_READY
-                    and status.flags1 & LaserFlags1.LASER_ON
-                ):
+                if self.is_ready():
                     return
                 time.sleep(1)
             except LaserProtocolError:
                 pass
         raise LaserError("Laser not ready after 20 seconds")
 
+    def is_ready(self) -> bool:
+        status = self.get_extended_status()
+        return bool(
+            status.flags1 & LaserFlags1.LASER_READY
+            and status.flags1 & LaserFlags1.LASER_ON
+        )
+
     def start_repetition_mode(self) -> None:
         status = self.get_extended_status()
         if status.mode != LaserMode.OFF:
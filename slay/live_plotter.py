@@ -24,7 +24,8 @@ class LivePlotter:
         #     [], [], label="Mittelwert von 0 Messungen", s=5
         # )
 
-        self.past_measurement_index = -1
+        # Sequenznummer des zuletzt geplotteten Spektrums
+        self.past_seq = -1
 
         # plt.ion()
         # plt.show()
@@ -53,7 +54,6 @@ class LivePlotter:
             # return
 
         wav = messdata.wav
-        measurements = messdata.measurements
 
         # trying to calculate a signal to noise ratio...
         # mean_measurement = np.mean(measurements, axis=0)
@@ -63,19 +63,14 @@ class LivePlotter:
         #     snr[~np.isfinite(snr)] = 0  # set inf and NaN to 0
         # print(snr)
 
-        curr_measurement_index = messdata.curr_measurement_index
-        curr_gradiant = messdata.curr_gradiant
-
-        if (
-            len(measurements) == 0
-            or curr_measurement_index < 0
-            or self.past_measurement_index == curr_measurement_index
-        ):
+        # aus dem Ringpuffer statt aus messdata.measurements: Spektrum und Index passen dort immer zusammen
+        entry = messdata.ring.latest()
+        if entry is None or entry.seq == self.past_seq:
             return
 
-        measurement = measurements[curr_gradiant][curr_measurement_index]
+        measurement = entry.spectrum
 
-        label = f"Spektrum von Messung {curr_measurement_index + 1}"
+        label = f"Spektrum von Messung {entry.index + 1}"
         self.live_ax.clear()
 
         settings = SpectrumPlot.GraphSettings(
@@ -83,7 +78,7 @@ class LivePlotter:
         )
         SpectrumPlot.data_to_plot(settings)
 
-        self.past_measurement_index = curr_measurement_index
+        self.past_seq = entry.seq
 
         # self.live_ax.scatter([], [], label="Mittelwert von 0 Messungen", s=5)
 
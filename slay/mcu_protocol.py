@@ -0,0 +1,221 @@
+"""
+Protokolle für die Kommunikation mit der laser-control-firmware.
+
+TextProtocol ist das ursprüngliche ASCII-Protokoll (ein Zeichen pro Befehl, danach wird blind SERIAL_DELAY gewartet).
+BinaryProtocol schickt Frames der Form
+
+    SOF | Typ | ID | Länge | Payload | Checksumme
+
+(Checksumme: Summe über Typ bis Payload, mod 256), auf die die Firmware mit einem ACK oder NACK (gleiche ID) antwortet.
+Es wird also nur so lange gewartet, wie die Firmware tatsächlich braucht, und verlorene Befehle werden erneut gesendet.
+
+Der MCU wird beim Öffnen des Ports nicht zurückgesetzt (DTR aus). Jedes Protokoll beginnt daher mit einem SESSION-Frame
+(start_session): die Firmware vergisst den letzten Frame der vorherigen Sitzung und verwirft im Binärmodus alle Bytes
+außerhalb von Frames (außer dem watchdog), statt sie als ASCII-Befehle auszuführen.
+"""
+
+from collections import namedtuple
+from enum import IntEnum
+import struct
+import time
+
+
+SOF = 0xA5
+# Namen der Firmware-Variablen sind auf sechs Zeichen begrenzt
+VAR_NAME_LENGTH = 6
+# Name und int32
+VAR_LENGTH = VAR_NAME_LENGTH + 4
+# reicht für 16 Variablen in einem SET_VARS
+MAX_PAYLOAD_LENGTH = 16 * VAR_LENGTH
+
+
+class FrameType(IntEnum):
+    # Host -> Firmware
+    SET_VAR = 0x01  # Payload: Name (sechs Bytes) + int32 (little endian)
+    SET_VARS = 0x06  # Payload: mehrere SET_VAR-Payloads hintereinander, werden gemeinsam übernommen
+    LASER_OFF = 0x02
+    LASER_ON = 0x03
+    START_SCHEDULE = 0x05
+    SESSION = 0x07  # Payload: ein Byte, BINARY_SESSION oder TEXT_SESSION
+    # Firmware -> Host
+    ACK = 0x80
+    NACK = 0x81
+
+
+# Payload eines SESSION-Frames
+TEXT_SESSION = 0
+BINARY_SESSION = 1
+
+
+Frame = namedtuple("Frame", ["type", "id", "payload"])
+
+
+class MCUProtocolError(Exception):
+    """Die Firmware hat einen Befehl auch nach mehreren Versuchen nicht bestätigt."""
+
+
+def checksum(data: bytes) -> int:
+    return sum(data) % 256
+
+
+def encode_frame(frame_type: int, frame_id: int, payload: bytes = b"") -> bytes:
+    if len(payload) > MAX_PAYLOAD_LENGTH:
+        raise ValueError(f"The payload is too long ({len(payload)} bytes).")
+    body = bytes((frame_type, frame_id, len(payload))) + payload
+    return bytes((SOF,)) + body + bytes((checksum(body),))
+
+
+def encode_variable(name: str, value: int) -> bytes:
+    if len(name) > VAR_NAME_LENGTH:
+        raise ValueError(f"The name {name} is longer than {VAR_NAME_LENGTH} chars.")
+    return name.encode().ljust(VAR_NAME_LENGTH, b"\0") + struct.pack("<i", int(value))
+
+
+def decode_variable(payload: bytes):
+    if len(payload) < VAR_LENGTH:
+        raise ValueError(f"Invalid payload length {len(payload)}.")
+    name = payload[:VAR_NAME_LENGTH].rstrip(b"\0").decode()
+    (value,) = struct.unpack("<i", payload[VAR_NAME_LENGTH:VAR_LENGTH])
+    return name, value
+
+
+def encode_variables(variables: dict) -> bytes:
+    return b"".join(encode_variable(name, value) for name, value in variables.items())
+
+
+def decode_variables(payload: bytes) -> dict:
+    if len(payload) % VAR_LENGTH != 0:
+        raise ValueError(f"Invalid payload length {len(payload)}.")
+    return dict(
+        decode_variable(payload[i : i + VAR_LENGTH])
+        for i in range(0, len(payload), VAR_LENGTH)
+    )
+
+
+def read_frame(ser):
+    """
+    Liest den nächsten Frame von ser. Bytes vor dem SOF (z. B. die Sync-Bytes einer Pulsfolge) werden verworfen.
+    Gibt None zurück, wenn innerhalb von ser.timeout kein (gültiger) Frame ankommt.
+    """
+    while True:
+        start = ser.read(1)
+        if not start:
+            return None
+        if start[0] == SOF:
+            break
+
+    header = ser.read(3)
+    if len(header) < 3:
+        return None
+    rest = ser.read(header[2] + 1)
+    if len(rest) < header[2] + 1:
+        return None
+    if checksum(header + rest[:-1]) != rest[-1]:
+        return None
+    return Frame(header[0], header[1], bytes(rest[:-1]))
+
+
+class TextProtocol:
+
+    def __init__(self, ser, serial_delay_ms):
+        self.ser = ser
+        self.serial_delay_ms = serial_delay_ms
+
+    def _write(self, data: bytes):
+        self.ser.write(data)
+        time.sleep(self.serial_delay_ms / 1000.0)
+
+    def start_session(self):
+        # eine vorherige Sitzung kann die Firmware im Binärmodus gelassen haben
+        self._write(encode_frame(FrameType.SESSION, 0, bytes((TEXT_SESSION,))))
+        # das ACK wird im Text-Protokoll nicht gelesen
+        self.ser.reset_input_buffer()
+
+    def set_variable(self, name: str, value: int):
+        # 2 ist der Char-Code für "Variable setzen" (siehe Firmware-Code)
+        self._write(f"2{name}={value}\n".encode())
+
+    def set_variables(self, variables: dict):
+        # 5 ist der Char-Code für "mehrere Variablen setzen", die Paare sind durch Kommas getrennt
+        self._write(
+            ("5" + ",".join(f"{name}={value}" for name, value in variables.items()) + "\n").encode()
+        )
+
+    def laser_on(self):
+        self._write(b"1")
+
+    def laser_off(self):
+        self._write(b"0")
+
+    def start_schedule(self):
+        self._write(b"4")
+
+
+class BinaryProtocol:
+
+    def __init__(self, ser, ack_timeout=0.2, retries=3):
+        self.ser = ser
+        # Sekunden, die pro Versuch auf ein ACK gewartet wird
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.next_id = 0
+        # Statistik, um verlorene Befehle erkennen zu können
+        self.resent_frames = 0
+        self.nacks = 0
+
+    def _send(self, frame_type: FrameType, payload: bytes = b""):
+        frame_id = self.next_id
+        self.next_id = (self.next_id + 1) % 256
+        frame = encode_frame(frame_type, frame_id, payload)
+
+        serial_timeout = self.ser.timeout
+        self.ser.timeout = self.ack_timeout
+        try:
+            for attempt in range(self.retries):
+                if attempt > 0:
+                    self.resent_frames += 1
+                    print(
+                        f"MCU: resending {frame_type.name} (id {frame_id}), attempt {attempt + 1}/{self.retries}",
+                        flush=True,
+                    )
+                self.ser.write(frame)
+                reply = self._wait_for_reply(frame_id)
+                if reply is None:
+                    continue
+                if reply.type == FrameType.ACK:
+                    return
+                self.nacks += 1
+        finally:
+            self.ser.timeout = serial_timeout
+
+        raise MCUProtocolError(
+            f"The MCU did not acknowledge {frame_type.name} (id {frame_id}) after {self.retries} attempts."
+        )
+
+    def _wait_for_reply(self, frame_id: int):
+        while True:
+            reply = read_frame(self.ser)
+            if reply is None:
+                return None
+            # verspätete Antworten auf frühere Befehle überspringen
+            if reply.id == frame_id and reply.type in (FrameType.ACK, FrameType.NACK):
+                return reply
+
+    def start_session(self):
+        # die IDs beginnen wieder bei 0 und könnten sonst dem letzten Frame der vorherigen Sitzung gleichen
+        self._send(FrameType.SESSION, bytes((BINARY_SESSION,)))
+
+    def set_variable(self, name: str, value: int):
+        self._send(FrameType.SET_VAR, encode_variable(name, value))
+
+    def set_variables(self, variables: dict):
+        self._send(FrameType.SET_VARS, encode_variables(variables))
+
+    def laser_on(self):
+        self._send(FrameType.LASER_ON)
+
+    def laser_off(self):
+        self._send(FrameType.LASER_OFF)
+
+    def start_schedule(self):
+        self._send(FrameType.START_SCHEDULE)
@@ -8,10 +8,26 @@ from slay.lasers import LaserProtocolError
 from slay.camera import USBCamera
 from slay.live_plotter import LivePlotter
 from slay.backup_service import BackupService
+from slay.chunk_store import ChunkStore
+from slay.chunk_codec import ZlibCodec
+from slay.device_state import DeviceStateCache
+from slay.gradient_scheduler import GradientPlan, GradientScheduler
+from slay.deadline_scheduler import DeadlineScheduler
+from slay.mcu_protocol import BinaryProtocol, TextProtocol
+from slay.spectrum_data import SpectrumData
+from slay.spectrum_buffer import SpectrometerReader
+from slay.running_stats import RunningStats
+from slay.wavelength_major import WavelengthMajor
+from slay.measurement_loader import MeasurementLoader
+from slay.convergence import ConvergenceCheck
+from slay.auto_exposure import AutoExposure
+from slay.spectrometer_session import SpectrometerSession
+from slay.wavelength_cache import WavelengthCache
+from slay.device_manager import DeviceManager
 
 from multiprocessing import Process
-from threading import Thread, Event
-import concurrent.futures
+import multiprocessing
+from threading import Thread
 import traceback
 import serial
 import sys
@@ -32,24 +48,17 @@ except Exception as e:
     print(f"Failed to load IPython for the formatting of errors: {e}")
 
 
-class SpectrumData:
-    def __init__(self, num_gradiants, repetitions, wav):
-        self.measurements = np.zeros(
-            (num_gradiants, repetitions, len(wav)), dtype=float
-        )
-        self.timestamps = np.zeros((num_gradiants, repetitions), dtype=float)
-        self.wav = wav
-        self.curr_gradiant = -1
-        self.curr_measurement_index = -1
-        self.stop_event = Event()
-
-    def get_data(self):
-        return self.measurements, self.wav, self.curr_measurement_index
-
-
 class Measurement:
     """Wrapper für die Durchführung von slay."""
 
+    # Variablen, die in der Firmware als (unsigned) long gespeichert werden
+    LONG_FIRMWARE_VARIABLES = ("ExpDel", "OnTime", "OffTim", "NumRep", "SyncDl")
+    # ledcChangeFrequency setzt den Duty Cycle neu auf, daher muss er nach einer Änderung von Auflösung/Frequenz erneut gesendet werden
+    FIRMWARE_VARIABLE_DEPENDENCIES = {
+        "Dut405": ("Res405", "Frq405"),
+        "Dut445": ("Res445", "Frq445"),
+    }
+
     def is_docker(self):
         from pathlib import Path
 
@@ -95,46 +104,89 @@ class Measurement:
         self.DEBUG = DEBUG
 
         self.MEASUREMENT_SETTINGS = MEASUREMENT_SETTINGS
+        # zuletzt an die Geräte gesendete Werte, damit zwischen Gradienten nur Änderungen übertragen werden
+        self.device_state = DeviceStateCache()
+        # Wellenlängenkalibrierung pro Spektrometer, damit sie nicht bei jedem Start gelesen werden muss
+        self.wavelength_cache = WavelengthCache(user_cache_dir("slay"))
+        self.wavelength_calibration = None
+        # prüft im Hintergrund, ob die Kalibrierung aus dem Cache noch stimmt (siehe get_wav)
+        self.wav_validation = None
+        # für weitere Messungen mit denselben Geräten (siehe reset)
+        self.cam_path = cam_path
+        self.cache_dir = cache_dir
+        self.measurements_dir = measurements_dir
 
         start_time = time.time()
 
-        # für das Spektrometer und den LTb muss jeweils ziemlich lange gewartet werden
-        # (bei dem Spektrometer je nach Integrationszeit, da bei der Initialisierung eine erste Messung durchgeführt wird)
-        init_tasks = (
-            (self.init_spectrometer, ()),
-            (self.init_mcu, (serial_path, 3)),
-            (self.init_nkt, (nkt_path,)),
-            # (self.init_ltb, (ltb_path,)),
+        # für das Spektrometer und den LTB muss jeweils ziemlich lange gewartet werden
+        # (bei dem Spektrometer je nach Integrationszeit, da bei der Initialisierung eine erste Messung durchgeführt wird,
+        # der LTB muss sich aufwärmen). Deshalb werden alle Geräte gleichzeitig gestartet.
+        self.device_manager = DeviceManager()
+        self.device_manager.add(
+            "spectrometer", self.init_spectrometer, self.stop_spectrometer
         )
-
-        # ProcessPoolExecutor funktioniert nur, wenn die Funktionen/Argumente gepickelt werden können (außerhalb der Klasse definiert etc.)
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [executor.submit(func, *args) for func, args in init_tasks]
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-
-        # self.init_spectrometer()
-        # self.init_mcu(serial_path, wait=3)
-        # self.init_nkt(nkt_path)
-        self.init_ltb(ltb_path)
-
-        self.messdata = SpectrumData(
-            self.MEASUREMENT_SETTINGS.laser.num_gradiants,
-            self.MEASUREMENT_SETTINGS.laser.REPETITIONS,
-            self.get_wav(),
+        self.device_manager.add(
+            "mcu", lambda: self.init_mcu(serial_path, 3), self.stop_mcu
+        )
+        # emission 0 gibt einen Fehler, wenn external gate weiterhin "LASER AN!!!!" schreit: erst die Laser ausschalten
+        self.device_manager.add(
+            "nkt", lambda: self.init_nkt(nkt_path), self.stop_nkt, stop_after=("mcu",)
         )
+        # der LTB wärmt sich parallel zur Firmware auf
+        self.device_manager.add(
+            "ltb",
+            lambda: self.init_ltb(ltb_path),
+            self.stop_ltb,
+            stop_after=("mcu",),
+        )
+        # der externe Trigger des LTB wird erst aktiviert, wenn die Firmware läuft (die Trigger-Leitung also definiert ist)
+        self.device_manager.add(
+            "ltb_trigger", self.activate_ltb_trigger, depends=("mcu", "ltb")
+        )
+        self.device_manager.start_all()
+        print(f"device init: {self.device_manager.summary()}", flush=True)
 
-        self.set_laser_powers(0)
-        # aktuell noch keine Output-Power
-        self.led_green()
+        self.prepare_run()
         print(
             f"Finished initializing the measurement in {time.time() - start_time:.2f} seconds.",
             flush=True,
         )
+
+    def reset(self, MEASUREMENT_SETTINGS: MeasurementSettings):
+        """
+        Bereitet eine weitere Messung mit neuen Einstellungen vor, ohne die Geräte neu zu verbinden
+        (siehe MeasurementSession). Neu angelegt werden nur die Messdaten und die Ausgabepfade.
+        """
+        self.spectrometer_reader.stop()
+        self.MEASUREMENT_SETTINGS = MEASUREMENT_SETTINGS
+
+        # SERIAL_DELAY bzw. BINARY_PROTOCOL können sich geändert haben. Der Zustand der Firmware bleibt aber bekannt
+        if isinstance(self.mcu_protocol, TextProtocol) and not self.MEASUREMENT_SETTINGS.laser.BINARY_PROTOCOL:
+            self.mcu_protocol.serial_delay_ms = self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY
+        else:
+            self.mcu_protocol = self.make_mcu_protocol()
+        # wird nur gesendet, wenn es sich geändert hat (siehe SpectrometerSession)
+        self.set_inttime(self.MEASUREMENT_SETTINGS.specto.INTTIME)
+
+        self.prepare_run()
+
+    def prepare_run(self):
+        """Legt alles an, was nur für eine Messung gilt (Speicherort, Messdaten, Backup, ...)."""
+        self.auto_exposure = (
+            AutoExposure(
+                self.MEASUREMENT_SETTINGS.specto.INTTIME_MIN,
+                self.MEASUREMENT_SETTINGS.specto.INTTIME_MAX,
+            )
+            if self.MEASUREMENT_SETTINGS.specto.AUTO_EXPOSURE
+            else None
+        )
+
         # Speicherort definieren
         measurement_type = "DEBUG" if self.DEBUG else self.MEASUREMENT_SETTINGS.TYPE
 
-        self.measurement_save_dir = os.path.join(measurements_dir, measurement_type)
+        self.measurement_save_dir = os.path.join(
+            self.measurements_dir, measurement_type
+        )
         # manche Dateisysteme unterstützen keinen Doppelpunkt im Dateinamen
         self.measurement_file_name = (
             "overwrite-messung"
@@ -142,13 +194,45 @@ class Measurement:
             else str(datetime.datetime.now()).replace(":", "_")
         )
 
+        memmap_path = ""
+        if self.MEASUREMENT_SETTINGS.MEMMAP:
+            os.makedirs(self.measurement_save_dir, 0o777, exist_ok=True)
+            memmap_path = os.path.join(
+                self.measurement_save_dir,
+                self.measurement_file_name + SpectrumPlot.MEMMAP_SUFFIX,
+            )
+
+        self.messdata = SpectrumData(
+            self.MEASUREMENT_SETTINGS.laser.num_gradiants,
+            self.MEASUREMENT_SETTINGS.laser.REPETITIONS,
+            self.get_wav(),
+            memmap_path,
+            # der Messprozess schreibt dann direkt in die Arrays (siehe measure)
+            shared=self.MEASUREMENT_SETTINGS.ACQUISITION_PROCESS,
+            dtype=self.MEASUREMENT_SETTINGS.STORAGE_DTYPE,
+            # Statistik und Konvergenz vergleichen bei AUTO_EXPOSURE sonst Spektren verschiedener Integrationszeiten
+            inttime=self.MEASUREMENT_SETTINGS.specto.INTTIME,
+        )
+
+        # ab hier wird das Spektrometer während der Messung nur noch vom Reader-Thread gelesen
+        self.spectrometer_reader = SpectrometerReader(self.get_data, self.messdata.ring)
+
+        self.set_laser_powers(0)
+        # aktuell noch keine Output-Power
+        self.led_green()
+
         self.cam = USBCamera(
-            cam_path,
+            self.cam_path,
             os.path.join(self.measurement_save_dir, self.measurement_file_name),
         )
-        self.backup_service = BackupService(self, self.messdata, cache_dir)
+        self.backup_service = BackupService(self, self.messdata, self.cache_dir)
+        self.gradient_scheduler = GradientScheduler(self)
 
     def set_laser_powers(self, index):
+        self.apply_gradient(self.plan_gradient(index))
+
+    def plan_gradient(self, index) -> GradientPlan:
+        """Berechnet und prüft die Geräteeinstellungen eines Gradienten, ohne etwas an die Geräte zu senden."""
 
         max_pwm_counts_445 = (
             pow(2, self.MEASUREMENT_SETTINGS.laser.PWM_RES_BITS_445[index]) - 1
@@ -161,80 +245,69 @@ class Measurement:
         assert 0 <= self.MEASUREMENT_SETTINGS.laser.PWM_DUTY_PERC_445[index] <= 100
         assert 0 <= self.MEASUREMENT_SETTINGS.laser.INTENSITY_NKT[index] <= 100
 
-        self.set_firmware_variable(
-            "Dut405",
-            int(
+        expected_delay = (
+            # mit REPETITION_PERIOD liegen die Wiederholungen (mindestens) eine Periode auseinander
+            max(
+                self.MEASUREMENT_SETTINGS.laser.MEASUREMENT_DELAY,
+                self.MEASUREMENT_SETTINGS.laser.REPETITION_PERIOD,
+            )
+            + (
+                self.MEASUREMENT_SETTINGS.laser.IRRADITION_TIME
+                + self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY * 2
+                if not self.MEASUREMENT_SETTINGS.laser.CONTINOUS
+                else 0
+            )
+            + self.max_inttime()
+            + self.MEASUREMENT_SETTINGS.WATCHDOG_GRACE
+        )
+
+        # Auflösung und Frequenz vor dem Duty Cycle, damit dieser nicht mit der alten Auflösung geschrieben wird
+        mcu_variables = {
+            "Res405": self.MEASUREMENT_SETTINGS.laser.PWM_RES_BITS_405[index],
+            "Res445": self.MEASUREMENT_SETTINGS.laser.PWM_RES_BITS_445[index],
+            "Frq405": self.MEASUREMENT_SETTINGS.laser.PWM_FREQ_405[index],
+            "Frq445": self.MEASUREMENT_SETTINGS.laser.PWM_FREQ_445[index],
+            "Dut405": int(
                 self.MEASUREMENT_SETTINGS.laser.PWM_DUTY_PERC_405[index]
                 * max_pwm_counts_405
             ),
-        )
-        self.set_firmware_variable(
-            "Dut445",
-            int(
+            "Dut445": int(
                 (self.MEASUREMENT_SETTINGS.laser.PWM_DUTY_PERC_445[index] / 100.0)
                 * max_pwm_counts_445
             ),
-        )
-        self.set_firmware_variable(
-            "Frq405", self.MEASUREMENT_SETTINGS.laser.PWM_FREQ_405[index]
-        )
-        self.set_firmware_variable(
-            "Frq445", self.MEASUREMENT_SETTINGS.laser.PWM_FREQ_445[index]
-        )
-        self.set_firmware_variable(
-            "Res405", self.MEASUREMENT_SETTINGS.laser.PWM_RES_BITS_405[index]
-        )
-        self.set_firmware_variable(
-            "Res445", self.MEASUREMENT_SETTINGS.laser.PWM_RES_BITS_445[index]
-        )
-        self.set_firmware_variable(
-            "FrqLTB", self.MEASUREMENT_SETTINGS.laser.REPETITIONS_LTB[index]
+            "FrqLTB": self.MEASUREMENT_SETTINGS.laser.REPETITIONS_LTB[index],
+            "ConMea": int(self.MEASUREMENT_SETTINGS.laser.CONTINOUS),
+            "ExpDel": expected_delay,
+        }
+        for name, value in mcu_variables.items():
+            self.check_firmware_variable(name, value)
+
+        # ändert sich nicht, wird daher nur einmal gelesen
+        max_freq = self.device_state.cached(
+            "nkt", "max_frequency", lambda: self.nkt.get_register("max_frequency")
+        )  # 21502
+        # um auch Bruchteile zu erlauben
+        freq = int(
+            max_freq * (self.MEASUREMENT_SETTINGS.laser.INTENSITY_NKT[index] / 100.0)
         )
 
-        self.set_firmware_variable(
-            "ConMea", int(self.MEASUREMENT_SETTINGS.laser.CONTINOUS)
+        return GradientPlan(
+            index,
+            mcu_variables,
+            # external trigger off (laser on on low signal)
+            {"pulse_frequency": freq, "operating_mode": 5},
+            {"hv_voltage": self.MEASUREMENT_SETTINGS.laser.INTENSITY_LTB[index]},
         )
 
-        self.set_firmware_variable(
-            "ExpDel",
-            (
-                self.MEASUREMENT_SETTINGS.laser.MEASUREMENT_DELAY
-                + (
-                    self.MEASUREMENT_SETTINGS.laser.IRRADITION_TIME
-                    + self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY * 2
-                    if not self.MEASUREMENT_SETTINGS.laser.CONTINOUS
-                    else 0
-                )
-                + self.MEASUREMENT_SETTINGS.specto.INTTIME
-                + self.MEASUREMENT_SETTINGS.WATCHDOG_GRACE
-            ),
-        )
+    def apply_gradient(self, plan: GradientPlan):
+        """Sendet die (geänderten) Einstellungen eines mit plan_gradient berechneten Gradienten an die Geräte."""
 
-        print(
-            "Watchdog gesetzt auf: "
-            + str(
-                self.MEASUREMENT_SETTINGS.laser.MEASUREMENT_DELAY
-                + (
-                    self.MEASUREMENT_SETTINGS.laser.IRRADITION_TIME
-                    + self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY * 2
-                    if not self.MEASUREMENT_SETTINGS.laser.CONTINOUS
-                    else 0
-                )
-                + self.MEASUREMENT_SETTINGS.specto.INTTIME
-                + self.MEASUREMENT_SETTINGS.WATCHDOG_GRACE
-            )
-        )
+        # alles in einem Befehl, die Firmware übernimmt die Werte erst, wenn alle angekommen sind.
+        self.update_firmware_variables(plan.mcu_variables)
+        print("Watchdog gesetzt auf: " + str(plan.mcu_variables["ExpDel"]))
 
-        max_freq = self.nkt.get_register("max_frequency")  # 21502
-        print(f"NKT: max freq is {max_freq}")
-        # um auch Bruchteile zu erlauben
-        freq = int(
-            max_freq * (self.MEASUREMENT_SETTINGS.laser.INTENSITY_NKT[index] / 100.0)
-        )
-        self.nkt.set_register("pulse_frequency", freq)
-        print(f"NKT: Frequenz auf {freq} gesetzt.")
-        # external trigger off (laser on on low signal)
-        self.nkt.set_register("operating_mode", 5)
+        print(f"NKT: max freq is {self.device_state.values['nkt']['max_frequency']}")
+        self.update_nkt_registers(plan.nkt_registers)
 
         # # falls er davor ausging, da [index-1] 0 war.
         # try:
@@ -242,12 +315,44 @@ class Measurement:
         #     self.ltb.activate_external_trigger()
         # except LaserProtocolError as e:
         #     print(f"Could not run activate_external_trigger() again: {e} ", flush=True)
-        self.ltb.set_hv_voltage(self.MEASUREMENT_SETTINGS.laser.INTENSITY_LTB[index])
+        if self.device_state.diff("ltb", plan.ltb_settings):
+            self.ltb.set_hv_voltage(plan.ltb_settings["hv_voltage"])
+            self.device_state.record("ltb", plan.ltb_settings)
         # wird jetzt auch über den mcu getriggert
         # self.ltb.set_repetition_rate(
         #     self.MEASUREMENT_SETTINGS.laser.REPETITIONS_LTB[index]
         # )
 
+    def pre_apply_gradient(self, plan: GradientPlan, current_index):
+        """
+        Setzt während der Messung von current_index schon die Einstellungen des nächsten Gradienten,
+        allerdings nur für Geräte, die in current_index nicht genutzt werden (siehe GradientScheduler).
+        """
+        # der NKT ist dann ausgeschaltet (emission 0, siehe enable_nkt), die Frequenz kann also schon gesetzt werden
+        if self.device_state.values.get("nkt", {}).get("emission") == 0:
+            self.update_nkt_registers(plan.nkt_registers)
+
+    def nkt_is_used(self, index) -> bool:
+        return self.MEASUREMENT_SETTINGS.laser.INTENSITY_NKT[index] > 0
+
+    def enable_nkt(self):
+        """Schaltet die Emission des NKT für den aktuellen Gradienten an."""
+        # auch, wenn Emission schon an ist, wird der LASER extern vom MCU getriggert
+        # (Emission muss jedoch erst an sein, bevor der LASER extern getriggert werden kann)
+        if not self.MEASUREMENT_SETTINGS.PIPELINE_GRADIENTS or self.nkt_is_used(
+            self.messdata.curr_gradiant
+        ):
+            self.nkt.set_register("emission", 1)
+            self.device_state.record("nkt", {"emission": 1})
+            return
+
+        # wird der NKT in diesem Gradienten nicht genutzt, bleibt er aus, damit der nächste Gradient während der Messung vorbereitet werden kann
+        if self.device_state.diff("nkt", {"emission": 0}):
+            # emission 0 gibt einen Fehler, wenn das external gate noch an ist
+            self.turn_off_laser()
+            self.nkt.set_register("emission", 0)
+            self.device_state.record("nkt", {"emission": 0})
+
     def init_mcu(self, port, wait):
         """Verbindet sich mit dem ArduMMCUCUino."""
         try:
@@ -270,18 +375,66 @@ class Measurement:
             self.mcu.flush()
         except serial.serialutil.SerialException as e:
             print(f"Failed to connect to the MCU: {e}")
-            print("You may have to unplug and replug the MCU.")
-            raise e
+            if not self.DEBUG:
+                print("You may have to unplug and replug the MCU.")
+                raise e
 
-            class MCU:
-                def write(self, value):
-                    pass
+            print("using virtual MCU")
+            from slay.virtual import MCU
 
             self.mcu = MCU()
 
+        # nach einem (Neu-)Verbinden ist der Zustand der Firmware unbekannt
+        self.device_state.invalidate("mcu")
+        self.mcu_protocol = self.make_mcu_protocol()
+
+    def make_mcu_protocol(self):
+        if self.MEASUREMENT_SETTINGS.laser.BINARY_PROTOCOL:
+            protocol = BinaryProtocol(self.mcu)
+        else:
+            protocol = TextProtocol(
+                self.mcu, self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY
+            )
+        # die Firmware überlebt das Trennen, ihr Zustand aus der vorherigen Sitzung wird zurückgesetzt
+        protocol.start_session()
+        return protocol
+
     def set_firmware_variable(self, name, value):
-        # # int hat fünf chars als Maximum der Dezimalschreibweise. ExpDel ist schon auf long umgestellt (zehn Chars)
-        if "ExpDel" not in name:
+        self.check_firmware_variable(name, value)
+        print(f"setting: {name}={value}")
+        self.mcu_protocol.set_variable(name, value)
+        self.device_state.record("mcu", {name: value})
+
+    def set_firmware_variables(self, variables: dict):
+        """Setzt mehrere Variablen mit einem einzigen Befehl (die Firmware übernimmt sie gemeinsam)."""
+        for name, value in variables.items():
+            self.check_firmware_variable(name, value)
+        # unabhängig vom Protokoll (der Befehl selbst ist bei BINARY_PROTOCOL ein Frame)
+        print(
+            "setting: " + ", ".join(f"{name}={value}" for name, value in variables.items())
+        )
+        self.mcu_protocol.set_variables(variables)
+        self.device_state.record("mcu", variables)
+
+    def update_firmware_variables(self, variables: dict):
+        """Wie set_firmware_variables, sendet aber nur die Variablen, die sich seit dem letzten Setzen geändert haben."""
+        changed = self.device_state.diff(
+            "mcu", variables, self.FIRMWARE_VARIABLE_DEPENDENCIES
+        )
+        if not changed:
+            print("MCU: no variables changed")
+            return
+        self.set_firmware_variables(changed)
+
+    def update_nkt_registers(self, registers: dict):
+        """Setzt nur die NKT-Register, deren Wert sich seit dem letzten Setzen geändert hat."""
+        for name, value in self.device_state.diff("nkt", registers).items():
+            self.nkt.set_register(name, value)
+            self.device_state.record("nkt", {name: value})
+
+    def check_firmware_variable(self, name, value):
+        # # int hat fünf chars als Maximum der Dezimalschreibweise. ExpDel etc. sind schon auf long umgestellt (zehn Chars)
+        if name not in self.LONG_FIRMWARE_VARIABLES:
             if len(str(value)) > 5:
                 print(
                     f"Der Wert {value} für {name} ist wahrscheinlich zu groß und wird ein roll-over erzeugen.",
@@ -297,24 +450,19 @@ class Measurement:
                 f"Die Länge des Namens ist aktuell auf sechs Chars gestellt. {name} auf {value} zu setzen ist daher wahrscheinlich eine schlechte Idee.",
                 flush=True,
             )
-        print(f"sending: 2{name}={value}")
-        # 2 ist der Char-Code für "Variable setzen" (siehe Firmware-Code)
-        self.mcu.write(f"2{name}={value}\n".encode())
-        time.sleep(self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY / 1000.0)
 
     def send_firmware_signal(self, signal):
+        # immer im Text-Protokoll (die Firmware antwortet auf den watchdog nicht, siehe mcu_watchdog)
         self.mcu.write(str(signal).encode())
         time.sleep(self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY / 1000.0)
 
     def turn_on_laser(self):
-        """Sendet eine Eins als Byte zum MCU, welche ein Anschalten der Laser signalisiert."""
-        self.mcu.write(b"1")
-        time.sleep(self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY / 1000.0)
+        """Signalisiert dem MCU ein Anschalten der Laser."""
+        self.mcu_protocol.laser_on()
 
     def turn_off_laser(self):
-        """Sendet eine Null als Byte zum MCU, welche ein Ausschalten der Laser signalisiert."""
-        self.mcu.write(b"0")
-        time.sleep(self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY / 1000.0)
+        """Signalisiert dem MCU ein Ausschalten der Laser."""
+        self.mcu_protocol.laser_off()
 
     def init_spectrometer(self):
         """Verbindet sich mit dem Spektrometer."""
@@ -341,39 +489,89 @@ class Measurement:
         # self.sn.ext_trig(self.spectrometer, False)
         self.sn.ext_trig(self.spectrometer, True)
 
-        # True ignoriert die ersten Messdaten, da diese ungenau sein können
-        # (durch Änderung der Integrationszeit)
-        self.sn.setParam(
-            self.spectrometer,
-            self.MEASUREMENT_SETTINGS.specto.INTTIME,
+        # merkt sich die Parameter, damit unveränderte nicht erneut gesendet werden
+        self.spectrometer_session = SpectrometerSession(self.sn, self.spectrometer)
+        self.set_inttime(self.MEASUREMENT_SETTINGS.specto.INTTIME)
+
+    def set_inttime(self, inttime: int):
+        # das erste Spektrum danach wird nur bei geänderter Integrationszeit verworfen (ist dann ungenau)
+        self.spectrometer_session.set_params(
+            inttime,
             self.MEASUREMENT_SETTINGS.specto.SCAN_AVG,
             self.MEASUREMENT_SETTINGS.specto.SMOOTH,
             self.MEASUREMENT_SETTINGS.specto.XTIMING,
-            True,
         )
 
+    def max_inttime(self) -> int:
+        """Die längste Integrationszeit, die vorkommen kann (für Timeouts und die Pulsfolge)."""
+        if self.MEASUREMENT_SETTINGS.specto.AUTO_EXPOSURE:
+            return self.MEASUREMENT_SETTINGS.specto.INTTIME_MAX
+        return self.MEASUREMENT_SETTINGS.specto.INTTIME
+
     def init_nkt(self, nkt_path):
         self.nkt = NKT(nkt_path)
         # erst später anschalten
         self.nkt.set_register("emission", 0)
+        self.device_state.record("nkt", {"emission": 0})
 
     def init_ltb(self, ltb_path):
 
         self.ltb = LTB(port=ltb_path)
         print("setting LTB to stand by (should take 10 seconds until it warmed up)")
         # self.ltb.turn_laser_off()
-        self.ltb.turn_laser_on()
+        self.ltb.turn_laser_on(wait=False)
+
+        def ltb_is_ready():
+            try:
+                return self.ltb.is_ready()
+            except LaserProtocolError:
+                # antwortet während des Aufwärmens nicht immer
+                return False
+
+        DeviceManager.wait_until(ltb_is_ready, "LTB", timeout=20)
         # self.ltb.start_repetition_mode()
+
+    def activate_ltb_trigger(self):
         try:
             self.ltb.activate_external_trigger()
         except LaserProtocolError as e:
             print(e)
 
     def get_wav(self):
-        return self.sn.getSpectrum_X(self.spectrometer).reshape(
+        """Wellenlängen des Spektrometers. Liegen sie im Cache, wird die Kalibrierung im Hintergrund erneut geprüft."""
+        # bei weiteren Messungen mit demselben Spektrometer (siehe reset)
+        if self.wavelength_calibration is not None:
+            return self.wavelength_calibration
+
+        device_id = self.sn.getDeviceId(self.spectrometer)
+        wav = self.wavelength_cache.load(device_id)
+        if wav is None:
+            wav = self.wavelength_cache.save(device_id, self.read_wav())
+        else:
+            self.wav_validation = Thread(
+                target=self.validate_wav, args=(device_id, wav), daemon=True
+            )
+            self.wav_validation.start()
+        self.wavelength_calibration = wav
+        return wav
+
+    def read_wav(self):
+        return self.spectrometer_session.wavelengths().reshape(
             2048,
         )
 
+    def validate_wav(self, device_id, wav):
+        current = self.read_wav()
+        if np.allclose(current, wav):
+            return
+        print(
+            "Warning: the wavelength calibration of the spectrometer differs from the cached one, updating the cache.",
+            flush=True,
+        )
+        self.wavelength_calibration = self.wavelength_cache.save(device_id, current)
+        # wav wird bereits von SpectrumData benutzt
+        wav[:] = current
+
     def get_data(self):
         """Liest die Daten des Spektrometers aus."""
 
@@ -387,7 +585,38 @@ class Measurement:
         # print(sn.getSpectrum_Y(spectrometer).shape)  # (2048,)
 
         # return sn.array_spectrum(spectrometer, wav)
-        return self.sn.getSpectrum_Y(self.spectrometer)
+        return self.spectrometer_session.read()
+
+    def capture_spectrum(self, i, trigger_ns=0):
+        """
+        Liest (über den SpectrometerReader) das Spektrum der Wiederholung i des aktuellen Gradienten und speichert es.
+        trigger_ns: time.monotonic_ns(), als die Wiederholung ausgelöst wurde
+        """
+        entry = self.spectrometer_reader.capture(
+            self.messdata.curr_gradiant, i, trigger_ns
+        )
+        # vor store, das die Zeile als vollständig markiert
+        self.messdata.inttimes[entry.gradiant][entry.index] = (
+            self.spectrometer_session.inttime
+        )
+        self.messdata.store(entry)
+        if self.messdata.overflow[entry.gradiant][entry.index]:
+            print(
+                f"\nspectrum {entry.index} exceeds the range of {self.messdata.measurements.dtype.name}, values were clipped",
+                flush=True,
+            )
+
+        if self.auto_exposure is not None:
+            current = self.spectrometer_session.inttime
+            inttime = self.auto_exposure.next_inttime(current, entry.spectrum)
+            if inttime != current:
+                print(
+                    f"\n{'saturated' if self.auto_exposure.is_saturated(entry.spectrum) else 'low counts'}: "
+                    f"integration time {current} ms -> {inttime} ms",
+                    flush=True,
+                )
+                # das Spektrometer gehört dem Reader-Thread, der aber bis zur nächsten Anfrage untätig ist
+                self.set_inttime(inttime)
 
     def led_red(self):
         self.set_firmware_variable("SetLED", 511)
@@ -396,21 +625,34 @@ class Measurement:
         self.set_firmware_variable("SetLED", 151)
 
     def stop_all_devices(self):
-        # emission 0 gibt einen Fehler, wenn external gate weiterhin "LASER AN!!!!" schreit
+        """Fährt alle Geräte parallel herunter (Reihenfolge, wo nötig, siehe DeviceManager.add in __init__)."""
+        try:
+            self.device_manager.stop_all()
+        finally:
+            self.device_state.invalidate()
+
+    def stop_spectrometer(self):
+        # Spektrometer freigeben
+        self.spectrometer_reader.stop()
+        self.sn.reset(self.spectrometer)
+        self.spectrometer_session.invalidate()
+
+    def stop_mcu(self):
         self.turn_off_laser()
-        self.ltb.stop_operation()
+        self.led_green()
+        self.mcu.close()
+
+    def stop_nkt(self):
         self.nkt.set_register("emission", 0)
         # manuelles triggern erlauben und (vorsichtshalber) die power runterstellen.
         self.nkt.set_register("power", 1)
         # internal trigger
         self.nkt.set_register("operating_mode", 0)
-        # Spektrometer freigeben
-        self.sn.reset(self.spectrometer)
-        self.led_green()
+        self.nkt.laser.close()
 
+    def stop_ltb(self):
+        self.ltb.stop_operation()
         self.ltb.ser.close()
-        self.nkt.laser.close()
-        self.mcu.close()
 
     def test_measurement_duration(self, iters: int):
         """Misst die Zeit, die ein Messvorgang dauert."""
@@ -447,23 +689,59 @@ class Measurement:
             f"std: +/- {np.std(np.array(seconds_list) - seconds_list[0] - (delays_time))}"
         )
 
-    def time_measurement(self, measure):
+    def time_measurement(self, measure, start_index=0):
 
         # watchdog updaten
         # self.send_firmware_signal("3")
 
+        # die Geräte sind für diesen Gradienten eingestellt, der nächste kann jetzt im Hintergrund vorbereitet werden
+        if self.MEASUREMENT_SETTINGS.PIPELINE_GRADIENTS:
+            self.gradient_scheduler.prepare_async(self.messdata.curr_gradiant + 1)
+
         seconds = time.time()
+        # bei einer fortgesetzten Messung fehlen im ersten Gradienten nur noch die restlichen Wiederholungen
+        repetitions = self.MEASUREMENT_SETTINGS.laser.REPETITIONS - start_index
+
+        # mit REPETITION_PERIOD beginnt jede Wiederholung zu einem festen Zeitpunkt, statt nach MEASUREMENT_DELAY
+        self.repetition_scheduler = (
+            DeadlineScheduler(self.MEASUREMENT_SETTINGS.laser.REPETITION_PERIOD)
+            if self.MEASUREMENT_SETTINGS.laser.REPETITION_PERIOD
+            else None
+        )
+
+        convergence = self.convergence_check(start_index)
 
         print("\nrepetitions:")
-        for i in range(self.MEASUREMENT_SETTINGS.laser.REPETITIONS):
+        for i in range(start_index, self.MEASUREMENT_SETTINGS.laser.REPETITIONS):
+            # bei HARDWARE_TIMING taktet die Firmware (siehe hardware_pulse_measurement)
+            if (
+                self.repetition_scheduler is not None
+                and not self.MEASUREMENT_SETTINGS.laser.HARDWARE_TIMING
+            ):
+                self.messdata.lateness[self.messdata.curr_gradiant][i] = (
+                    self.repetition_scheduler.wait(i - start_index)
+                )
             measure(i)
             sys.stdout.write("\r")
             sys.stdout.write(" " + str(i))
             sys.stdout.flush()
             self.messdata.curr_measurement_index = i
+            # nach TIMEOUT oder Konvergenz weniger als geplant
+            repetitions = i + 1 - start_index
             if time.time() - seconds > self.MEASUREMENT_SETTINGS.TIMEOUT:
                 print("\nreached timeout!")
                 break
+            if (
+                convergence is not None
+                and i >= SpectrumData.STATS_SKIP_REPETITIONS
+                and convergence.update(
+                    self.messdata.scaled_spectrum(self.messdata.curr_gradiant, i)
+                )
+            ):
+                print(
+                    f"\nconverged after {i + 1} repetitions (relative standard error: {convergence.rse():.5f})"
+                )
+                break
 
         # \r resetten
         print()
@@ -471,30 +749,61 @@ class Measurement:
 
         total_time_millis = int(round(time.time() * 1000)) - int(round(seconds * 1000))
         print(f"measurements took: {total_time_millis} ms")
-        if not self.MEASUREMENT_SETTINGS.laser.CONTINOUS:
-            delays_time = (
-                self.MEASUREMENT_SETTINGS.laser.MEASUREMENT_DELAY
-                + 2 * self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY
-                + self.MEASUREMENT_SETTINGS.laser.IRRADITION_TIME
-            ) * self.MEASUREMENT_SETTINGS.laser.REPETITIONS
+        if self.repetition_scheduler is not None:
+            # mit REPETITION_PERIOD ergeben sich die Pausen aus der Periode, nicht aus MEASUREMENT_DELAY: gemessen wird,
+            # wie lange auf den Takt gewartet wurde (bei HARDWARE_TIMING auf das Sync-Byte, samt IRRADITION_TIME)
+            pauses_time = self.repetition_scheduler.waited_ns / 1e6
         else:
-            delays_time = (
-                self.MEASUREMENT_SETTINGS.laser.MEASUREMENT_DELAY
-                * self.MEASUREMENT_SETTINGS.laser.REPETITIONS
-                + 2 * self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY
-            )
+            pauses_time = self.MEASUREMENT_SETTINGS.laser.MEASUREMENT_DELAY * repetitions
+        if self.MEASUREMENT_SETTINGS.laser.CONTINOUS:
+            delays_time = pauses_time + 2 * self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY
+        elif (
+            self.MEASUREMENT_SETTINGS.laser.HARDWARE_TIMING
+            and self.repetition_scheduler is not None
+        ):
+            delays_time = pauses_time
+        else:
+            delays_time = pauses_time + (
+                2 * self.MEASUREMENT_SETTINGS.laser.SERIAL_DELAY
+                + self.MEASUREMENT_SETTINGS.laser.IRRADITION_TIME
+            ) * repetitions
         print(f"thereof delays: {delays_time} ms")
         print(
-            f"a measurement took: {total_time_millis / 1.0 / self.MEASUREMENT_SETTINGS.laser.REPETITIONS} ms"
+            f"a measurement took: {total_time_millis / 1.0 / repetitions} ms"
         )
         print("without delays:")
         print(
-            f"a measurement took: {(total_time_millis - delays_time) / 1.0 / self.MEASUREMENT_SETTINGS.laser.REPETITIONS} ms"
+            f"a measurement took: {(total_time_millis - delays_time) / 1.0 / repetitions} ms"
         )
         print(
             f"(should be roughly {self.MEASUREMENT_SETTINGS.specto.INTTIME})",
             flush=True,
         )
+        if self.repetition_scheduler is not None:
+            print(f"repetition timing: {self.repetition_scheduler.summary()}", flush=True)
+
+    def convergence_check(self, start_index=0):
+        """ConvergenceCheck für den aktuellen Gradienten, oder None ohne CONVERGENCE_RSE."""
+        if not self.MEASUREMENT_SETTINGS.CONVERGENCE_RSE:
+            return None
+        convergence = ConvergenceCheck(
+            self.messdata.wav,
+            self.MEASUREMENT_SETTINGS.CONVERGENCE_WAV_START,
+            self.MEASUREMENT_SETTINGS.CONVERGENCE_WAV_END,
+            self.MEASUREMENT_SETTINGS.CONVERGENCE_RSE,
+            self.MEASUREMENT_SETTINGS.CONVERGENCE_MIN_REPETITIONS,
+        )
+        # bei einer fortgesetzten Messung zählen die bereits gemessenen Wiederholungen mit
+        gradiant = self.messdata.curr_gradiant
+        for i in range(SpectrumData.STATS_SKIP_REPETITIONS, start_index):
+            if self.messdata.timestamps[gradiant][i] != 0:
+                convergence.update(self.messdata.scaled_spectrum(gradiant, i))
+        return convergence
+
+    def repetition_delay(self):
+        """Wartet MEASUREMENT_DELAY nach einer Wiederholung, außer der DeadlineScheduler gibt den Takt vor."""
+        if not self.MEASUREMENT_SETTINGS.laser.REPETITION_PERIOD:
+            time.sleep(self.MEASUREMENT_SETTINGS.laser.MEASUREMENT_DELAY / 1000.0)
 
     def mcu_watchdog(self):
         while True:
@@ -513,26 +822,23 @@ class Measurement:
             #     print(status, flush=True)
             time.sleep(2)
 
-    def continuous_measurement(self):
+    def continuous_measurement(self, start_index=0):
 
         # if self.arduino is None:
         #     print("Arduino not set up! Can not measure.")
         #     return
 
         def measure(i):
-            self.messdata.measurements[self.messdata.curr_gradiant][i] = self.get_data()
-            self.messdata.timestamps[self.messdata.curr_gradiant][i] = time.time()
-            time.sleep(self.MEASUREMENT_SETTINGS.laser.MEASUREMENT_DELAY / 1000.0)
+            self.capture_spectrum(i)
+            self.repetition_delay()
 
         self.led_red()
-        # auch, wenn Emission schon an ist, wird der LASER extern vom Arduino getriggert
-        # (Emission muss jedoch erst an sein, bevor der LASER extern getriggert werden kann)
-        self.nkt.set_register("emission", 1)
+        self.enable_nkt()
 
         def measure_func():
             self.turn_on_laser()
             print("turned on lasers", flush=True)
-            self.time_measurement(measure)
+            self.time_measurement(measure, start_index)
 
         # ggf. schon wieder aus weil zu große Integrationszeit
         # try:
@@ -542,29 +848,107 @@ class Measurement:
         measure_func()
         # self.watchdog_wrap(self.mcu_watchdog, measure_func)
 
-    def pulse_measurement(self):
+    def pulse_measurement(self, start_index=0):
 
         if self.mcu is None:
             print("Arduino not set up! Can not measure.")
             return
 
         def measure(i):
+            trigger_ns = time.monotonic_ns()
             self.turn_on_laser()
             time.sleep(self.MEASUREMENT_SETTINGS.laser.IRRADITION_TIME / 1000.0)
-            self.messdata.measurements[self.messdata.curr_gradiant][i] = self.get_data()
-            self.messdata.timestamps[self.messdata.curr_gradiant][i] = time.time()
+            self.capture_spectrum(i, trigger_ns)
             self.turn_off_laser()
-            time.sleep(self.MEASUREMENT_SETTINGS.laser.MEASUREMENT_DELAY / 1000.0)
+            self.repetition_delay()
 
         self.led_red()
-        # auch, wenn Emission schon an ist, wird der LASER extern vom Arduino getriggert
-        self.nkt.set_register("emission", 1)
-        self.time_measurement(measure)
+        self.enable_nkt()
+        self.time_measurement(measure, start_index)
+
+    def upload_pulse_schedule(self, repetitions):
+        """Überträgt die Pulsfolge eines Gradienten, welche die Firmware dann selbstständig (Modus 4) abarbeitet."""
+        laser = self.MEASUREMENT_SETTINGS.laser
+        # die Laser müssen bis nach dem Auslesen an bleiben (wie zuvor: an, IRRADITION_TIME, Auslesen, aus).
+        # Bei AUTO_EXPOSURE ist das die längste mögliche Integrationszeit, die Pulsfolge steht ja vorab fest
+        on_time = (
+            laser.IRRADITION_TIME
+            + self.max_inttime()
+            + 2 * laser.SERIAL_DELAY
+        )
+        off_time = laser.MEASUREMENT_DELAY
+        if laser.REPETITION_PERIOD:
+            # die Firmware taktet dann mit der festen Periode
+            off_time = laser.REPETITION_PERIOD - on_time
+            if off_time < 0:
+                print(
+                    f"REPETITION_PERIOD ({laser.REPETITION_PERIOD} ms) is shorter than the on-time of the lasers ({on_time} ms).",
+                    flush=True,
+                )
+                off_time = 0
+        # nach IRRADITION_TIME sendet die Firmware ein 'S', dann wird das Spektrum gelesen
+        self.update_firmware_variables(
+            {
+                "SyncDl": laser.IRRADITION_TIME,
+                "OnTime": on_time,
+                "OffTim": off_time,
+                "NumRep": repetitions,
+            }
+        )
+
+    def hardware_pulse_measurement(self, start_index=0):
+        """Wie pulse_measurement, die Laser werden aber von der Firmware nach einer zuvor übertragenen Pulsfolge geschaltet."""
+
+        laser = self.MEASUREMENT_SETTINGS.laser
+        self.upload_pulse_schedule(laser.REPETITIONS - start_index)
+
+        def measure(i):
+            # blockiert, bis die Laser seit IRRADITION_TIME an sind
+            wait_start_ns = time.monotonic_ns()
+            sync = self.mcu.read(1)
+            # die Firmware löst aus, hier zählt die Ankunft des Sync-Bytes
+            trigger_ns = time.monotonic_ns()
+            if sync != b"S":
+                raise RuntimeError(
+                    f"Expected a sync byte from the MCU, but got {sync!r}."
+                )
+            if self.repetition_scheduler is not None:
+                # die Firmware taktet, festgehalten wird nur die Verspätung der Sync-Bytes gegenüber dem ersten
+                if i == start_index:
+                    self.repetition_scheduler.start()
+                # die Pause bis zum Sync-Byte (siehe time_measurement)
+                self.repetition_scheduler.waited_ns += trigger_ns - wait_start_ns
+                self.messdata.lateness[self.messdata.curr_gradiant][i] = (
+                    self.repetition_scheduler.mark(i - start_index)
+                )
+            self.capture_spectrum(i, trigger_ns)
+
+        self.led_red()
+        self.enable_nkt()
+
+        # eine Periode plus Puffer auf das nächste Sync-Byte warten
+        serial_timeout = self.mcu.timeout
+        self.mcu.timeout = (
+            laser.IRRADITION_TIME
+            + self.max_inttime()
+            + 2 * laser.SERIAL_DELAY
+            + max(laser.MEASUREMENT_DELAY, laser.REPETITION_PERIOD)
+            + self.MEASUREMENT_SETTINGS.WATCHDOG_GRACE
+        ) / 1000.0
+        self.mcu.reset_input_buffer()
+        self.mcu_protocol.start_schedule()
+        try:
+            self.time_measurement(measure, start_index)
+        finally:
+            # bricht die Pulsfolge ab, falls sie (z. B. durch TIMEOUT) noch läuft
+            self.turn_off_laser()
+            self.mcu.timeout = serial_timeout
 
     def infinite_measuring(self, gui=True, nkt_on=True):
         if nkt_on:
-            self.nkt.set_register("operating_mode", 0)  # internal trigger
+            self.update_nkt_registers({"operating_mode": 0})  # internal trigger
             self.nkt.set_register("emission", 1)
+            self.device_state.record("nkt", {"emission": 1})
 
         # def send_and_wait():
         #     while True:
@@ -592,7 +976,7 @@ class Measurement:
                     ) % len(self.messdata.measurements[self.messdata.curr_gradiant])
                     self.messdata.measurements[self.messdata.curr_gradiant][
                         next_measurement_index
-                    ] = self.get_data()
+                    ] = self.messdata.to_storage(self.get_data())[0]
                     time.sleep(
                         self.MEASUREMENT_SETTINGS.laser.MEASUREMENT_DELAY / 1000.0
                     )
@@ -600,6 +984,7 @@ class Measurement:
             except KeyboardInterrupt:
                 self.live_plotter.stop()
                 self.sn.reset(self.spectrometer)
+                self.spectrometer_session.invalidate()
                 self.stop_all_devices()
 
         def watchdog_wrap(watchdog_target, func, timeout_sec=3):
@@ -618,24 +1003,138 @@ class Measurement:
 
         watchdog_wrap(self.mcu_watchdog, infinite_measure)
 
-    def _measure_task(self):
+    def _measure_task(self, start_gradiant=0, start_index=0):
         for self.messdata.curr_gradiant in range(
-            self.MEASUREMENT_SETTINGS.laser.num_gradiants
+            start_gradiant, self.MEASUREMENT_SETTINGS.laser.num_gradiants
         ):
 
-            self.set_laser_powers(self.messdata.curr_gradiant)
+            self.gradient_scheduler.switch_to(self.messdata.curr_gradiant)
 
+            # nur der erste (fortgesetzte) Gradient fängt nicht bei 0 an
             if self.MEASUREMENT_SETTINGS.laser.CONTINOUS:
-                self.continuous_measurement()
+                self.continuous_measurement(start_index)
+            elif self.MEASUREMENT_SETTINGS.laser.HARDWARE_TIMING:
+                self.hardware_pulse_measurement(start_index)
             else:
-                self.pulse_measurement()
+                self.pulse_measurement(start_index)
+            start_index = 0
 
+        self.gradient_scheduler.finish()
+        print(f"spectrometer: {self.spectrometer_session.summary()}", flush=True)
         self.messdata.stop_event.set()
 
-    def measure(self, gui=True):
+    def _acquisition_process(self, start_gradiant=0, start_index=0):
+        """Einstiegspunkt des (geforkten) Messprozesses, siehe ACQUISITION_PROCESS."""
+        # Threads werden beim Fork nicht übernommen, der Reader muss hier neu gestartet werden
+        self.spectrometer_reader = SpectrometerReader(self.get_data, self.messdata.ring)
+        try:
+            self._measure_task(start_gradiant, start_index)
+        except BaseException:
+            # die Laser nicht anlassen. Plot und Backup im Elternprozess sollen trotzdem beenden
+            self.turn_off_laser()
+            self.messdata.stop_event.set()
+            raise
+        finally:
+            self.spectrometer_reader.stop()
+
+    def load_progress(self, store_path: str):
+        """
+        Übernimmt die bereits gemessenen Spektren aus einem Backup (siehe BackupService) und gibt zurück,
+        bei welchem Gradienten und welcher Wiederholung die Messung fortgesetzt werden muss.
+        """
+        store = ChunkStore(store_path)
+        if store.shape != self.messdata.measurements.shape:
+            raise ValueError(
+                f"The backup at {store_path} has the shape {store.shape}, but the measurement has the shape {self.messdata.measurements.shape}."
+            )
+
+        settings_path = os.path.join(store_path, "settings.json")
+        if os.path.isfile(settings_path):
+            if MeasurementSettings.from_json(settings_path) != self.MEASUREMENT_SETTINGS:
+                print(
+                    "Warning: the settings of the backup differ from the current settings.",
+                    flush=True,
+                )
+
+        measurements, _, timestamps = store.read()
+        timestamps_ns = store.read_column("timestamps_ns")
+        inttimes = store.read_column("inttimes")
+        overflow = store.read_column("overflow")
+        time_anchor = store.load_array("time_anchor")
+        done_rows = np.flatnonzero(timestamps.ravel())
+
+        if len(done_rows) == 0:
+            print("The backup is empty, starting from the beginning.", flush=True)
+            return 0, 0
+
+        for g, i in zip(*np.unravel_index(done_rows, timestamps.shape)):
+            self.messdata.measurements[g][i] = measurements[g][i]
+            self.messdata.timestamps[g][i] = timestamps[g][i]
+            if inttimes is not None:
+                self.messdata.inttimes[g][i] = inttimes[g][i]
+            if overflow is not None:
+                self.messdata.overflow[g][i] = overflow[g][i]
+            self.messdata.update_stats(g, i)
+
+        offset = 0
+        if timestamps_ns is not None and time_anchor is not None:
+            # die monotone Uhr beginnt nach einem Neustart neu: über die Wanduhr in die Zeitbasis dieses Laufs umrechnen
+            offset = int(
+                (time_anchor[0] - time_anchor[1])
+                - (self.messdata.time_anchor[0] - self.messdata.time_anchor[1])
+            )
+            restored_ns = timestamps_ns.reshape(-1, 3)[done_rows]
+            self.messdata.timestamps_ns.reshape(-1, 3)[done_rows] = np.where(
+                restored_ns != 0, restored_ns + offset, 0
+            )
+
+        # es geht nach der zuletzt gemessenen Wiederholung weiter
+        # (durch TIMEOUT übersprungene Wiederholungen früherer Gradienten bleiben leer, wie in der ursprünglichen Messung)
+        start_gradiant, start_index = divmod(int(done_rows[-1]) + 1, timestamps.shape[1])
+        self.messdata.curr_gradiant, self.messdata.curr_measurement_index = divmod(
+            int(done_rows[-1]), timestamps.shape[1]
+        )
+
+        # weiterhin in das gleiche Backup und unter dem gleichen Namen speichern
+        # die Ablage bleibt in ihrer Zeitbasis, neue Zeilen werden zurückgerechnet
+        self.backup_service.resume(store, done_rows, offset)
+        self.measurement_file_name = os.path.basename(
+            os.path.normpath(store_path)
+        ).removesuffix(ChunkStore.SUFFIX)
+        if self.messdata.is_memmap():
+            # prepare_run hat das memmap unter dem neuen Namen angelegt, save und MeasurementLoader suchen es unter dem alten
+            self.messdata.move_memmap(
+                os.path.join(
+                    self.measurement_save_dir,
+                    self.measurement_file_name + SpectrumPlot.MEMMAP_SUFFIX,
+                )
+            )
+        self.cam.output_path = os.path.join(
+            self.measurement_save_dir, self.measurement_file_name
+        )
+
+        print(
+            f"Resuming from gradient {start_gradiant}, repetition {start_index} ({len(done_rows)} spectra restored).",
+            flush=True,
+        )
+        return start_gradiant, start_index
+
+    def measure(self, gui=True, resume_from: str = "", keep_devices=False):
+        """
+        Führt die Messung durch. Mit resume_from (Pfad zu einem Backup) wird eine abgebrochene Messung fortgesetzt.
+        keep_devices: die Geräte danach nur ausschalten statt trennen, damit mit reset weitere Messungen folgen können.
+        """
 
         print("staring a measurement", flush=True)
 
+        # die Messung (bzw. der Messprozess) soll die geprüften Wellenlängen haben
+        if self.wav_validation is not None:
+            self.wav_validation.join()
+
+        start_gradiant, start_index = (
+            self.load_progress(resume_from) if resume_from else (0, 0)
+        )
+
         ltb_p = Process(
             target=self.ltb_watchdog,
             daemon=True,
@@ -645,10 +1144,20 @@ class Measurement:
             daemon=True,
         )
 
-        measure_p = Thread(
-            target=self._measure_task,
-            daemon=True,
-        )
+        if self.MEASUREMENT_SETTINGS.ACQUISITION_PROCESS:
+            # fork, da die Geräte-Handles nicht gepickelt werden können. Der Elternprozess spricht die Geräte
+            # während der Messung nicht an, er zeichnet nur (Live-Plot, Backup) aus dem Shared Memory
+            measure_p = multiprocessing.get_context("fork").Process(
+                target=self._acquisition_process,
+                args=(start_gradiant, start_index),
+                daemon=True,
+            )
+        else:
+            measure_p = Thread(
+                target=self._measure_task,
+                args=(start_gradiant, start_index),
+                daemon=True,
+            )
 
         backup_p = Thread(
             target=self.backup_service.start,
@@ -659,7 +1168,7 @@ class Measurement:
             ltb_p.start()
             self.cam.start()
             print("started cam", flush=True)
-            if self.MEASUREMENT_SETTINGS.UNIQUE:
+            if self.MEASUREMENT_SETTINGS.UNIQUE or resume_from:
                 backup_p.start()
             if self.MEASUREMENT_SETTINGS.laser.CONTINOUS:
                 mcu_p.start()
@@ -684,14 +1193,73 @@ class Measurement:
             mcu_p.kill()
             # measure_p.kill()
 
+        # die Geräte erst ausschalten, wenn die Messung nicht mehr auf sie zugreift
+        # (ohne gui kehrt measure sonst sofort zurück)
+        if measure_p.ident is not None:
+            measure_p.join()
+        # auch wenn die Messung abgebrochen wurde: das Backup sichert den Rest und endet
+        self.messdata.stop_event.set()
+        if backup_p.ident is not None:
+            backup_p.join()
+        if self.MEASUREMENT_SETTINGS.ACQUISITION_PROCESS:
+            if measure_p.exitcode != 0:
+                print(
+                    f"The acquisition process failed (exit code {measure_p.exitcode}).",
+                    flush=True,
+                )
+            # was der Messprozess gesendet hat (auch INTTIME bei AUTO_EXPOSURE), ist hier nicht bekannt
+            self.device_state.invalidate()
+            self.spectrometer_session.invalidate()
+            # die Frame-IDs hat der Messprozess weitergezählt: mit der alten Zählung könnte die Firmware z. B. das
+            # Ausschalten der Laser als Wiederholung seines letzten Frames verwerfen
+            self.mcu_protocol = self.make_mcu_protocol()
+            self.messdata.release_shared_memory()
+
         if self.cam.process.is_alive():
             self.cam.stop()
 
-        ltb_p.terminate()
-        mcu_p.terminate()
+        # mcu_p wird nur bei CONTINOUS gestartet, terminate geht nur bei gestarteten Prozessen
+        for watchdog_p in (ltb_p, mcu_p):
+            if watchdog_p.is_alive():
+                watchdog_p.terminate()
         # measure_p.terminate()
 
-        self.stop_all_devices()
+        if keep_devices:
+            self.idle_devices()
+        else:
+            self.stop_all_devices()
+
+    def idle_devices(self):
+        """Schaltet die Laser zwischen zwei Messungen aus, die Geräte bleiben verbunden."""
+        self.turn_off_laser()
+        self.update_nkt_registers({"emission": 0})
+        self.led_green()
+
+    def save_chunks(self, save_dir: str):
+        """Schreibt die Messdaten als ChunkStore, die Chunks werden parallel komprimiert (siehe SAVE_WORKERS)."""
+        start_time = time.perf_counter()
+        workers = max(1, self.MEASUREMENT_SETTINGS.SAVE_WORKERS)
+        measurements = self.messdata.measurements
+        store = ChunkStore.create(
+            os.path.join(
+                save_dir, self.measurement_file_name + MeasurementLoader.CHUNKS_SUFFIX
+            ),
+            measurements.shape,
+            self.messdata.wav,
+            measurements.dtype,
+            codec=self.MEASUREMENT_SETTINGS.SAVE_CODEC or ZlibCodec.NAME,
+        )
+        store.append(
+            np.arange(measurements.shape[0] * measurements.shape[1]),
+            measurements.reshape(-1, measurements.shape[-1]),
+            self.messdata.timestamps.ravel(),
+            workers=workers,
+        )
+        print(
+            f"saved {store.num_chunks} chunks ({store.codec.NAME}) with {workers} workers "
+            f"in {time.perf_counter() - start_time:.2f} s",
+            flush=True,
+        )
 
     def save(self, plt_only=False, measurements_only=False, cache_path: str = ""):
         """Schreibt die Messdaten in einen spezifizierten Ordner."""
@@ -705,6 +1273,11 @@ class Measurement:
         else:
             save_dir = self.measurement_save_dir
 
+        # bei einem memmap liegen die Messdaten bereits im Messordner, dort werden nur noch die restlichen Daten dazugeschrieben
+        if self.messdata.is_memmap():
+            self.messdata.flush()
+            save_dir = self.measurement_save_dir
+
         os.makedirs(save_dir, 0o777, exist_ok=True)
 
         if not plt_only:
@@ -726,13 +1299,65 @@ class Measurement:
             # metadata[7] = self.MEASUREMENT_SETTINGS["IRRADITION_TIME"]
             # metadata[8] = int(self.MEASUREMENT_SETTINGS["laser"]["CONTINOUS"])
 
-            np.savez_compressed(
-                os.path.join(save_dir, self.measurement_file_name),
-                np.array(self.messdata.measurements),
-                np.array(self.messdata.wav),
-                np.array(self.messdata.timestamps),
+            save_chunks = (
+                self.MEASUREMENT_SETTINGS.SAVE_WORKERS > 0
+                or self.MEASUREMENT_SETTINGS.SAVE_CODEC
             )
+            if save_chunks and self.messdata.is_memmap():
+                # die Messdaten liegen schon vollständig im memmap, umkopieren würde nur Zeit kosten
+                print(
+                    "SAVE_WORKERS/SAVE_CODEC are ignored with MEMMAP, keeping the memmap",
+                    flush=True,
+                )
+                save_chunks = False
+            if save_chunks:
+                self.save_chunks(save_dir)
+
+            if self.messdata.is_memmap() or save_chunks:
+                # arr_0 fehlt absichtlich, MeasurementLoader liest die Messdaten dann aus dem memmap oder den Chunks daneben
+                np.savez_compressed(
+                    os.path.join(save_dir, self.measurement_file_name),
+                    arr_1=np.array(self.messdata.wav),
+                    arr_2=np.array(self.messdata.timestamps),
+                    lateness=np.array(self.messdata.lateness),
+                    timestamps_ns=np.array(self.messdata.timestamps_ns),
+                    time_anchor=np.array(self.messdata.time_anchor),
+                    # ms, pro Spektrum (siehe AUTO_EXPOSURE)
+                    inttimes=np.array(self.messdata.inttimes),
+                    # pro Spektrum, siehe STORAGE_DTYPE
+                    overflow=np.array(self.messdata.overflow),
+                )
+            else:
+                np.savez_compressed(
+                    os.path.join(save_dir, self.measurement_file_name),
+                    np.array(self.messdata.measurements),
+                    np.array(self.messdata.wav),
+                    np.array(self.messdata.timestamps),
+                    # ns, siehe DeadlineScheduler
+                    lateness=np.array(self.messdata.lateness),
+                    timestamps_ns=np.array(self.messdata.timestamps_ns),
+                    time_anchor=np.array(self.messdata.time_anchor),
+                    # ms, pro Spektrum (siehe AUTO_EXPOSURE)
+                    inttimes=np.array(self.messdata.inttimes),
+                    # pro Spektrum, siehe STORAGE_DTYPE
+                    overflow=np.array(self.messdata.overflow),
+                )
             os.chmod(os.path.join(save_dir, self.measurement_file_name + ".npz"), 0o777)
+            # für Übersichtsplots ohne die Rohdaten (siehe SpectrumPlot.plot_stats)
+            self.messdata.stats.save(
+                os.path.join(
+                    save_dir, self.measurement_file_name + RunningStats.FILE_SUFFIX
+                )
+            )
+            if self.MEASUREMENT_SETTINGS.WAVELENGTH_MAJOR:
+                # nach der .npz, sonst gilt die Kopie als veraltet (siehe SpectrumPlot.wavelength_major_from_disk)
+                WavelengthMajor.write(
+                    os.path.join(
+                        save_dir,
+                        self.measurement_file_name + WavelengthMajor.FILE_SUFFIX,
+                    ),
+                    self.messdata.measurements,
+                )
 
         if not measurements_only:
             SpectrumPlot.plot_results(
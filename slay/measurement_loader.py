@@ -0,0 +1,249 @@
+import os
+import copy
+import numpy as np
+from slay.settings import MeasurementSettings
+from slay.chunk_store import ChunkStore
+from slay.spectrum_data import SpectrumData
+from slay.wavelength_major import WavelengthMajor
+
+
+class MeasurementLoader:
+    """
+    Liest Ausschnitte (Gradienten, Wiederholungen, Wellenlängen) einer gespeicherten Messung: .npz (die Messdaten
+    darin, als Chunks daneben oder mit MEMMAP gemessen) oder Backup (siehe BackupService). Wellenlängen und Zeitstempel
+    sind klein und werden sofort geladen, von den Spektren nur, was der Ausschnitt braucht: die passenden Chunks,
+    die Seiten eines memmap oder die Wellenlängen aus der WavelengthMajor-Kopie. Die Outlier werden nur im Ausschnitt
+    korrigiert.
+
+    Eine .npz ist komprimiert und wird beim ersten Lesen einmal ganz entpackt (und behalten), außer es gibt die
+    WavelengthMajor-Kopie und der Ausschnitt ist schmal genug.
+    """
+
+    # Endung des memmaps, in dem die Messdaten bei MeasurementSettings.MEMMAP liegen (neben der .npz-Datei)
+    MEMMAP_SUFFIX = "-measurements.npy"
+    # mit SAVE_WORKERS oder SAVE_CODEC gespeichert (nicht zu verwechseln mit dem Backup, das ohne Cache-Ordner auch im Messordner liegt)
+    CHUNKS_SUFFIX = "-measurements" + ChunkStore.SUFFIX
+    # Ergebnis für mein Spektrometer bei einer neutralen Messung (siehe SpectrumPlot.get_outlier_indices)
+    OUTLIER_INDICES = [493, 581, 1614, 1615]
+    # schmalere Ausschnitte werden aus der WavelengthMajor-Kopie gelesen (falls vorhanden)
+    WAVELENGTH_MAJOR_PIXELS = 256
+
+    def __init__(
+        self,
+        measurement_path: str,
+        # das erste ist normalerweise eine Störung (bei meinem Spektrometer). Alle Indizes zählen danach
+        remove_first=False,
+    ):
+        self.measurement_path = measurement_path
+        self.remove_first = int(remove_first)
+        self.store = None
+        self.spectra = None
+        self.wavelength_major = None
+
+        if ChunkStore.is_store(measurement_path):
+            self.store = ChunkStore(measurement_path)
+            shape, self.dtype = self.store.shape, self.store.dtype
+            _, self.wav, timestamps = self.store.read(spectra=False)
+            timestamps_ns = self.store.read_column("timestamps_ns")
+            time_anchor = self.store.load_array("time_anchor")
+            overflow = self.store.read_column("overflow")
+        else:
+            with np.load(measurement_path) as loaded_array:
+                # die Wellenlängen des Spektrometers
+                self.wav = loaded_array["arr_1"]
+                timestamps = loaded_array["arr_2"]
+                # in alten Messungen noch nicht vorhanden
+                timestamps_ns, time_anchor, overflow = (
+                    loaded_array[key] if key in loaded_array.files else None
+                    for key in ("timestamps_ns", "time_anchor", "overflow")
+                )
+                chunks_path = os.path.splitext(measurement_path)[0] + self.CHUNKS_SUFFIX
+                if "arr_0" in loaded_array.files:
+                    shape, self.dtype = self._npz_header(loaded_array, "arr_0")
+                elif ChunkStore.is_store(chunks_path):
+                    # mit SAVE_WORKERS oder SAVE_CODEC gespeichert: die Messdaten liegen in Chunks neben der .npz-Datei
+                    self.store = ChunkStore(chunks_path)
+                    shape, self.dtype = self.store.shape, self.store.dtype
+                else:
+                    # mit MEMMAP gemessen: die Messdaten liegen in einem eigenen .npy neben der .npz-Datei
+                    self.spectra = np.load(
+                        os.path.splitext(measurement_path)[0] + self.MEMMAP_SUFFIX,
+                        mmap_mode="r",
+                    )
+                    shape, self.dtype = self.spectra.shape, self.spectra.dtype
+
+        # alte Messungen haben noch keine Gradiant-Messung, dort ist num_gradiants immer default 1
+        if len(shape) < 3:
+            shape = (1,) + tuple(shape)
+        self.num_gradiants, repetitions, self.num_pixels = shape
+        self.repetitions = repetitions - self.remove_first
+
+        if timestamps_ns is not None and time_anchor is not None:
+            # aus der monotonen Uhr (Ende des Auslesens), ohne Sprünge der Systemzeit während der Messung.
+            # Zeilen ohne monotonen Zeitstempel (z. B. aus einem älteren Backup übernommen) behalten arr_2
+            read_end = timestamps_ns[..., SpectrumData.READ_END]
+            timestamps = np.where(
+                read_end != 0,
+                SpectrumData.wall_times(read_end, time_anchor),
+                timestamps,
+            )
+        if len(timestamps.shape) < 2:
+            timestamps = np.array((timestamps,))
+        self.timestamps = timestamps[:, self.remove_first :]
+
+        if overflow is not None and overflow.any():
+            print(
+                f"Warning: {int(overflow.sum())} spectra of {measurement_path} were clipped to the range of {self.dtype.name}.",
+                flush=True,
+            )
+
+        self.open_wavelength_major()
+
+    @staticmethod
+    def _npz_header(loaded_array, key):
+        """Form und Datentyp eines Arrays in der .npz, ohne es zu entpacken."""
+        with loaded_array.zip.open(key + ".npy") as f:
+            version = np.lib.format.read_magic(f)
+            read_header = (
+                np.lib.format.read_array_header_1_0
+                if version == (1, 0)
+                else np.lib.format.read_array_header_2_0
+            )
+            shape, _, dtype = read_header(f)
+        return shape, dtype
+
+    def wavelength_major_paths(self):
+        """Pfad der WavelengthMajor-Kopie und der Datei, mit der sie aktuell sein muss."""
+        if ChunkStore.is_store(self.measurement_path):
+            # ein Backup wächst während der Messung
+            return (
+                os.path.join(self.measurement_path, WavelengthMajor.STORE_FILE),
+                os.path.join(self.measurement_path, ChunkStore.INDEX_FILE),
+            )
+        return (
+            os.path.splitext(self.measurement_path)[0] + WavelengthMajor.FILE_SUFFIX,
+            self.measurement_path,
+        )
+
+    def open_wavelength_major(self, build=False):
+        """
+        Öffnet die WavelengthMajor-Kopie (mit WAVELENGTH_MAJOR beim Speichern geschrieben), wenn sie aktuell ist.
+        build: sonst einmal aus den Rohdaten erstellen (lohnt sich z. B. für viele Plots einzelner Wellenlängen).
+        Lässt sie sich nicht schreiben (z. B. schreibgeschützter Ordner), wird weiter aus den Rohdaten gelesen.
+        """
+        path, source_path = self.wavelength_major_paths()
+        if os.path.isfile(path) and os.path.getmtime(path) >= os.path.getmtime(
+            source_path
+        ):
+            self.wavelength_major = WavelengthMajor(path)
+        elif build:
+            print(f"writing {path}", flush=True)
+            try:
+                self.wavelength_major = WavelengthMajor.write(
+                    path,
+                    self.store.read()[0] if self.store is not None else self._spectra(),
+                )
+            except OSError as e:
+                print(f"could not write {path}, reading the raw data instead: {e}", flush=True)
+        return self.wavelength_major
+
+    def _spectra(self):
+        """Alle Messdaten einer .npz (einmal entpackt) oder das memmap."""
+        if self.spectra is None:
+            with np.load(self.measurement_path) as loaded_array:
+                self.spectra = loaded_array["arr_0"]
+            if len(self.spectra.shape) < 3:
+                self.spectra = np.array((self.spectra,))
+        return self.spectra
+
+    def pixel(self, wavelength) -> int:
+        """Index der Wellenlänge (nm), die wavelength am nächsten liegt."""
+        return int(np.abs(self.wav - wavelength).argmin())
+
+    def measured_repetitions(self, gradiant: int) -> int:
+        """
+        Wie viele Wiederholungen (ohne remove_first) des Gradienten gemessen wurden. Nach Konvergenz (CONVERGENCE_RSE)
+        oder TIMEOUT bleiben die restlichen Zeilen leer (Zeitstempel 0).
+        """
+        measured = np.flatnonzero(self.timestamps[gradiant])
+        return int(measured[-1]) + 1 if len(measured) else 0
+
+    def settings(self, measurement_settings: MeasurementSettings) -> MeasurementSettings:
+        """Kopie der Einstellungen, mit REPETITIONS wie in den geladenen Daten (ohne remove_first)."""
+        assert (
+            measurement_settings.laser.num_gradiants
+            == self.num_gradiants
+            == len(self.timestamps)
+        )
+        setting = copy.deepcopy(measurement_settings)
+        setting.laser.REPETITIONS = self.repetitions
+        return setting
+
+    def read(
+        self,
+        grad_start=0,
+        grad_end=None,
+        start=0,
+        end=None,
+        pixel_start=0,
+        pixel_end=None,
+    ):
+        """
+        (Gradienten, Wiederholungen, Pixel) des Ausschnitts im gespeicherten Datentyp, mit korrigierten Outliern.
+        Die Wiederholungen zählen wie timestamps (ohne remove_first). Ende jeweils exklusiv, None bis zum Ende.
+        """
+        grad_start, grad_end, _ = slice(grad_start, grad_end).indices(self.num_gradiants)
+        start, end, _ = slice(start, end).indices(self.repetitions)
+        pixel_start, pixel_end, _ = slice(pixel_start, pixel_end).indices(
+            self.num_pixels
+        )
+
+        # die Nachbarn der Outlier im Ausschnitt mitlesen
+        neighbors = {
+            pixel: self._outlier_neighbors(pixel)
+            for pixel in self.OUTLIER_INDICES
+            if pixel_start <= pixel < pixel_end
+        }
+        read_start = min([pixel_start] + [left for left, _ in neighbors.values()])
+        read_end = max([pixel_end] + [right + 1 for _, right in neighbors.values()])
+
+        data = self._read_raw(
+            slice(grad_start, grad_end),
+            slice(start + self.remove_first, end + self.remove_first),
+            slice(read_start, read_end),
+        )
+        # wie SpectrumPlot.replace_outliers_with_neighbors
+        for pixel, (left, right) in neighbors.items():
+            mean = np.mean(
+                (data[..., left - read_start], data[..., right - read_start]), axis=0
+            )
+            if np.issubdtype(data.dtype, np.integer):
+                # runden statt beim Zurückschreiben abschneiden (ganzzahliger STORAGE_DTYPE)
+                mean = np.rint(mean)
+            data[..., pixel - read_start] = mean
+        return data[..., pixel_start - read_start : pixel_end - read_start]
+
+    def _outlier_neighbors(self, pixel):
+        left = pixel
+        right = pixel
+        while left > 0 and left in self.OUTLIER_INDICES:
+            left -= 1
+        while right < self.num_pixels - 1 and right in self.OUTLIER_INDICES:
+            right += 1
+        return left, right
+
+    def _read_raw(self, gradiants: slice, repetitions: slice, pixels: slice):
+        """Kopie des Ausschnitts der Rohdaten (Indizes mit remove_first)."""
+        if (
+            self.wavelength_major is not None
+            and pixels.stop - pixels.start <= self.WAVELENGTH_MAJOR_PIXELS
+        ):
+            return np.array(
+                np.moveaxis(
+                    self.wavelength_major.data[pixels, gradiants, repetitions], 0, -1
+                ),
+                order="C",
+            )
+        if self.store is not None:
+            return self.store.read_window(gradiants, repetitions, pixels)
+        return np.array(self._spectra()[gradiants, repetitions, pixels])
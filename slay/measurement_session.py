@@ -0,0 +1,54 @@
+from queue import Empty, Queue
+import time
+from slay.settings import MeasurementSettings
+
+
+class MeasurementSession:
+    """
+    Führt mehrere Messungen nacheinander mit denselben, verbundenen Geräten durch (z. B. viele kurze Messungen über Nacht).
+
+    Die Einstellungen werden mit submit in eine Warteschlange gelegt, run arbeitet sie ab. Zwischen zwei Messungen
+    werden nur die Messdaten und Ausgabepfade neu angelegt (Measurement.reset), nicht die Geräte neu verbunden.
+    """
+
+    def __init__(self, measurement, gui=False, save=True):
+        # measurement: eine bereits initialisierte Measurement (mit den Einstellungen der ersten Messung)
+        self.measurement = measurement
+        self.gui = gui
+        self.save = save
+        self.queue = Queue()
+        # ob measurement noch unverbraucht ist (die erste Messung braucht kein reset)
+        self.fresh = True
+        # Dateinamen der fertigen Messungen
+        self.finished = []
+
+    def submit(self, settings: MeasurementSettings):
+        self.queue.put(settings)
+
+    def run(self):
+        """Misst, bis die Warteschlange leer ist. Die Geräte bleiben danach verbunden (siehe close)."""
+        while True:
+            try:
+                settings = self.queue.get_nowait()
+            except Empty:
+                return
+            self.run_one(settings)
+
+    def run_one(self, settings: MeasurementSettings):
+        start_time = time.time()
+        if not self.fresh or settings != self.measurement.MEASUREMENT_SETTINGS:
+            self.measurement.reset(settings)
+        self.fresh = False
+
+        self.measurement.measure(gui=self.gui, keep_devices=True)
+        if self.save:
+            self.measurement.save()
+        self.finished.append(self.measurement.measurement_file_name)
+        print(
+            f"session: finished {self.measurement.measurement_file_name} in {time.time() - start_time:.2f} seconds, "
+            f"{self.queue.qsize()} measurements left",
+            flush=True,
+        )
+
+    def close(self):
+        self.measurement.stop_all_devices()
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+class RunningStats:
+    """
+    Mittelwert, Varianz, Minimum und Maximum pro Gradient und Wellenlänge, während der Messung mitgeführt
+    (Welford-Algorithmus, O(Pixel) pro Spektrum). Übersichtsplots brauchen so nicht die gesamten Rohdaten.
+    """
+
+    # neben der .npz einer Messung
+    FILE_SUFFIX = "-stats.npz"
+    # im Ordner eines Backups (siehe BackupService)
+    STORE_FILE = "stats.npz"
+
+    def __init__(self, num_gradiants, num_pixels, alloc=np.zeros):
+        # alloc(shape, dtype) wie bei SpectrumRingBuffer
+        self.count = alloc(num_gradiants, np.int64)
+        self.mean = alloc((num_gradiants, num_pixels), float)
+        # Summe der quadrierten Abweichungen vom Mittelwert
+        self.m2 = alloc((num_gradiants, num_pixels), float)
+        self.min = alloc((num_gradiants, num_pixels), float)
+        self.min[:] = np.inf
+        self.max = alloc((num_gradiants, num_pixels), float)
+        self.max[:] = -np.inf
+
+    def update(self, gradiant, spectrum):
+        spectrum = np.asarray(spectrum, dtype=float)
+        self.count[gradiant] += 1
+        delta = spectrum - self.mean[gradiant]
+        self.mean[gradiant] += delta / self.count[gradiant]
+        self.m2[gradiant] += delta * (spectrum - self.mean[gradiant])
+        np.minimum(self.min[gradiant], spectrum, out=self.min[gradiant])
+        np.maximum(self.max[gradiant], spectrum, out=self.max[gradiant])
+
+    def variance(self, ddof=0):
+        """Wie np.var(..., ddof=ddof) über die Wiederholungen. NaN für Gradienten mit zu wenigen Spektren."""
+        dof = (self.count - ddof).astype(float)[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(dof > 0, self.m2 / dof, np.nan)
+
+    def std(self, ddof=0):
+        return np.sqrt(self.variance(ddof))
+
+    def save(self, path: str):
+        # savez hängt sonst ein .npz an den Namen
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                count=self.count,
+                mean=self.mean,
+                m2=self.m2,
+                min=self.min,
+                max=self.max,
+            )
+
+    @staticmethod
+    def load(path: str):
+        with np.load(path) as data:
+            stats = RunningStats(*data["mean"].shape)
+            for name in ("count", "mean", "m2", "min", "max"):
+                getattr(stats, name)[:] = data[name]
+        return stats
@@ -15,6 +15,11 @@ class MeasurementSettings:
         SMOOTH: int
         XTIMING: int
         AMPLIFICATION: bool = False
+        # die Integrationszeit nach jedem Spektrum anpassen (siehe AutoExposure), INTTIME ist dann nur der Startwert
+        AUTO_EXPOSURE: bool = False
+        # ms, Grenzen für AUTO_EXPOSURE
+        INTTIME_MIN: int = 2
+        INTTIME_MAX: int = 1000
 
     @dataclass
     class LaserSettings:
@@ -42,6 +47,12 @@ class MeasurementSettings:
         REPETITIONS_LTB: str = "0"
         # mit einem Blatt testen, wie weit der Fokuspunkt der Diodenlaser von der Küvette entfernt sind
         FOCUS_DIST: int = 0
+        # bei gepulsten Messungen die Pulsfolge von der Firmware schalten lassen, statt jede Wiederholung vom Host aus
+        HARDWARE_TIMING: bool = False
+        # binäres Protokoll mit ACK/NACK statt ASCII und SERIAL_DELAY (siehe mcu_protocol.py)
+        BINARY_PROTOCOL: bool = False
+        # ms, feste Periode der Wiederholungen (Beginn zu Beginn), ersetzt MEASUREMENT_DELAY als Taktgeber. 0: wie bisher
+        REPETITION_PERIOD: int = 0
 
         def __post_init__(self):
             self.convert_string_values()
@@ -179,6 +190,34 @@ class MeasurementSettings:
         0  # in alten Messungen noch nicht vorhanden gewesen, deshalb default 0
     )
     OXYGEN_SPEED: int = 0  # wie viel Luft pro Minute gepumpt wird.
+    # die Messdaten nicht im RAM, sondern in einem memmap im Messordner halten (für sehr lange Messungen)
+    MEMMAP: bool = False
+    # den nächsten Gradienten vorbereiten, während der aktuelle misst (siehe GradientScheduler)
+    PIPELINE_GRADIENTS: bool = False
+    # die Messschleife in einem eigenen Prozess ausführen, damit Live-Plot und Backup ihr Timing nicht beeinflussen
+    ACQUISITION_PROCESS: bool = False
+    # Datentyp der Messdaten im RAM, im Backup und in der .npz (siehe SpectrumData.STORAGE_DTYPES).
+    # uint16 reicht für die Counts des Spektrometers und braucht ein Viertel des Speichers, Werte außerhalb werden
+    # abgeschnitten und pro Spektrum markiert (overflow)
+    STORAGE_DTYPE: str = "float64"
+    # beim Speichern zusätzlich eine nach Wellenlängen sortierte Kopie schreiben (siehe WavelengthMajor),
+    # aus der Plots einer einzelnen Wellenlänge gelesen werden. Sonst wird sie beim ersten solchen Plot erstellt
+    # (falls der Ordner beschreibbar ist, ansonsten wird aus den Rohdaten gelesen)
+    WAVELENGTH_MAJOR: bool = False
+    # > 0: die Messdaten beim Speichern in Chunks aufteilen und mit so vielen Threads gleichzeitig komprimieren
+    # (neben der .npz als ChunkStore), statt sie einzeln in die .npz zu schreiben. Für große Messungen
+    SAVE_WORKERS: int = 0
+    # Codec der Chunks beim Speichern (siehe chunk_codec.CODECS). Gesetzt werden die Messdaten auch ohne SAVE_WORKERS
+    # als Chunks gespeichert. "delta-shuffle" ist verlustfrei und deutlich kleiner als zlib allein.
+    # Beide werden mit MEMMAP ignoriert (mit Warnung), die Messdaten bleiben dann im memmap
+    SAVE_CODEC: str = ""
+    # die Wiederholungen eines Gradienten beenden, sobald der relative Standardfehler des Mittelwerts im Bereich
+    # CONVERGENCE_WAV_START bis CONVERGENCE_WAV_END (nm) darunter liegt (siehe ConvergenceCheck). 0: immer REPETITIONS
+    CONVERGENCE_RSE: float = 0
+    CONVERGENCE_WAV_START: float = 650
+    CONVERGENCE_WAV_END: float = 760
+    # so viele Wiederholungen werden mindestens gemessen, höchstens REPETITIONS
+    CONVERGENCE_MIN_REPETITIONS: int = 10
 
     def __post_init__(self):
         # in ms, Abschätzung
@@ -193,12 +232,21 @@ class MeasurementSettings:
             )
 
     def save_as_json(self, json_file):
-        json.dump(asdict(self), json_file, indent=4)
+        json.dump(self.to_dict(), json_file, indent=4)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
 
     @staticmethod
     def from_json(json_file_path):
         with open(json_file_path, "r", encoding="utf-8") as file:
             data = json.load(file)
+        return MeasurementSettings.from_dict(data)
+
+    @staticmethod
+    def from_dict(data: dict):
+        """Gegenstück zu to_dict (z. B. für den MeasurementDaemon)."""
+        data = dict(data)
 
         def from_dict(cls, dict_data):
             if cls == MeasurementSettings:
@@ -0,0 +1,47 @@
+class SpectrometerSession:
+    """
+    Dünne Hülle um das Spektrometer (stellarnet_driver3 oder slay.virtual), die sich die zuletzt gesetzten Parameter merkt.
+
+    sn.setParam wird nur aufgerufen, wenn sich etwas geändert hat, und das erste Spektrum danach nur verworfen,
+    wenn sich die Integrationszeit geändert hat (nur dann ist es ungenau).
+    """
+
+    def __init__(self, sn, spectrometer):
+        self.sn = sn
+        self.spectrometer = spectrometer
+        # (INTTIME, SCAN_AVG, SMOOTH, XTIMING), None: unbekannt (z. B. nach dem Verbinden)
+        self.params = None
+        # Änderungen, die nicht gesendet werden mussten
+        self.skipped_updates = 0
+        # durch eine geänderte Integrationszeit verworfene Spektren
+        self.discarded_frames = 0
+
+    @property
+    def inttime(self):
+        return None if self.params is None else self.params[0]
+
+    def set_params(self, inttime, scan_avg, smooth, xtiming) -> bool:
+        """Gibt zurück, ob die Parameter gesendet wurden."""
+        params = (inttime, scan_avg, smooth, xtiming)
+        if params == self.params:
+            self.skipped_updates += 1
+            return False
+
+        discard = self.params is None or inttime != self.params[0]
+        self.sn.setParam(self.spectrometer, *params, discard)
+        self.params = params
+        self.discarded_frames += discard
+        return True
+
+    def invalidate(self):
+        """Nach einem Reset/Neuverbinden sind die Parameter des Spektrometers unbekannt."""
+        self.params = None
+
+    def read(self):
+        return self.sn.getSpectrum_Y(self.spectrometer)
+
+    def wavelengths(self):
+        return self.sn.getSpectrum_X(self.spectrometer)
+
+    def summary(self) -> str:
+        return f"{self.skipped_updates} parameter updates skipped, {self.discarded_frames} frames discarded"
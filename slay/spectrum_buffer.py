@@ -0,0 +1,148 @@
+from collections import namedtuple
+from queue import Queue
+from threading import Event, Thread
+import time
+import numpy as np
+
+
+# ein Spektrum aus dem SpectrumRingBuffer. times_ns: Trigger, Beginn und Ende des Auslesens (time.monotonic_ns),
+# siehe SpectrumData.TIMESTAMP_COLUMNS
+SpectrumEntry = namedtuple(
+    "SpectrumEntry",
+    ["seq", "spectrum", "times_ns", "gradiant", "index"],
+)
+
+
+class SpectrumRingBuffer:
+    """
+    Vorab allozierter Ringpuffer für die zuletzt gelesenen Spektren.
+
+    Es gibt genau einen Schreiber (SpectrometerReader), Leser brauchen keinen Lock: jeder Platz trägt die Sequenznummer
+    des Spektrums, das in ihm liegt. Sie wird während des Schreibens ungültig gesetzt, ein Leser prüft sie vor und nach dem
+    Kopieren und erkennt so, ob der Platz inzwischen überschrieben wurde.
+    """
+
+    def __init__(self, capacity: int, num_pixels: int, dtype=float, alloc=np.zeros):
+        # alloc(shape, dtype) legt die Arrays an, z. B. im Shared Memory (siehe SpectrumData)
+        self.capacity = capacity
+        self.spectra = alloc((capacity, num_pixels), dtype)
+        self.times_ns = alloc((capacity, 3), np.int64)
+        # Gradient und Wiederholung
+        self.positions = alloc((capacity, 2), np.int64)
+        self.positions[:] = -1
+        self.seqs = alloc(capacity, np.int64)
+        self.seqs[:] = -1
+        # Sequenznummer des nächsten Spektrums (als Array, damit auch ein anderer Prozess sie sieht)
+        self._head = alloc(1, np.int64)
+
+    @property
+    def head(self) -> int:
+        return int(self._head[0])
+
+    @head.setter
+    def head(self, value: int):
+        self._head[0] = value
+
+    def push(self, spectrum, times_ns, gradiant, index) -> int:
+        seq = self.head
+        slot = seq % self.capacity
+        self.seqs[slot] = -1
+        self.spectra[slot] = spectrum
+        self.times_ns[slot] = times_ns
+        self.positions[slot] = (gradiant, index)
+        # erst jetzt ist das Spektrum für Leser sichtbar
+        self.seqs[slot] = seq
+        self.head = seq + 1
+        return seq
+
+    def get(self, seq: int):
+        """Gibt das Spektrum mit der Sequenznummer seq zurück, oder None, wenn es schon überschrieben wurde."""
+        slot = seq % self.capacity
+        if seq < 0 or self.seqs[slot] != seq:
+            return None
+        entry = SpectrumEntry(
+            seq,
+            self.spectra[slot].copy(),
+            self.times_ns[slot].copy(),
+            int(self.positions[slot][0]),
+            int(self.positions[slot][1]),
+        )
+        if self.seqs[slot] != seq:
+            return None
+        return entry
+
+    def latest(self):
+        while self.head > 0:
+            entry = self.get(self.head - 1)
+            if entry is not None:
+                return entry
+        return None
+
+    def read_since(self, seq: int):
+        """
+        Gibt alle Spektren ab der Sequenznummer seq und die Sequenznummer für den nächsten Aufruf zurück.
+        Ist ein Leser mehr als capacity Spektren zurück, fehlen die überschriebenen in der Liste.
+        """
+        head = self.head
+        entries = []
+        for s in range(max(seq, head - self.capacity), head):
+            entry = self.get(s)
+            if entry is not None:
+                entries.append(entry)
+        return entries, head
+
+
+class SpectrometerReader:
+    """
+    Thread, dem das Spektrometer gehört: nur er ruft read auf und legt jedes Spektrum im SpectrumRingBuffer ab.
+    Die Messschleife fordert Spektren mit capture an, alle anderen (Live-Plot, Analysen, ...) lesen aus dem Ringpuffer,
+    ohne die Messung aufzuhalten.
+    """
+
+    def __init__(self, read, ring: SpectrumRingBuffer):
+        self.read = read
+        self.ring = ring
+        self.requests = Queue()
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            gradiant, index, trigger_ns, done, result = request
+            try:
+                read_start_ns = time.monotonic_ns()
+                spectrum = self.read()
+                read_end_ns = time.monotonic_ns()
+                result.append(
+                    self.ring.push(
+                        spectrum,
+                        (trigger_ns or read_start_ns, read_start_ns, read_end_ns),
+                        gradiant,
+                        index,
+                    )
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                # wird in capture erneut geworfen
+                result.append(e)
+            done.set()
+
+    def capture(self, gradiant, index, trigger_ns=0) -> SpectrumEntry:
+        """
+        Liest ein Spektrum und wartet, bis es im Ringpuffer liegt.
+        trigger_ns: wann die Wiederholung ausgelöst wurde (z. B. Laser an), ohne gilt der Beginn des Auslesens.
+        """
+        done = Event()
+        result = []
+        self.requests.put((gradiant, index, trigger_ns, done, result))
+        done.wait()
+        if isinstance(result[0], Exception):
+            raise result[0]
+        # der Schreiber ist bis zur nächsten Anfrage untätig, der Platz kann also nicht überschrieben sein
+        return self.ring.get(result[0])
+
+    def stop(self):
+        self.requests.put(None)
+        self.thread.join()
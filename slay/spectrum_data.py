@@ -0,0 +1,185 @@
+from multiprocessing import shared_memory
+import multiprocessing
+from threading import Event
+import time
+import os
+import numpy as np
+from slay.spectrum_buffer import SpectrumRingBuffer
+from slay.running_stats import RunningStats
+
+
+class SpectrumData:
+    """Hält die Messdaten einer (Gradienten-)Messung."""
+
+    # Anzahl der zuletzt gemessenen Spektren, die für Live-Plot etc. im Ringpuffer gehalten werden
+    RING_BUFFER_SIZE = 64
+    # Spalten von timestamps_ns (time.monotonic_ns)
+    TIMESTAMP_COLUMNS = ("trigger", "read_start", "read_end")
+    READ_END = 2
+    # die ersten Wiederholungen gehen nicht in RunningStats ein (wie measurement_from_disk(remove_first=True))
+    STATS_SKIP_REPETITIONS = 1
+    # mögliche Datentypen der Messdaten (siehe STORAGE_DTYPE): Counts als Ganzzahlen oder Gleitkommazahlen
+    STORAGE_DTYPES = ("uint16", "uint32", "float32", "float64")
+
+    def __init__(
+        self,
+        num_gradiants,
+        repetitions,
+        wav,
+        memmap_path: str = "",
+        shared: bool = False,
+        dtype=float,
+        # ms, auf diese Integrationszeit werden die Spektren für stats skaliert (siehe scaled_spectrum). 0: nicht skalieren
+        inttime=0,
+    ):
+        # mit shared liegen alle Arrays im Shared Memory, ein (geforkter) Messprozess schreibt also direkt in die Daten des Elternprozesses
+        self.shared_memory = []
+        self.shared_memory_released = False
+        alloc = self._alloc_shared if shared else np.zeros
+        dtype = np.dtype(dtype)
+        if dtype.name not in self.STORAGE_DTYPES:
+            raise ValueError(
+                f"Unsupported storage dtype {dtype.name}, expected one of {', '.join(self.STORAGE_DTYPES)}."
+            )
+
+        shape = (num_gradiants, repetitions, len(wav))
+        if memmap_path:
+            # die Datei wird in voller Größe (sparse) angelegt, im RAM landen nur die gerade benutzten Seiten.
+            # open_memmap schreibt einen .npy-Header, die Datei kann also später mit np.load(..., mmap_mode="r") gelesen werden
+            # (ein memmap wird auch über Prozessgrenzen hinweg geteilt)
+            self.measurements = np.lib.format.open_memmap(
+                memmap_path, mode="w+", dtype=dtype, shape=shape
+            )
+        else:
+            self.measurements = alloc(shape, dtype)
+        self.memmap_path = memmap_path
+        # Wanduhr in s nach dem Auslesen, aus timestamps_ns und time_anchor berechnet (ohne Sprünge durch NTP)
+        self.timestamps = alloc((num_gradiants, repetitions), float)
+        # ns, monotone Zeitstempel pro Spektrum (siehe TIMESTAMP_COLUMNS)
+        self.timestamps_ns = alloc((num_gradiants, repetitions, 3), np.int64)
+        # ms, tatsächlich genutzte Integrationszeit pro Spektrum (bei AUTO_EXPOSURE nicht immer INTTIME)
+        self.inttimes = alloc((num_gradiants, repetitions), np.int64)
+        # pro Spektrum: Werte lagen außerhalb des Bereichs von dtype und wurden abgeschnitten (siehe to_storage)
+        self.overflow = alloc((num_gradiants, repetitions), bool)
+        # einmal pro Messung: time.time_ns() und time.monotonic_ns() zum gleichen Zeitpunkt
+        self.time_anchor = alloc(2, np.int64)
+        self.time_anchor[:] = (time.time_ns(), time.monotonic_ns())
+        # ns, Verspätung jeder Wiederholung gegenüber REPETITION_PERIOD (siehe DeadlineScheduler)
+        self.lateness = alloc((num_gradiants, repetitions), np.int64)
+        self.wav = wav
+        self.inttime = inttime
+        # curr_gradiant und curr_measurement_index
+        self._position = alloc(2, np.int64)
+        self._position[:] = -1
+        self.stop_event = multiprocessing.Event() if shared else Event()
+        # die zuletzt gemessenen Spektren, mit Sequenznummer (siehe SpectrometerReader)
+        self.ring = SpectrumRingBuffer(self.RING_BUFFER_SIZE, len(wav), alloc=alloc)
+        # Mittelwert, Varianz, Minimum und Maximum pro Gradient, während der Messung mitgeführt (mit scaled_spectrum)
+        self.stats = RunningStats(num_gradiants, len(wav), alloc=alloc)
+
+    def _alloc_shared(self, shape, dtype):
+        size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        self.shared_memory.append(shm)
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        array[...] = 0
+        return array
+
+    def release_shared_memory(self):
+        """Gibt die Shared-Memory-Blöcke frei, sobald der Messprozess beendet ist. Die Arrays bleiben in diesem Prozess lesbar."""
+        # die SharedMemory-Objekte müssen erhalten bleiben: beim Aufräumen würden sie den Speicher unter den Arrays freigeben
+        if self.shared_memory_released:
+            return
+        for shm in self.shared_memory:
+            shm.unlink()
+        self.shared_memory_released = True
+
+    def is_shared(self) -> bool:
+        return bool(self.shared_memory)
+
+    @property
+    def curr_gradiant(self) -> int:
+        return int(self._position[0])
+
+    @curr_gradiant.setter
+    def curr_gradiant(self, value: int):
+        self._position[0] = value
+
+    @property
+    def curr_measurement_index(self) -> int:
+        return int(self._position[1])
+
+    @curr_measurement_index.setter
+    def curr_measurement_index(self, value: int):
+        self._position[1] = value
+
+    def get_data(self):
+        return self.measurements, self.wav, self.curr_measurement_index
+
+    def store(self, entry):
+        """Übernimmt ein Spektrum aus dem Ringpuffer in die Messdaten."""
+        spectrum, overflow = self.to_storage(entry.spectrum)
+        self.measurements[entry.gradiant][entry.index] = spectrum
+        self.overflow[entry.gradiant][entry.index] = overflow
+        self.timestamps_ns[entry.gradiant][entry.index] = entry.times_ns
+        self.update_stats(entry.gradiant, entry.index)
+        # der Zeitstempel zuletzt: er markiert die Zeile als vollständig (siehe BackupService)
+        self.timestamps[entry.gradiant][entry.index] = self.wall_times(
+            entry.times_ns[self.READ_END], self.time_anchor
+        )
+
+    def to_storage(self, spectrum):
+        """
+        Wandelt ein Spektrum in den Datentyp der Messdaten um und gibt zurück, ob Werte abgeschnitten werden mussten.
+        Bei Ganzzahlen wird gerundet (mit SCAN_AVG gemittelte Counts), NaN wird zu 0 und zählt als Überlauf.
+        """
+        dtype = self.measurements.dtype
+        spectrum = np.asarray(spectrum, dtype=float)
+        if dtype == np.float64:
+            return spectrum, False
+
+        info = np.finfo(dtype) if dtype.kind == "f" else np.iinfo(dtype)
+        out_of_range = (spectrum < info.min) | (spectrum > info.max)
+        if dtype.kind != "f":
+            out_of_range |= np.isnan(spectrum)
+            spectrum = np.nan_to_num(np.rint(spectrum))
+        return (
+            np.clip(spectrum, info.min, info.max).astype(dtype),
+            bool(out_of_range.any()),
+        )
+
+    def update_stats(self, gradiant, index):
+        if index >= self.STATS_SKIP_REPETITIONS:
+            self.stats.update(gradiant, self.scaled_spectrum(gradiant, index))
+
+    def scaled_spectrum(self, gradiant, index):
+        """
+        Das Spektrum, auf die Integrationszeit inttime skaliert: bei AUTO_EXPOSURE ändert sie sich während eines
+        Gradienten, die Counts wachsen (wie in AutoExposure angenommen) linear mit ihr.
+        """
+        spectrum = self.measurements[gradiant][index]
+        inttime = self.inttimes[gradiant][index]
+        if not self.inttime or not inttime or inttime == self.inttime:
+            return spectrum
+        return spectrum * (self.inttime / inttime)
+
+    @staticmethod
+    def wall_times(monotonic_ns, time_anchor):
+        """Rechnet monotone Zeitstempel (ns) mit dem Anker der Messung in die Wanduhr (s) um. 0 (nicht gemessen) bleibt 0."""
+        monotonic_ns = np.asarray(monotonic_ns, dtype=np.int64)
+        wall = (time_anchor[0] + (monotonic_ns - time_anchor[1])) / 1e9
+        return np.where(monotonic_ns != 0, wall, 0.0)
+
+    def is_memmap(self) -> bool:
+        return bool(self.memmap_path)
+
+    def flush(self):
+        """Schreibt die Änderungen an einem memmap auf die Platte (ohne memmap passiert nichts)."""
+        if isinstance(self.measurements, np.memmap):
+            self.measurements.flush()
+
+    def move_memmap(self, memmap_path: str):
+        """Benennt die Datei des memmaps um. Das Array bleibt gültig, die Abbildung hängt an der Datei, nicht am Namen."""
+        self.flush()
+        os.replace(self.memmap_path, memmap_path)
+        self.memmap_path = memmap_path
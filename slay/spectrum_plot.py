@@ -34,10 +34,16 @@ import json
 
 from slay.settings import MeasurementSettings
 from slay.settings import PlotSettings
+from slay.chunk_store import ChunkStore
+from slay.running_stats import RunningStats
+from slay.measurement_loader import MeasurementLoader
 
 
 class SpectrumPlot:
 
+    # Endung des memmaps, in dem die Messdaten bei MeasurementSettings.MEMMAP liegen (neben der .npz-Datei)
+    MEMMAP_SUFFIX = MeasurementLoader.MEMMAP_SUFFIX
+
     @dataclass
     class GraphSettings:
         fig: any
@@ -510,47 +516,45 @@ class SpectrumPlot:
         measurement_settings: MeasurementSettings,
         # das erste ist normalerweise eine Störung (bei meinem Spektrometer)
         remove_first=False,
+        # nm: nur diese Wellenlänge laden, als (Gradienten, Wiederholungen, 1) (siehe WavelengthMajor)
+        single_wav=0,
     ):
+        """Die ganze Messung (oder eine Wellenlänge). Für Ausschnitte direkt MeasurementLoader.read nutzen."""
+        loader = MeasurementLoader(measurement_path, remove_first)
+        x_data = loader.wav
+        if single_wav:
+            loader.open_wavelength_major(build=True)
+            pixel = loader.pixel(single_wav)
+            spectrometer_data_gradient = loader.read(
+                pixel_start=pixel, pixel_end=pixel + 1
+            )
+            x_data = x_data[pixel : pixel + 1]
+        else:
+            spectrometer_data_gradient = loader.read()
 
-        loaded_array = np.load(measurement_path)
-        spectrometer_data_gradient = loaded_array["arr_0"]
-        # outlier_indices = SpectrumPlot.get_outlier_indices(
-        #     spectrometer_data_gradient, threshold=9
-        # )
-        # Ergebnis für mein Spektrometer bei einer neutralen Messung:
-        outlier_indices = [493, 581, 1614, 1615]
-
-        spectrometer_data_gradient = SpectrumPlot.replace_outliers_with_neighbors(
-            spectrometer_data_gradient, outlier_indices
-        )
-        # die Wellenlängen des Spektrometers
-        x_data = loaded_array["arr_1"]
-        time_stamps_gradient = loaded_array["arr_2"]
-        del loaded_array
-
-        # alte Messungen haben noch keine Gradiant-Messung, dort ist num_gradiants immer default 1
-        if len(spectrometer_data_gradient.shape) < 3:
-            spectrometer_data_gradient = np.array((spectrometer_data_gradient,))
-
-        if len(time_stamps_gradient.shape) < 2:
-            time_stamps_gradient = np.array((time_stamps_gradient,))
-
-        assert (
-            measurement_settings.laser.num_gradiants
-            == len(spectrometer_data_gradient)
-            == len(time_stamps_gradient)
-        )
-
-        setting = copy.deepcopy(measurement_settings)
-
-        setting.laser.REPETITIONS = spectrometer_data_gradient.shape[1] - remove_first
         return (
-            spectrometer_data_gradient[:, remove_first:, :],
+            spectrometer_data_gradient,
             x_data,
-            time_stamps_gradient[:, remove_first:],
-            setting,
+            loader.timestamps,
+            loader.settings(measurement_settings),
         )
 
+    @staticmethod
+    def inttimes_from_disk(measurement_path: str, remove_first=False):
+        """Integrationszeit (ms) pro Spektrum wie bei measurement_from_disk, oder None bei alten Messungen."""
+        if ChunkStore.is_store(measurement_path):
+            inttimes = ChunkStore(measurement_path).read_column("inttimes")
+        else:
+            with np.load(measurement_path) as loaded_array:
+                inttimes = (
+                    loaded_array["inttimes"]
+                    if "inttimes" in loaded_array.files
+                    else None
+                )
+        if inttimes is None:
+            return None
+        return inttimes[:, remove_first:]
+
     @staticmethod
     def save_plots(
         fig,
@@ -586,20 +590,21 @@ class SpectrumPlot:
         heatmap_plot_index: int,
     ):
 
-        (
-            spectrometer_data_gradient,
-            x_data,
-            time_stamps_gradient,
-            measurement_settings,
-        ) = SpectrumPlot.measurement_from_disk(measurement_path, ms, remove_first=True)
+        loader = MeasurementLoader(measurement_path, remove_first=True)
+        # prüft, ob die Einstellungen zur Messung passen
+        loader.settings(ms)
+        heatmap_plot_index = range(loader.num_gradiants)[heatmap_plot_index]
+        # ohne die leeren Zeilen nach Konvergenz oder TIMEOUT
+        measured_repetitions = loader.measured_repetitions(heatmap_plot_index)
+        time_stamps = loader.timestamps[heatmap_plot_index][:measured_repetitions]
 
         fig_heat, ax_heat = plt.subplots()
         # bisher nur den ersten Gradient plotten, nicht mehr
         heat_map = ax_heat.pcolormesh(
-            x_data,
-            time_stamps_gradient[heatmap_plot_index]
-            - time_stamps_gradient[heatmap_plot_index][0],
-            spectrometer_data_gradient[heatmap_plot_index],
+            loader.wav,
+            time_stamps - time_stamps[0],
+            # nur dieser Gradient wird gelesen
+            loader.read(heatmap_plot_index, heatmap_plot_index + 1, 0, measured_repetitions)[0],
             # schwarzer Hintergrund gibt besseren Kontrast
             cmap="inferno",
         )
@@ -612,6 +617,62 @@ class SpectrumPlot:
         title = os.path.basename(measurement_path).split(".")[0]
         SpectrumPlot.save_plots(fig_heat, os.path.join(save_path, title + "_heatmap"))
 
+    @staticmethod
+    def stats_from_disk(measurement_path: str):
+        """Lädt die während der Messung mitgeführte Statistik (siehe RunningStats) und die Wellenlängen, ohne die Rohdaten."""
+        if ChunkStore.is_store(measurement_path):
+            stats = RunningStats.load(
+                os.path.join(measurement_path, RunningStats.STORE_FILE)
+            )
+            x_data = np.load(os.path.join(measurement_path, ChunkStore.WAV_FILE))
+        else:
+            stats = RunningStats.load(
+                os.path.splitext(measurement_path)[0] + RunningStats.FILE_SUFFIX
+            )
+            with np.load(measurement_path) as loaded_array:
+                x_data = loaded_array["arr_1"]
+
+        # wie bei den Rohdaten (siehe MeasurementLoader)
+        outlier_indices = MeasurementLoader.OUTLIER_INDICES
+        for name in ("mean", "m2", "min", "max"):
+            getattr(stats, name)[:] = SpectrumPlot.replace_outliers_with_neighbors(
+                getattr(stats, name)[:, np.newaxis, :], outlier_indices
+            )[:, 0, :]
+        return stats, x_data
+
+    @staticmethod
+    def plot_stats(measurement_path: str, smooth=False):
+        """Schneller Überblick: Mittelwert und Standardabweichung pro Gradient, ohne die Rohdaten zu laden."""
+        stats, x_data = SpectrumPlot.stats_from_disk(measurement_path)
+        std = stats.std()
+        gradiants = np.flatnonzero(stats.count)
+
+        fig, ax = plt.subplots()
+        colors = plt.cm.viridis(np.linspace(0, 1, max(1, len(gradiants))))
+        for color, g in zip(colors, gradiants):
+            SpectrumPlot.data_to_plot(
+                SpectrumPlot.GraphSettings(
+                    fig,
+                    ax,
+                    x_data,
+                    stats.mean[g],
+                    f"Gradient {g} ({stats.count[g]} Messungen)",
+                    smooth,
+                    color,
+                    "-",
+                    # bei mehreren Gradienten wird es sonst unübersichtlich
+                    std=std[g] if len(gradiants) == 1 else None,
+                    scatter=False,
+                    num_others=len(gradiants) - 1,
+                )
+            )
+        ax.set_xlabel("Wellenlänge (nm)")
+        ax.set_ylabel("Intensität (Counts)")
+
+        save_path = os.path.dirname(os.path.normpath(measurement_path))
+        title = os.path.basename(os.path.normpath(measurement_path)).split(".")[0]
+        SpectrumPlot.save_plots(fig, os.path.join(save_path, title + "_stats"))
+
     @staticmethod
     def plot_3d_gradient(
         measurement_path: str,
@@ -620,12 +681,13 @@ class SpectrumPlot:
         grad_end: int = -1,
     ):
 
-        spectrometer_data_gradient, x_data, _, measurement_settings = (
-            SpectrumPlot.measurement_from_disk(measurement_path, ms, remove_first=True)
-        )
+        loader = MeasurementLoader(measurement_path, remove_first=True)
+        # prüft, ob die Einstellungen zur Messung passen
+        loader.settings(ms)
+        x_data = loader.wav
 
         if grad_end < 0:
-            grad_end += len(spectrometer_data_gradient)
+            grad_end += loader.num_gradiants
 
         assert grad_end - grad_start > 1
 
@@ -635,7 +697,7 @@ class SpectrumPlot:
         X = x_data
         X, Y = np.meshgrid(X, Y)
         Z = np.mean(
-            spectrometer_data_gradient[grad_start:grad_end],
+            loader.read(grad_start, grad_end),
             axis=1,
             dtype=float,
         )
@@ -766,28 +828,37 @@ class SpectrumPlot:
             #     if f.endswith(".npz")
             # ]
 
-            (
-                spectrometer_data_gradient,
-                x_data,
-                time_stamps_gradient,
-                measurement_settings,
-            ) = SpectrumPlot.measurement_from_disk(
-                orig_setting.measurement_path,
-                ms,
-                remove_first=True,
+            # die Spektren werden erst unten gelesen, nur im Ausschnitt von Zeit und Wellenlänge
+            loader = MeasurementLoader(orig_setting.measurement_path, remove_first=True)
+            x_data = loader.wav
+            time_stamps_gradient = loader.timestamps
+            measurement_settings = loader.settings(ms)
+            if orig_setting.single_wav:
+                # eine Wellenlänge über alle Wiederholungen liegt dort zusammenhängend
+                loader.open_wavelength_major(build=True)
+            inttimes_gradient = (
+                SpectrumPlot.inttimes_from_disk(
+                    orig_setting.measurement_path, remove_first=True
+                )
+                if orig_setting.normalize_integrationtime
+                else None
             )
 
             if orig_setting.grad_end == orig_setting.default_max:
-                orig_setting.grad_end = len(spectrometer_data_gradient)
-            elif orig_setting.grad_end > len(spectrometer_data_gradient):
+                orig_setting.grad_end = loader.num_gradiants
+            elif orig_setting.grad_end > loader.num_gradiants:
                 raise ValueError(
                     "The specified number of gradients exceeds the number of gradients in the measurement."
                 )
 
             for grad_index in range(orig_setting.grad_start, orig_setting.grad_end):
 
-                spectrometer_data = spectrometer_data_gradient[grad_index]
-                time_stamps = time_stamps_gradient[grad_index].copy()
+                # leere Zeilen (nach Konvergenz oder TIMEOUT) würden den Mittelwert und die Zeitachse verfälschen
+                measured_repetitions = loader.measured_repetitions(grad_index)
+                if measured_repetitions == 0:
+                    print(f"gradient {grad_index} was not measured, skipping", flush=True)
+                    continue
+                time_stamps = time_stamps_gradient[grad_index][:measured_repetitions].copy()
 
                 begin_time_offset = time_stamps[0] - time_stamps_gradient[0][0]
 
@@ -817,7 +888,7 @@ class SpectrumPlot:
                 )
 
                 setting.interval_end = (
-                    len(spectrometer_data)
+                    measured_repetitions
                     if setting.interval_end_time == sys.maxsize
                     else (
                         (np.abs(time_stamps - setting.interval_end_time)).argmin()
@@ -863,7 +934,7 @@ class SpectrumPlot:
                 # if setting.zoom_start != 0:
                 #     setting.zoom_start = (np.abs(x_data - setting.zoom_start)).argmin()
 
-                assert measurement_settings.laser.REPETITIONS == len(spectrometer_data)
+                assert measurement_settings.laser.REPETITIONS == loader.repetitions
 
                 # # aus den gesamten Daten den durch die Slices definierten Teil ausschneiden
                 # extracted_data = np.zeros(
@@ -888,22 +959,39 @@ class SpectrumPlot:
                     )
                     return
 
-                extracted_data = spectrometer_data[
-                    setting.interval_start : setting.interval_end,
-                    setting.zoom_start : setting.zoom_end,
-                ]
+                extracted_data = loader.read(
+                    grad_index,
+                    grad_index + 1,
+                    setting.interval_start,
+                    setting.interval_end,
+                    setting.zoom_start,
+                    setting.zoom_end,
+                )[0]
 
                 normalize_integrationtime_factor = (
                     measurement_settings.specto.INTTIME
                     if setting.normalize_integrationtime
                     else 1
                 )
+                if inttimes_gradient is not None:
+                    # pro Spektrum (AUTO_EXPOSURE), nicht gemessene Zeilen mit INTTIME
+                    inttimes = inttimes_gradient[grad_index][
+                        setting.interval_start : setting.interval_end
+                    ]
+                    normalize_integrationtime_factor = np.where(
+                        inttimes != 0, inttimes, measurement_settings.specto.INTTIME
+                    )[:, np.newaxis]
                 normalize_factor = (
-                    np.max(spectrometer_data) if setting.normalize_data else 1
+                    # über den ganzen Gradienten
+                    np.max(loader.read(grad_index, grad_index + 1))
+                    if setting.normalize_data
+                    else 1
                 )
 
-                extracted_data /= normalize_factor
-                extracted_data /= normalize_integrationtime_factor
+                # die Messdaten bleiben im gespeicherten Datentyp (STORAGE_DTYPE), nur der Ausschnitt wird zu float
+                extracted_data = (
+                    extracted_data / normalize_factor / normalize_integrationtime_factor
+                )
 
                 if setting.single_wav:
                     # setting.zoom_start : setting.zoom_end ist nur ein Element in diesem Fall
@@ -927,7 +1015,6 @@ class SpectrumPlot:
                 #             / normalize_power
                 #         )
                 #     extracted_data[j] = np.array(intensities)
-                del spectrometer_data
 
                 if setting.single_wav:
                     y_data = extracted_data
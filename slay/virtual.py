@@ -2,8 +2,19 @@ from typing import Union, Dict, List, Optional
 from dataclasses import dataclass
 from enum import IntFlag
 import numpy as np
+import threading
 import time
 
+from slay.mcu_protocol import (
+    SOF,
+    BINARY_SESSION,
+    FrameType,
+    checksum,
+    encode_frame,
+    decode_variable,
+    decode_variables,
+)
+
 
 class LaserMode(IntFlag):
     OFF = 0
@@ -122,9 +133,12 @@ class LTB:
     def turn_laser_off(self) -> None:
         pass
 
-    def turn_laser_on(self) -> None:
+    def turn_laser_on(self, wait: bool = True) -> None:
         pass
 
+    def is_ready(self) -> bool:
+        return True
+
     def start_repetition_mode(self) -> None:
         pass
 
@@ -220,7 +234,8 @@ class Spectrometer:
         return None
 
     def getSpectrum_X(self, *args, **kwargs):
-        return np.sort(np.abs(np.random.rand(2048, 1) * 1000), axis=0)
+        # fest, wie die Kalibrierung eines echten Spektrometers (siehe WavelengthCache). Bereich wie bei meinem Spektrometer
+        return np.linspace(285.24, 1149.48, 2048).reshape(2048, 1)
 
     # sn.getDeviceId(spectrometer))
     def getDeviceId(self, *args, **kwargs):
@@ -262,3 +277,226 @@ class Spectrometer:
     # sn.reset(spectrometer)
     def reset(self, *args, **kwargs):
         pass
+
+
+class MCU:
+    """
+    Emuliert die laser-control-firmware hinter der seriellen Schnittstelle, um ohne ESP32 testen zu können.
+    Geschriebene Bytes werden wie von readSerial() interpretiert, Antworten der Firmware können mit read() gelesen werden.
+    """
+
+    # die Variablen, die die Firmware kennt (bei anderen antwortet sie im binären Protokoll mit NACK)
+    KNOWN_VARIABLES = (
+        "Dut405",
+        "Dut445",
+        "Frq405",
+        "Frq445",
+        "Res405",
+        "Res445",
+        "FrqLTB",
+        "SetLED",
+        "ConMea",
+        "ExpDel",
+        "OnTime",
+        "OffTim",
+        "SyncDl",
+        "NumRep",
+    )
+
+    def __init__(self, *args, **kwargs):
+        self.timeout = 5
+        # so viele der nächsten Frames "gehen verloren" (keine Antwort), um Wiederholungen testen zu können
+        self.drop_frames = 0
+        self._last_frame = None
+        # nach einem SESSION-Frame mit BINARY_SESSION: Bytes außerhalb von Frames (außer dem watchdog) verwerfen
+        self.binary_mode = False
+        self.variables = {}
+        self.lasers_are_on = False
+        # (time.monotonic(), "on"/"off") für jedes Schalten der Laser
+        self.events = []
+        self._rx = bytearray()
+        self._tx = bytearray()
+        self._tx_cond = threading.Condition()
+        self._schedule_thread = None
+        self._stop_schedule = threading.Event()
+
+    def set_low_latency_mode(self, enable):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._abort_schedule()
+
+    def reset_input_buffer(self):
+        with self._tx_cond:
+            self._tx.clear()
+
+    @property
+    def in_waiting(self):
+        with self._tx_cond:
+            return len(self._tx)
+
+    def read(self, size=1):
+        deadline = time.monotonic() + (self.timeout if self.timeout is not None else 1e9)
+        with self._tx_cond:
+            while len(self._tx) < size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._tx_cond.wait(remaining)
+            data = bytes(self._tx[:size])
+            del self._tx[:size]
+        return data
+
+    def write(self, data):
+        self._rx.extend(data)
+        self._process_rx()
+        return len(data)
+
+    def _send(self, data):
+        with self._tx_cond:
+            self._tx.extend(data)
+            self._tx_cond.notify_all()
+
+    def _process_rx(self):
+        while self._rx:
+            if self._rx[0] == SOF:
+                if len(self._rx) < 4 or len(self._rx) < self._rx[3] + 5:
+                    # auf den Rest des Frames warten
+                    return
+                frame_length = self._rx[3] + 5
+                frame = bytes(self._rx[:frame_length])
+                del self._rx[:frame_length]
+                self._handle_frame(frame)
+                continue
+
+            mode = chr(self._rx[0])
+            if self.binary_mode and mode != "3":
+                del self._rx[0]
+                continue
+            if mode in ("2", "5"):
+                end = self._rx.find(b"\n")
+                if end < 0:
+                    # auf den Rest der Zeile warten
+                    return
+                variables = dict(
+                    (name, int(value))
+                    for name, value in (
+                        pair.split("=") for pair in self._rx[1:end].decode().split(",")
+                    )
+                )
+                del self._rx[: end + 1]
+                # wie die Firmware: bei mehreren Variablen alle oder keine übernehmen
+                if mode == "2" or self._known(variables):
+                    self.variables.update(variables)
+                continue
+
+            del self._rx[0]
+            if mode == "0":
+                self._abort_schedule()
+                self._turn_lasers_off()
+            elif mode == "1":
+                self._turn_lasers_on()
+            elif mode == "4":
+                self._start_schedule()
+
+    def _handle_frame(self, frame):
+        body = frame[1:-1]
+        frame_type, frame_id, payload = body[0], body[1], body[3:]
+
+        if self.drop_frames > 0:
+            self.drop_frames -= 1
+            return
+        if checksum(body) != frame[-1]:
+            self._reply(FrameType.NACK, frame_id)
+            return
+        if frame_type == FrameType.SESSION and len(payload) == 1:
+            # neue Sitzung des Hosts, die IDs beginnen wieder bei 0
+            self._last_frame = None
+            self.binary_mode = payload[0] == BINARY_SESSION
+            self._reply(FrameType.ACK, frame_id)
+            return
+        # erneut gesendeter Frame, dessen ACK verloren ging: nur bestätigen, nicht erneut ausführen
+        if self._last_frame == (frame_type, frame_id):
+            self._reply(FrameType.ACK, frame_id)
+            return
+
+        if frame_type in (FrameType.SET_VAR, FrameType.SET_VARS):
+            try:
+                variables = (
+                    dict((decode_variable(payload),))
+                    if frame_type == FrameType.SET_VAR
+                    else decode_variables(payload)
+                )
+            except ValueError:
+                variables = {}
+            if not variables or not self._known(variables):
+                self._reply(FrameType.NACK, frame_id)
+                return
+            self.variables.update(variables)
+        elif frame_type == FrameType.LASER_OFF:
+            self._abort_schedule()
+            self._turn_lasers_off()
+        elif frame_type == FrameType.LASER_ON:
+            self._turn_lasers_on()
+        elif frame_type == FrameType.START_SCHEDULE:
+            self._start_schedule()
+        else:
+            self._reply(FrameType.NACK, frame_id)
+            return
+
+        self._last_frame = (frame_type, frame_id)
+        self._reply(FrameType.ACK, frame_id)
+
+    def _known(self, variables):
+        return all(name in self.KNOWN_VARIABLES for name in variables)
+
+    def _reply(self, frame_type, frame_id):
+        self._send(encode_frame(frame_type, frame_id))
+
+    def _turn_lasers_on(self):
+        self.lasers_are_on = True
+        self.events.append((time.monotonic(), "on"))
+
+    def _turn_lasers_off(self):
+        if self.lasers_are_on:
+            self.events.append((time.monotonic(), "off"))
+        self.lasers_are_on = False
+
+    def _start_schedule(self):
+        self._abort_schedule()
+        self._stop_schedule.clear()
+        self._schedule_thread = threading.Thread(target=self._run_schedule, daemon=True)
+        self._schedule_thread.start()
+
+    def _abort_schedule(self):
+        self._stop_schedule.set()
+        if (
+            self._schedule_thread is not None
+            and self._schedule_thread is not threading.current_thread()
+        ):
+            self._schedule_thread.join()
+
+    def _run_schedule(self):
+        on_time = self.variables.get("OnTime", 0) / 1000.0
+        off_time = self.variables.get("OffTim", 0) / 1000.0
+        sync_delay = min(self.variables.get("SyncDl", 0) / 1000.0, on_time)
+
+        # wie die Firmware auf feste Zeitpunkte (nicht relativ zum letzten Umschalten)
+        start = time.monotonic()
+        for n in range(self.variables.get("NumRep", 0)):
+            phase_start = start + n * (on_time + off_time)
+            self._turn_lasers_on()
+            if self._stop_schedule.wait(max(0, phase_start + sync_delay - time.monotonic())):
+                return
+            self._send(b"S")
+            if self._stop_schedule.wait(max(0, phase_start + on_time - time.monotonic())):
+                return
+            self._turn_lasers_off()
+            if self._stop_schedule.wait(
+                max(0, phase_start + on_time + off_time - time.monotonic())
+            ):
+                return
+        self._send(b"E")
@@ -0,0 +1,30 @@
+import os
+import numpy as np
+
+
+class WavelengthCache:
+    """Speichert die Kalibrierung (getSpectrum_X) pro Spektrometer (getDeviceId), sie ändert sich zwischen Messungen nicht."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def path(self, device_id) -> str:
+        return os.path.join(self.cache_dir, f"wavelengths-{device_id}.npz")
+
+    def load(self, device_id):
+        """Gibt die gespeicherten Wellenlängen (nm) pro Pixel zurück, oder None, falls es (noch) keine lesbaren gibt."""
+        try:
+            with np.load(self.path(device_id)) as data:
+                return data["wav"]
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, device_id, wav) -> np.ndarray:
+        wav = np.asarray(wav)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # erst vollständig schreiben, dann umbenennen: ein abgebrochener Lauf hinterlässt keine halbe Datei
+        tmp_path = self.path(device_id) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, wav=wav)
+        os.replace(tmp_path, self.path(device_id))
+        return wav
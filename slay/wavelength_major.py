@@ -0,0 +1,62 @@
+import os
+import numpy as np
+
+
+class WavelengthMajor:
+    """
+    Zweite Ablage der Messdaten mit der Wellenlänge als äußerer Achse: (Pixel, Gradienten, Wiederholungen).
+
+    Die Zeitreihe einer Wellenlänge (oder ein Band benachbarter Wellenlängen) liegt so zusammenhängend in der Datei
+    und wird per memmap gelesen, ohne die ganze Messung zu entpacken (siehe SpectrumPlot.measurement_from_disk(single_wav=...)).
+    """
+
+    # neben der .npz einer Messung
+    FILE_SUFFIX = "-wavelength-major.npy"
+    # im Ordner eines Backups (siehe BackupService)
+    STORE_FILE = "wavelength_major.npy"
+    # so viele Wiederholungen werden beim Umsortieren auf einmal gelesen (begrenzt den Speicherbedarf bei einem memmap)
+    BLOCK_ROWS = 256
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = np.load(path, mmap_mode="r")
+
+    @property
+    def num_pixels(self) -> int:
+        return self.data.shape[0]
+
+    @staticmethod
+    def write(path: str, measurements, block_rows=BLOCK_ROWS):
+        """Schreibt measurements (Gradienten, Wiederholungen, Pixel) umsortiert nach path."""
+        num_gradiants, repetitions, num_pixels = measurements.shape
+        tmp_path = path + ".tmp"
+        try:
+            sorted_data = np.lib.format.open_memmap(
+                tmp_path,
+                mode="w+",
+                dtype=measurements.dtype,
+                shape=(num_pixels, num_gradiants, repetitions),
+            )
+            # blockweise über die Wiederholungen: gelesen wird zusammenhängend, auch aus einem memmap
+            for g in range(num_gradiants):
+                for start in range(0, repetitions, block_rows):
+                    end = start + block_rows
+                    sorted_data[:, g, start:end] = np.asarray(measurements[g, start:end]).T
+            sorted_data.flush()
+            del sorted_data
+        except OSError:
+            # z. B. Platte voll: keine halb geschriebene Kopie liegen lassen
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        # erst vollständig geschrieben unter dem richtigen Namen
+        os.replace(tmp_path, path)
+        return WavelengthMajor(path)
+
+    def series(self, pixel: int):
+        """(Gradienten, Wiederholungen): die Counts einer Wellenlänge über die Zeit."""
+        return np.array(self.data[pixel])
+
+    def band(self, start: int, end: int):
+        """(Gradienten, Wiederholungen): Summe der Counts der Pixel start bis end (exklusiv) pro Spektrum."""
+        return np.sum(self.data[start:end], axis=0, dtype=float)
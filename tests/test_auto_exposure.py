@@ -0,0 +1,32 @@
+import unittest
+import numpy as np
+from slay.auto_exposure import AutoExposure
+
+
+class TestAutoExposure(unittest.TestCase):
+
+    def setUp(self):
+        self.auto_exposure = AutoExposure(2, 1000)
+
+    def test_saturated_halves(self):
+        spectrum = np.full(2048, 100.0)
+        spectrum[1000] = AutoExposure.FULL_SCALE
+        self.assertTrue(self.auto_exposure.is_saturated(spectrum))
+        self.assertEqual(self.auto_exposure.next_inttime(100, spectrum), 50)
+        # nicht unter die Grenze
+        self.assertEqual(self.auto_exposure.next_inttime(3, spectrum), 2)
+
+    def test_low_counts_scale_to_target(self):
+        spectrum = np.full(2048, 0.05 * AutoExposure.FULL_SCALE)
+        inttime = self.auto_exposure.next_inttime(10, spectrum)
+        self.assertEqual(inttime, round(10 * AutoExposure.TARGET / 0.05))
+        # nicht über die Grenze
+        self.assertEqual(self.auto_exposure.next_inttime(500, spectrum), 1000)
+
+    def test_in_range_keeps_inttime(self):
+        spectrum = np.full(2048, 0.5 * AutoExposure.FULL_SCALE)
+        self.assertEqual(self.auto_exposure.next_inttime(42, spectrum), 42)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from slay.chunk_codec import DeltaShuffleCodec, ZlibCodec
+
+
+class TestDeltaShuffleCodec(unittest.TestCase):
+
+    def assert_lossless(self, spectra):
+        decoded = DeltaShuffleCodec.decode(
+            DeltaShuffleCodec.encode(spectra), spectra.shape, spectra.dtype
+        )
+        self.assertEqual(decoded.dtype, spectra.dtype)
+        np.testing.assert_array_equal(decoded, spectra)
+        np.testing.assert_array_equal(np.signbit(decoded), np.signbit(spectra))
+
+    def test_lossless(self):
+        rng = np.random.default_rng(0)
+        counts = 1000 + rng.normal(0, 20, size=(16, 2048))
+        self.assert_lossless(np.rint(counts).astype(np.uint16))
+        self.assert_lossless(np.rint(counts).astype(np.uint32))
+        # ganzzahlige Gleitkommazahlen (wie SpectrumData mit STORAGE_DTYPE float64)
+        self.assert_lossless(np.rint(counts))
+        self.assert_lossless(np.rint(counts).astype(np.float32))
+        # nicht ganzzahlig, z. B. mit SMOOTH
+        self.assert_lossless(counts)
+        self.assert_lossless(np.array([[-0.0, 1.0], [np.nan, np.inf]]))
+        self.assert_lossless(np.zeros((0, 2048)))
+
+    def test_smaller_than_zlib_for_spectra(self):
+        rng = np.random.default_rng(0)
+        # ein glattes Spektrum mit Rauschen, über die Wiederholungen fast gleich
+        spectrum = 1000 + 500 * np.sin(np.linspace(0, 20, 2048))
+        spectra = np.rint(spectrum + rng.normal(0, 5, size=(64, 2048)))
+
+        self.assertLess(
+            len(DeltaShuffleCodec.encode(spectra)),
+            len(ZlibCodec.encode(spectra)) / 1.5,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import os
+import threading
+import unittest
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+import numpy as np
+from slay.chunk_store import ChunkStore
+from slay.chunk_codec import CODECS
+from slay.backup_service import BackupService
+from slay.spectrum_data import SpectrumData
+
+
+class TestChunkStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "messung" + ChunkStore.SUFFIX)
+        self.wav = np.linspace(300, 1100, 2048)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_append_and_read(self):
+        store = ChunkStore.create(self.path, (2, 5, 2048), self.wav, chunk_size=2)
+        rows = np.array([0, 1, 2, 5, 6])
+        spectra = np.arange(5)[:, None] * np.ones((5, 2048))
+        store.append(rows, spectra, np.arange(1, 6, dtype=float))
+
+        # fünf Zeilen mit maximal zwei pro Chunk
+        self.assertEqual(len(store.index()), 3)
+
+        measurements, wav, timestamps = ChunkStore(self.path).read()
+        self.assertEqual(measurements.shape, (2, 5, 2048))
+        np.testing.assert_array_equal(wav, self.wav)
+        self.assertEqual(measurements[1][0][0], 3)
+        self.assertEqual(timestamps[1][1], 5)
+        # nicht geschriebene Zeilen bleiben leer
+        self.assertEqual(timestamps[0][4], 0)
+
+        # ohne die Spektren zu entpacken
+        measurements, _, timestamps_only = ChunkStore(self.path).read(spectra=False)
+        self.assertIsNone(measurements)
+        np.testing.assert_array_equal(timestamps_only, timestamps)
+
+    def test_codecs_with_parallel_workers(self):
+        rng = np.random.default_rng(0)
+        spectra = rng.integers(0, 65535, size=(150, 2048)).astype(np.uint16)
+        for codec in CODECS:
+            with self.subTest(codec=codec):
+                store = ChunkStore.create(
+                    self.path, (3, 50, 2048), self.wav, np.uint16, chunk_size=16, codec=codec
+                )
+                store.append(
+                    np.arange(150), spectra, np.arange(1, 151, dtype=float), workers=4,
+                    inttimes=np.full(150, 10),
+                )
+
+                store = ChunkStore(self.path)
+                self.assertEqual(len(store.index()), 10)
+                measurements, _, timestamps = store.read()
+                np.testing.assert_array_equal(measurements.reshape(150, 2048), spectra)
+                np.testing.assert_array_equal(timestamps.ravel(), np.arange(1, 151))
+                np.testing.assert_array_equal(
+                    store.read_window(slice(1, 2), slice(3, 5), slice(10, 20))[0],
+                    spectra[53:55, 10:20],
+                )
+                self.assertEqual(store.read_column("inttimes")[2][49], 10)
+
+    def test_parallel_encoding_is_bounded(self):
+        store = ChunkStore.create(
+            self.path, (1, 64, 2048), self.wav, chunk_size=2, codec="zlib"
+        )
+        codec = store.codec
+        lock = threading.Lock()
+        counts = {"encoded": 0, "ahead": 0}
+
+        def encode(spectra):
+            with lock:
+                counts["encoded"] += 1
+            return codec.encode(spectra)
+
+        def write_chunk(*args):
+            with lock:
+                counts["ahead"] = max(counts["ahead"], counts["encoded"] - store.num_chunks)
+            write(*args)
+
+        write = store._write_chunk
+        store.codec = SimpleNamespace(encode=encode)
+        store._write_chunk = write_chunk
+        store.append(np.arange(64), np.ones((64, 2048)), np.ones(64), workers=2)
+
+        self.assertEqual(store.num_chunks, 32)
+        # nicht alle 32 Chunks auf einmal
+        self.assertLessEqual(counts["ahead"], 3)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            ChunkStore.create(self.path, (1, 1, 2048), self.wav, codec="lz4")
+
+    def test_truncated_index_line_is_ignored(self):
+        store = ChunkStore.create(self.path, (1, 2, 2048), self.wav)
+        store.append([0], np.ones((1, 2048)), [1.0])
+        with open(os.path.join(self.path, ChunkStore.INDEX_FILE), "a") as f:
+            f.write('{"file": "chunk_0000')
+
+        self.assertEqual(len(ChunkStore(self.path).index()), 1)
+
+    def test_backup_only_flushes_new_rows(self):
+        messdata = SpectrumData(2, 3, self.wav)
+        manager = SimpleNamespace(
+            measurement_file_name="messung",
+            measurement_save_dir=self.tmp_dir.name,
+            MEASUREMENT_SETTINGS=SimpleNamespace(measurement_time=10),
+        )
+        backup = BackupService(manager, messdata, self.tmp_dir.name)
+        backup.store = ChunkStore.create(
+            backup.store_path, messdata.measurements.shape, messdata.wav
+        )
+
+        messdata.measurements[0][0] = 1
+        messdata.timestamps[0][0] = 1
+        backup.flush()
+        # eine Zeile, für die nur das Spektrum (noch ohne Zeitstempel) geschrieben wurde
+        messdata.measurements[0][1] = 2
+        backup.flush()
+        messdata.timestamps[0][1] = 2
+        backup.flush()
+        backup.flush()
+
+        index = backup.store.index()
+        self.assertEqual([entry["count"] for entry in index], [1, 1])
+        measurements, _, _ = ChunkStore(backup.store_path).read()
+        self.assertEqual(measurements[0][1][0], 2)
+
+    def test_backup_flushes_when_stopped(self):
+        messdata = SpectrumData(1, 2, self.wav)
+        manager = SimpleNamespace(
+            measurement_file_name="messung",
+            measurement_save_dir=self.tmp_dir.name,
+            MEASUREMENT_SETTINGS=SimpleNamespace(
+                measurement_time=10, save_as_json=lambda f: f.write("{}")
+            ),
+        )
+        backup = BackupService(manager, messdata, self.tmp_dir.name)
+        thread = threading.Thread(target=backup.start)
+        thread.start()
+
+        messdata.measurements[0][0] = 1
+        messdata.timestamps[0][0] = 1
+        messdata.stop_event.set()
+        # ohne auf das Intervall (30 s) zu warten
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        _, _, timestamps = ChunkStore(backup.store_path).read(spectra=False)
+        self.assertEqual(timestamps[0][0], 1)
+
+    def test_extra_columns(self):
+        store = ChunkStore.create(self.path, (2, 2, 2048), self.wav, chunk_size=1)
+        self.assertIsNone(store.read_column("timestamps_ns"))
+        store.append(
+            [1, 2],
+            np.ones((2, 2048)),
+            [1.0, 2.0],
+            timestamps_ns=np.array([[1, 2, 3], [4, 5, 6]]),
+        )
+        store.save_array("time_anchor", [10, 20])
+
+        column = ChunkStore(self.path).read_column("timestamps_ns")
+        self.assertEqual(column.shape, (2, 2, 3))
+        self.assertEqual(column.dtype, np.int64)
+        self.assertEqual(column[1][0][2], 6)
+        self.assertEqual(column[0][0][0], 0)
+        np.testing.assert_array_equal(store.load_array("time_anchor"), [10, 20])
+
+
+if __name__ == "__main__":
+    unittest.main()
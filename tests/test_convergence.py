@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+from slay.convergence import ConvergenceCheck
+
+
+class TestConvergenceCheck(unittest.TestCase):
+
+    def test_stops_after_min_count_when_stable(self):
+        wav = np.linspace(200, 1000, 100)
+        check = ConvergenceCheck(wav, 650, 760, 0.01, min_count=5)
+        rng = np.random.default_rng(0)
+        stops = [check.update(1000 + rng.normal(size=100)) for _ in range(5)]
+        self.assertEqual(stops, [False] * 4 + [True])
+        self.assertLess(check.rse(), 0.01)
+
+    def test_noisy_signal_does_not_converge(self):
+        wav = np.linspace(200, 1000, 100)
+        check = ConvergenceCheck(wav, 650, 760, 0.001, min_count=2)
+        rng = np.random.default_rng(0)
+        self.assertFalse(
+            any(check.update(rng.normal(10, 10, size=100)) for _ in range(20))
+        )
+
+    def test_only_window_counts(self):
+        wav = np.arange(10)
+        check = ConvergenceCheck(wav, 2, 4, 0.01, min_count=2)
+        # außerhalb des Fensters stark schwankend, innerhalb konstant
+        for outside in (0, 1000):
+            spectrum = np.full(10, float(outside))
+            spectrum[2:5] = 1
+            check.update(spectrum)
+        self.assertEqual(check.rse(), 0)
+        self.assertTrue(check.converged())
+
+    def test_empty_window(self):
+        with self.assertRaises(ValueError):
+            ConvergenceCheck(np.arange(10), 20, 30, 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
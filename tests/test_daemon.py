@@ -0,0 +1,113 @@
+import os
+import stat
+import threading
+import time
+import unittest
+from tempfile import TemporaryDirectory
+import numpy as np
+from slay.daemon import DaemonClient, MeasurementDaemon
+from slay.settings import MeasurementSettings
+from slay.spectrum_data import SpectrumData
+
+
+def make_settings(repetitions=3):
+    return MeasurementSettings(
+        UNIQUE=True,
+        TYPE="test",
+        CUVETTE_WINDOWS=4,
+        TIMEOUT=1000,
+        WATCHDOG_GRACE=200,
+        specto=MeasurementSettings.SpectoSettings(
+            INTTIME=10, SCAN_AVG=1, SMOOTH=0, XTIMING=3
+        ),
+        laser=MeasurementSettings.LaserSettings(
+            REPETITIONS=repetitions,
+            MEASUREMENT_DELAY=3,
+            IRRADITION_TIME=3,
+            SERIAL_DELAY=3,
+            INTENSITY_NKT="1",
+            PWM_FREQ_405="2000",
+            PWM_RES_BITS_405="13",
+            PWM_DUTY_PERC_405="0.5",
+            PWM_FREQ_445="2000",
+            PWM_RES_BITS_445="13",
+            PWM_DUTY_PERC_445="np.linspace(0.2,1,2)",
+            ND_NKT=0,
+            ND_405=0,
+            ND_445=0,
+            CONTINOUS=False,
+        ),
+    )
+
+
+class FakeMeasurement:
+    """Misst statt mit Geräten mit konstanten Spektren."""
+
+    def __init__(self, settings):
+        self.MEASUREMENT_SETTINGS = settings
+        self.measurement_file_name = "messung-0"
+        self.messdata = SpectrumData(settings.laser.num_gradiants, settings.laser.REPETITIONS, np.arange(8))
+        self.runs = 0
+        self.stopped = False
+
+    def reset(self, settings):
+        self.runs += 1
+        self.MEASUREMENT_SETTINGS = settings
+        self.measurement_file_name = f"messung-{self.runs}"
+        self.messdata = SpectrumData(settings.laser.num_gradiants, settings.laser.REPETITIONS, np.arange(8))
+
+    def measure(self, gui=True, keep_devices=False):
+        for g in range(self.messdata.measurements.shape[0]):
+            for i in range(self.messdata.measurements.shape[1]):
+                self.messdata.ring.push(np.full(8, float(i)), (1, 2, 3), g, i)
+                time.sleep(0.01)
+
+    def idle_devices(self):
+        pass
+
+    def stop_all_devices(self):
+        self.stopped = True
+
+
+class TestDaemon(unittest.TestCase):
+
+    def test_run_status_stream_shutdown(self):
+        with TemporaryDirectory() as tmp_dir:
+            socket_path = os.path.join(tmp_dir, "slay.sock")
+            measurement = FakeMeasurement(make_settings())
+            daemon = MeasurementDaemon(measurement, socket_path, save=False)
+            server = threading.Thread(target=daemon.serve_forever, daemon=True)
+            server.start()
+            self.assertTrue(daemon.listening.wait(5))
+            # nur für den eigenen Benutzer
+            self.assertEqual(stat.S_IMODE(os.stat(socket_path).st_mode), 0o600)
+
+            client = DaemonClient(socket_path)
+            self.assertEqual(client.status()["running"], False)
+
+            stream = client.stream()
+            client.run(make_settings(repetitions=4))
+            spectra = [next(stream) for _ in range(8)]
+            self.assertEqual([s["index"] for s in spectra], [0, 1, 2, 3] * 2)
+            self.assertEqual(len(spectra[0]["spectrum"]), 8)
+
+            while client.status()["finished"] != ["messung-1"]:
+                time.sleep(0.01)
+            self.assertEqual(client.status()["shape"], [2, 4, 8])
+
+            with self.assertRaises(RuntimeError):
+                client.request({"command": "unknown"})
+
+            client.shutdown()
+            server.join(5)
+            self.assertFalse(server.is_alive())
+            self.assertTrue(measurement.stopped)
+            self.assertFalse(os.path.exists(socket_path))
+
+    def test_settings_roundtrip(self):
+        settings = make_settings()
+        self.assertEqual(MeasurementSettings.from_dict(settings.to_dict()), settings)
+
+
+if __name__ == "__main__":
+    unittest.main()
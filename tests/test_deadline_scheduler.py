@@ -0,0 +1,40 @@
+import time
+import unittest
+from slay.deadline_scheduler import DeadlineScheduler
+
+
+class TestDeadlineScheduler(unittest.TestCase):
+
+    def test_no_drift_with_varying_work(self):
+        scheduler = DeadlineScheduler(20)
+        scheduler.start()
+        work_ns = 0
+        for n in range(10):
+            scheduler.wait(n)
+            # unterschiedlich lange "Auslesezeiten"
+            work_start_ns = time.monotonic_ns()
+            time.sleep((n % 3) * 0.005)
+            work_ns += time.monotonic_ns() - work_start_ns
+        scheduler.wait(10)
+
+        elapsed_ms = (time.monotonic_ns() - scheduler.start_ns) / 1e6
+        self.assertGreaterEqual(elapsed_ms, 200)
+        self.assertEqual(len(scheduler.lateness_ns), 11)
+        self.assertTrue(all(lateness >= 0 for lateness in scheduler.lateness_ns))
+        # relativ geschlafen wäre die letzte Wiederholung mindestens um die gesamte Arbeit verspätet
+        # (unabhängig davon, wie ausgelastet die Maschine ist)
+        self.assertLess(scheduler.lateness_ns[-1], work_ns)
+        self.assertLessEqual(scheduler.waited_ns, elapsed_ms * 1e6 - work_ns)
+
+    def test_overrun_is_recorded(self):
+        scheduler = DeadlineScheduler(5)
+        scheduler.start()
+        time.sleep(0.02)
+        # die Deadline ist schon vorbei: nicht warten, nur die Verspätung festhalten
+        lateness = scheduler.wait(1)
+        self.assertGreater(lateness, 10_000_000)
+        self.assertGreater(scheduler.mark(2), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import time
+import unittest
+from slay.device_manager import DeviceManager
+
+
+class TestDeviceManager(unittest.TestCase):
+
+    def test_parallel_start_with_dependencies(self):
+        events = []
+
+        def start(name, duration):
+            def run():
+                time.sleep(duration)
+                events.append(name)
+
+            return run
+
+        manager = DeviceManager()
+        manager.add("spectrometer", start("spectrometer", 0.2))
+        manager.add("mcu", start("mcu", 0.1))
+        manager.add("ltb", start("ltb", 0.1), depends=("mcu",))
+
+        start_time = time.perf_counter()
+        manager.start_all()
+        elapsed = time.perf_counter() - start_time
+
+        # parallel: nicht die Summe (0.4 s), sondern der längste Pfad (0.2 s)
+        self.assertLess(elapsed, 0.35)
+        self.assertLess(events.index("mcu"), events.index("ltb"))
+        self.assertEqual(set(manager.init_times), {"spectrometer", "mcu", "ltb"})
+        self.assertGreaterEqual(manager.init_times["spectrometer"], 0.2)
+
+    def test_stop_continues_after_error(self):
+        stopped = []
+
+        def fail():
+            raise RuntimeError("kaputt")
+
+        manager = DeviceManager()
+        manager.add("mcu", None, lambda: stopped.append("mcu"))
+        manager.add("nkt", None, fail, stop_after=("mcu",))
+        manager.add("ltb", None, lambda: stopped.append("ltb"), stop_after=("mcu",))
+
+        with self.assertRaises(RuntimeError):
+            manager.stop_all()
+        self.assertEqual(sorted(stopped), ["ltb", "mcu"])
+
+    def test_unknown_dependency(self):
+        manager = DeviceManager()
+        with self.assertRaises(ValueError):
+            manager.add("ltb", None, depends=("mcu",))
+
+    def test_wait_until(self):
+        start_time = time.monotonic()
+        DeviceManager.wait_until(
+            lambda: time.monotonic() - start_time > 0.1, "test", 1, 0.01
+        )
+        with self.assertRaises(TimeoutError):
+            DeviceManager.wait_until(lambda: False, "test", 0.05, 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
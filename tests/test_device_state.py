@@ -0,0 +1,44 @@
+import unittest
+from slay.device_state import DeviceStateCache
+
+
+class TestDeviceStateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = DeviceStateCache()
+
+    def test_only_changed_values(self):
+        values = {"Res405": 13, "Frq405": 2000, "Dut405": 3030}
+        self.assertEqual(self.cache.diff("mcu", values), values)
+        self.cache.record("mcu", values)
+
+        self.assertEqual(self.cache.diff("mcu", values), {})
+        self.assertEqual(
+            self.cache.diff("mcu", {**values, "Dut405": 100}), {"Dut405": 100}
+        )
+        # andere Geräte sind unabhängig
+        self.assertEqual(self.cache.diff("nkt", {"Dut405": 3030}), {"Dut405": 3030})
+
+    def test_dependencies_keep_order(self):
+        self.cache.record("mcu", {"Res405": 13, "Frq405": 2000, "Dut405": 3030})
+        changed = self.cache.diff(
+            "mcu",
+            {"Res405": 12, "Frq405": 2000, "Dut405": 3030},
+            {"Dut405": ("Res405", "Frq405")},
+        )
+        self.assertEqual(list(changed), ["Res405", "Dut405"])
+
+    def test_invalidate_and_cached(self):
+        self.cache.record("mcu", {"SetLED": 151})
+        self.cache.invalidate("mcu")
+        self.assertEqual(self.cache.diff("mcu", {"SetLED": 151}), {"SetLED": 151})
+
+        reads = []
+        read = lambda: reads.append(1) or 21502
+        self.assertEqual(self.cache.cached("nkt", "max_frequency", read), 21502)
+        self.assertEqual(self.cache.cached("nkt", "max_frequency", read), 21502)
+        self.assertEqual(len(reads), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from slay.gradient_scheduler import GradientPlan, GradientScheduler
+
+
+class FakeMeasurement:
+
+    def __init__(self, num_gradiants):
+        self.MEASUREMENT_SETTINGS = SimpleNamespace(
+            laser=SimpleNamespace(num_gradiants=num_gradiants)
+        )
+        self.planned = []
+        self.pre_applied = []
+        self.applied = []
+        self.acquiring = threading.Event()
+
+    def plan_gradient(self, index):
+        self.planned.append((index, threading.current_thread()))
+        return GradientPlan(index, {"Dut405": index}, {}, {})
+
+    def pre_apply_gradient(self, plan, current_index):
+        # läuft, während current_index misst
+        self.acquiring.wait(1)
+        self.pre_applied.append((plan.index, current_index))
+
+    def apply_gradient(self, plan):
+        self.applied.append(plan.index)
+
+
+class TestGradientScheduler(unittest.TestCase):
+
+    def test_next_gradient_is_prepared_in_background(self):
+        measurement = FakeMeasurement(2)
+        scheduler = GradientScheduler(measurement)
+
+        scheduler.switch_to(0)
+        scheduler.prepare_async(1)
+        # der letzte Gradient hat keinen Nachfolger
+        scheduler.prepare_async(2)
+        measurement.acquiring.set()
+        scheduler.switch_to(1)
+        scheduler.finish()
+
+        self.assertEqual(measurement.applied, [0, 1])
+        self.assertEqual(measurement.pre_applied, [(1, 0)])
+        self.assertEqual([index for index, _ in measurement.planned], [0, 1])
+        self.assertIsNot(measurement.planned[1][1], threading.current_thread())
+        self.assertEqual(scheduler.switches, 2)
+
+    def test_without_preparation(self):
+        measurement = FakeMeasurement(2)
+        scheduler = GradientScheduler(measurement)
+        scheduler.switch_to(0)
+        scheduler.switch_to(1)
+        scheduler.finish()
+
+        self.assertEqual(measurement.applied, [0, 1])
+        self.assertEqual(measurement.pre_applied, [])
+        self.assertEqual(scheduler.prepared_time, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import io
+import unittest
+from slay.mcu_protocol import (
+    BinaryProtocol,
+    FrameType,
+    MCUProtocolError,
+    TextProtocol,
+    decode_variable,
+    encode_frame,
+    encode_variable,
+    read_frame,
+)
+from slay.virtual import MCU
+
+
+class FakeSerial(io.BytesIO):
+    timeout = 1
+
+
+class TestFrames(unittest.TestCase):
+
+    def test_roundtrip(self):
+        payload = encode_variable("ExpDel", 123456)
+        frame = read_frame(FakeSerial(encode_frame(FrameType.SET_VAR, 7, payload)))
+        self.assertEqual(frame.type, FrameType.SET_VAR)
+        self.assertEqual(frame.id, 7)
+        self.assertEqual(decode_variable(frame.payload), ("ExpDel", 123456))
+
+    def test_skips_bytes_before_frame(self):
+        frame = read_frame(FakeSerial(b"SSE" + encode_frame(FrameType.ACK, 3)))
+        self.assertEqual((frame.type, frame.id), (FrameType.ACK, 3))
+
+    def test_invalid_checksum(self):
+        data = bytearray(encode_frame(FrameType.ACK, 3))
+        data[-1] ^= 0xFF
+        self.assertIsNone(read_frame(FakeSerial(bytes(data))))
+
+
+class TestBinaryProtocol(unittest.TestCase):
+
+    def setUp(self):
+        self.mcu = MCU()
+        self.protocol = BinaryProtocol(self.mcu, ack_timeout=0.05)
+
+    def tearDown(self):
+        self.mcu.close()
+
+    def test_set_variable_and_lasers(self):
+        self.protocol.set_variable("Dut405", 3030)
+        self.assertEqual(self.mcu.variables["Dut405"], 3030)
+        self.protocol.laser_on()
+        self.assertTrue(self.mcu.lasers_are_on)
+        self.protocol.laser_off()
+        self.assertFalse(self.mcu.lasers_are_on)
+        self.assertEqual(self.protocol.resent_frames, 0)
+
+    def test_resends_dropped_frame(self):
+        self.mcu.drop_frames = 1
+        self.protocol.set_variable("Frq405", 2000)
+        self.assertEqual(self.mcu.variables["Frq405"], 2000)
+        self.assertEqual(self.protocol.resent_frames, 1)
+
+    def test_unknown_variable_is_rejected(self):
+        with self.assertRaises(MCUProtocolError):
+            self.protocol.set_variable("Foobar", 1)
+        self.assertEqual(self.protocol.nacks, self.protocol.retries)
+
+    def test_set_variables_in_one_frame(self):
+        variables = {"Res405": 13, "Frq405": 2000, "Dut405": 3030, "ExpDel": 222}
+        self.protocol.set_variables(variables)
+        self.assertEqual(self.mcu.variables, variables)
+        self.assertEqual(self.protocol.next_id, 1)
+
+    def test_set_variables_is_atomic(self):
+        with self.assertRaises(MCUProtocolError):
+            self.protocol.set_variables({"Dut405": 1, "Foobar": 2})
+        self.assertEqual(self.mcu.variables, {})
+
+    def test_session_resets_duplicate_detection(self):
+        self.protocol.start_session()
+        self.protocol.laser_on()
+        # z. B. durch den watchdog der Firmware (ohne Frame)
+        self.mcu._turn_lasers_off()
+        # neue Sitzung ohne Neustart der Firmware: die IDs wiederholen sich, LASER_ON hat wieder die ID 1
+        protocol = BinaryProtocol(self.mcu, ack_timeout=0.05)
+        protocol.start_session()
+        protocol.laser_on()
+        self.assertTrue(self.mcu.lasers_are_on)
+
+    def test_binary_session_ignores_stray_bytes(self):
+        self.protocol.start_session()
+        # z. B. der Rest eines abgewiesenen Frames
+        self.mcu.write(b"12Dut405=1\n")
+        self.assertFalse(self.mcu.lasers_are_on)
+        self.assertEqual(self.mcu.variables, {})
+
+        TextProtocol(self.mcu, 0).start_session()
+        self.mcu.write(b"1")
+        self.assertTrue(self.mcu.lasers_are_on)
+        self.assertEqual(self.mcu.in_waiting, 0)
+
+    def test_text_protocol_still_works(self):
+        self.mcu.write(b"2Dut445=16\n")
+        self.protocol.set_variable("Res445", 13)
+        self.assertEqual(self.mcu.variables, {"Dut445": 16, "Res445": 13})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import os
+import unittest
+from unittest import mock
+from tempfile import TemporaryDirectory
+import numpy as np
+from slay.chunk_store import ChunkStore
+from slay.measurement_loader import MeasurementLoader
+from slay.wavelength_major import WavelengthMajor
+
+
+class TestMeasurementLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.measurements = rng.integers(0, 1000, size=(3, 6, 2048)).astype(np.uint16)
+        self.wav = np.linspace(300, 1100, 2048)
+        self.timestamps = np.arange(1, 19, dtype=float).reshape(3, 6)
+
+        # Referenz: alles laden, dann die Outlier korrigieren (wie SpectrumPlot.replace_outliers_with_neighbors)
+        self.expected = self.measurements.copy()
+        for pixel in MeasurementLoader.OUTLIER_INDICES:
+            left = pixel - 1
+            while left in MeasurementLoader.OUTLIER_INDICES:
+                left -= 1
+            right = pixel + 1
+            while right in MeasurementLoader.OUTLIER_INDICES:
+                right += 1
+            # gerundet, nicht abgeschnitten (ganzzahliger Datentyp)
+            self.expected[..., pixel] = np.rint(
+                np.mean(
+                    (self.measurements[..., left], self.measurements[..., right]),
+                    axis=0,
+                )
+            )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def save_npz(self):
+        path = os.path.join(self.tmp_dir.name, "messung.npz")
+        np.savez_compressed(path, self.measurements, self.wav, self.timestamps)
+        return path
+
+    def save_store(self):
+        path = os.path.join(self.tmp_dir.name, "messung" + ChunkStore.SUFFIX)
+        store = ChunkStore.create(
+            path, self.measurements.shape, self.wav, self.measurements.dtype, chunk_size=4
+        )
+        store.append(
+            np.arange(18), self.measurements.reshape(18, -1), self.timestamps.ravel()
+        )
+        return path
+
+    def check_windows(self, loader):
+        self.assertEqual(
+            (loader.num_gradiants, loader.repetitions, loader.num_pixels), (3, 5, 2048)
+        )
+        np.testing.assert_array_equal(loader.timestamps, self.timestamps[:, 1:])
+        expected = self.expected[:, 1:]
+        np.testing.assert_array_equal(loader.read(), expected)
+        # Ausschnitte mit Outliern am Rand und mitten drin
+        for pixel_start, pixel_end in ((490, 500), (581, 582), (1600, 1616), (0, 3)):
+            window = loader.read(1, 3, 2, 4, pixel_start, pixel_end)
+            self.assertEqual(window.dtype, np.uint16)
+            np.testing.assert_array_equal(
+                window, expected[1:3, 2:4, pixel_start:pixel_end]
+            )
+
+    def test_npz(self):
+        loader = MeasurementLoader(self.save_npz(), remove_first=True)
+        self.assertIsNone(loader.spectra)
+        self.check_windows(loader)
+
+    def test_wall_times_from_monotonic_timestamps(self):
+        path = os.path.join(self.tmp_dir.name, "messung.npz")
+        timestamps_ns = np.zeros((3, 6, 3), dtype=np.int64)
+        timestamps_ns[0, :, 2] = np.arange(1, 7) * 10**9
+        np.savez_compressed(
+            path,
+            self.measurements,
+            self.wav,
+            self.timestamps,
+            timestamps_ns=timestamps_ns,
+            time_anchor=np.array((100 * 10**9, 0)),
+        )
+        loader = MeasurementLoader(path)
+        np.testing.assert_array_equal(loader.timestamps[0], np.arange(101, 107))
+        # ohne monotonen Zeitstempel (z. B. aus einem älteren Backup übernommen) bleibt arr_2
+        np.testing.assert_array_equal(loader.timestamps[1:], self.timestamps[1:])
+
+    def test_memmap(self):
+        path = self.save_npz()
+        np.savez_compressed(path, arr_1=self.wav, arr_2=self.timestamps)
+        np.save(
+            os.path.splitext(path)[0] + MeasurementLoader.MEMMAP_SUFFIX,
+            self.measurements,
+        )
+        self.check_windows(MeasurementLoader(path, remove_first=True))
+
+    def test_chunks_next_to_npz(self):
+        path = self.save_npz()
+        np.savez_compressed(path, arr_1=self.wav, arr_2=self.timestamps)
+        store = ChunkStore.create(
+            os.path.splitext(path)[0] + MeasurementLoader.CHUNKS_SUFFIX,
+            self.measurements.shape,
+            self.wav,
+            self.measurements.dtype,
+            chunk_size=4,
+            codec="zlib",
+        )
+        store.append(
+            np.arange(18), self.measurements.reshape(18, -1), self.timestamps.ravel(), workers=2
+        )
+        self.check_windows(MeasurementLoader(path, remove_first=True))
+
+    def test_store_reads_only_needed_chunks(self):
+        path = self.save_store()
+        loader = MeasurementLoader(path, remove_first=True)
+        self.check_windows(loader)
+
+        # Gradient 0, Wiederholungen 1 bis 2 liegen im ersten Chunk (Zeilen 0 bis 3)
+        os.remove(os.path.join(path, "chunk_000003.npz"))
+        np.testing.assert_array_equal(
+            loader.read(0, 1, 0, 2), self.expected[0:1, 1:3]
+        )
+
+    def test_measured_repetitions(self):
+        # Gradient 1 ist nach drei Wiederholungen konvergiert, Gradient 2 wurde nicht gemessen (TIMEOUT)
+        self.timestamps[1, 3:] = 0
+        self.timestamps[2] = 0
+        loader = MeasurementLoader(self.save_npz(), remove_first=True)
+        self.assertEqual(
+            [loader.measured_repetitions(g) for g in range(3)], [5, 2, 0]
+        )
+
+    def test_wavelength_major(self):
+        path = self.save_npz()
+        WavelengthMajor.write(
+            os.path.splitext(path)[0] + WavelengthMajor.FILE_SUFFIX, self.measurements
+        )
+        loader = MeasurementLoader(path, remove_first=True)
+        self.assertIsNotNone(loader.wavelength_major)
+        # schmale Ausschnitte ohne die .npz zu entpacken
+        np.testing.assert_array_equal(
+            loader.read(pixel_start=575, pixel_end=590), self.expected[:, 1:, 575:590]
+        )
+        self.assertIsNone(loader.spectra)
+        self.check_windows(loader)
+
+    def test_builds_wavelength_major(self):
+        path = self.save_store()
+        loader = MeasurementLoader(path)
+        self.assertIsNone(loader.wavelength_major)
+        loader.open_wavelength_major(build=True)
+        self.assertTrue(
+            os.path.isfile(os.path.join(path, WavelengthMajor.STORE_FILE))
+        )
+        pixel = loader.pixel(730)
+        np.testing.assert_array_equal(
+            loader.read(pixel_start=pixel, pixel_end=pixel + 1)[..., 0],
+            self.expected[..., pixel],
+        )
+
+    def test_falls_back_when_wavelength_major_cannot_be_written(self):
+        path = self.save_store()
+        loader = MeasurementLoader(path)
+        with mock.patch("numpy.lib.format.open_memmap", side_effect=PermissionError):
+            self.assertIsNone(loader.open_wavelength_major(build=True))
+        self.assertEqual(
+            [f for f in os.listdir(path) if f.startswith("wavelength_major")], []
+        )
+        pixel = loader.pixel(730)
+        np.testing.assert_array_equal(
+            loader.read(pixel_start=pixel, pixel_end=pixel + 1)[..., 0],
+            self.expected[..., pixel],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
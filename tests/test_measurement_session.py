@@ -0,0 +1,64 @@
+import unittest
+from slay.measurement_session import MeasurementSession
+
+
+class FakeMeasurement:
+
+    def __init__(self, settings):
+        self.MEASUREMENT_SETTINGS = settings
+        self.measurement_file_name = settings
+        self.calls = []
+
+    def reset(self, settings):
+        self.calls.append(("reset", settings))
+        self.MEASUREMENT_SETTINGS = settings
+        self.measurement_file_name = settings
+
+    def measure(self, gui=True, keep_devices=False):
+        self.calls.append(("measure", keep_devices))
+
+    def save(self):
+        self.calls.append(("save",))
+
+    def stop_all_devices(self):
+        self.calls.append(("stop",))
+
+
+class TestMeasurementSession(unittest.TestCase):
+
+    def test_runs_queue_without_reconnecting(self):
+        measurement = FakeMeasurement("a")
+        session = MeasurementSession(measurement)
+        for settings in ("a", "b", "b"):
+            session.submit(settings)
+        session.run()
+
+        # die erste Messung nutzt die bereits vorbereitete Measurement, jede weitere wird nur zurückgesetzt
+        self.assertEqual(
+            measurement.calls,
+            [
+                ("measure", True),
+                ("save",),
+                ("reset", "b"),
+                ("measure", True),
+                ("save",),
+                ("reset", "b"),
+                ("measure", True),
+                ("save",),
+            ],
+        )
+        self.assertEqual(session.finished, ["a", "b", "b"])
+
+        session.close()
+        self.assertEqual(measurement.calls[-1], ("stop",))
+
+    def test_first_settings_differ(self):
+        measurement = FakeMeasurement("a")
+        session = MeasurementSession(measurement, save=False)
+        session.submit("c")
+        session.run()
+        self.assertEqual(measurement.calls, [("reset", "c"), ("measure", True)])
+
+
+if __name__ == "__main__":
+    unittest.main()
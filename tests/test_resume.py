@@ -0,0 +1,150 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+import numpy as np
+from slay.backup_service import BackupService
+from slay.chunk_store import ChunkStore
+from slay.measurement import Measurement
+from slay.measurement_loader import MeasurementLoader
+from slay.spectrum_data import SpectrumData
+
+
+class TestResume(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.wav = np.linspace(300, 1100, 2048)
+
+        # abgebrochener Lauf: Gradient 0 ganz, von Gradient 1 die erste Wiederholung
+        self.old = SpectrumData(2, 3, self.wav)
+        self.old.time_anchor[:] = (1_000 * 10**9, 500)
+        for row, (g, i) in enumerate(((0, 0), (0, 1), (0, 2), (1, 0))):
+            self.old.measurements[g][i] = row + 1
+            self.old.timestamps_ns[g][i] = (row + 1) * 10**9 + np.arange(3)
+            self.old.inttimes[g][i] = 10
+            self.old.timestamps[g][i] = SpectrumData.wall_times(
+                self.old.timestamps_ns[g][i][SpectrumData.READ_END], self.old.time_anchor
+            )
+        backup = BackupService(self.manager("alt"), self.old, self.tmp_dir.name)
+        backup.store = ChunkStore.create(
+            backup.store_path, self.old.measurements.shape, self.wav
+        )
+        backup.store.save_array("time_anchor", self.old.time_anchor)
+        backup.flush()
+        self.store_path = backup.store_path
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def manager(self, name):
+        return SimpleNamespace(
+            measurement_file_name=name,
+            measurement_save_dir=self.tmp_dir.name,
+            MEASUREMENT_SETTINGS=SimpleNamespace(measurement_time=10),
+        )
+
+    def new_measurement(self, memmap=False):
+        """Wie nach prepare_run (ohne Geräte), mit einer anderen monotonen Uhr als der abgebrochene Lauf."""
+        measurement = Measurement.__new__(Measurement)
+        measurement.measurement_save_dir = self.tmp_dir.name
+        measurement.measurement_file_name = "neu"
+        measurement.messdata = SpectrumData(
+            2,
+            3,
+            self.wav,
+            (
+                os.path.join(self.tmp_dir.name, "neu" + MeasurementLoader.MEMMAP_SUFFIX)
+                if memmap
+                else ""
+            ),
+        )
+        measurement.messdata.time_anchor[:] = (2_000 * 10**9, 100)
+        measurement.MEASUREMENT_SETTINGS = self.manager("neu").MEASUREMENT_SETTINGS
+        measurement.backup_service = BackupService(
+            measurement, measurement.messdata, self.tmp_dir.name
+        )
+        measurement.cam = SimpleNamespace(output_path="")
+        return measurement
+
+    def test_restores_rows(self):
+        measurement = self.new_measurement()
+        self.assertEqual(measurement.load_progress(self.store_path), (1, 1))
+
+        messdata = measurement.messdata
+        np.testing.assert_array_equal(messdata.measurements, self.old.measurements)
+        np.testing.assert_array_equal(messdata.timestamps, self.old.timestamps)
+        np.testing.assert_array_equal(messdata.inttimes, self.old.inttimes)
+        self.assertEqual(
+            (messdata.curr_gradiant, messdata.curr_measurement_index), (1, 0)
+        )
+        self.assertEqual(measurement.measurement_file_name, "alt")
+
+        # in der Zeitbasis des neuen Laufs, aber mit den gleichen Wanduhrzeiten
+        np.testing.assert_array_equal(
+            SpectrumData.wall_times(
+                messdata.timestamps_ns[..., SpectrumData.READ_END], messdata.time_anchor
+            ),
+            self.old.timestamps,
+        )
+        self.assertEqual(messdata.timestamps_ns[1][1][0], 0)
+
+    def measure(self, messdata, g, i, wall_time):
+        """Eine Wiederholung in der Zeitbasis von messdata, zur Wanduhrzeit wall_time (s)."""
+        read_end = int(wall_time * 10**9) - messdata.time_anchor[0] + messdata.time_anchor[1]
+        messdata.measurements[g][i] = 9
+        messdata.timestamps_ns[g][i] = read_end - 2 + np.arange(3)
+        messdata.timestamps[g][i] = wall_time
+
+    def test_backup_keeps_its_time_base(self):
+        measurement = self.new_measurement()
+        measurement.load_progress(self.store_path)
+        self.measure(measurement.messdata, 1, 1, 3_000)
+        measurement.backup_service.flush()
+
+        # ein zweiter Abbruch und eine weitere Fortsetzung mit wieder anderer Zeitbasis
+        loader = MeasurementLoader(self.store_path)
+        expected = self.old.timestamps.copy()
+        expected[1][1] = 3_000
+        np.testing.assert_array_equal(loader.timestamps, expected)
+
+        second = self.new_measurement()
+        second.messdata.time_anchor[:] = (4_000 * 10**9, 7)
+        self.assertEqual(second.load_progress(self.store_path), (1, 2))
+        np.testing.assert_array_equal(
+            SpectrumData.wall_times(
+                second.messdata.timestamps_ns[..., SpectrumData.READ_END],
+                second.messdata.time_anchor,
+            ),
+            expected,
+        )
+
+    def test_empty_backup(self):
+        ChunkStore.create(self.store_path, self.old.measurements.shape, self.wav)
+        measurement = self.new_measurement()
+        self.assertEqual(measurement.load_progress(self.store_path), (0, 0))
+        self.assertEqual(measurement.measurement_file_name, "neu")
+
+    def test_memmap_is_renamed(self):
+        measurement = self.new_measurement(memmap=True)
+        measurement.load_progress(self.store_path)
+
+        memmap_path = os.path.join(
+            self.tmp_dir.name, "alt" + MeasurementLoader.MEMMAP_SUFFIX
+        )
+        self.assertEqual(measurement.messdata.memmap_path, memmap_path)
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(self.tmp_dir.name, "neu" + MeasurementLoader.MEMMAP_SUFFIX)
+            )
+        )
+        # weiter gemessene Spektren landen in der umbenannten Datei
+        measurement.messdata.measurements[1][1] = 7
+        measurement.messdata.flush()
+        spectra = np.load(memmap_path, mmap_mode="r")
+        self.assertEqual(spectra[1][1][0], 7)
+        self.assertEqual(spectra[0][2][0], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
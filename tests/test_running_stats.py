@@ -0,0 +1,60 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+import numpy as np
+from slay.running_stats import RunningStats
+from slay.spectrum_buffer import SpectrumEntry
+from slay.spectrum_data import SpectrumData
+
+
+class TestRunningStats(unittest.TestCase):
+
+    def test_matches_numpy(self):
+        rng = np.random.default_rng(0)
+        # großer Offset, bei dem die naive Summe der Quadrate ungenau wird
+        spectra = 1e6 + rng.normal(size=(2, 50, 16))
+        stats = RunningStats(2, 16)
+        for g in range(2):
+            for spectrum in spectra[g]:
+                stats.update(g, spectrum)
+
+        np.testing.assert_array_equal(stats.count, (50, 50))
+        np.testing.assert_allclose(stats.mean, spectra.mean(axis=1))
+        np.testing.assert_allclose(stats.variance(), spectra.var(axis=1), rtol=1e-6)
+        np.testing.assert_allclose(
+            stats.std(ddof=1), spectra.std(axis=1, ddof=1), rtol=1e-6
+        )
+        np.testing.assert_array_equal(stats.min, spectra.min(axis=1))
+        np.testing.assert_array_equal(stats.max, spectra.max(axis=1))
+
+    def test_save_and_load(self):
+        stats = RunningStats(3, 4)
+        stats.update(1, np.arange(4))
+        stats.update(1, np.arange(4) * 3)
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "messung" + RunningStats.FILE_SUFFIX)
+            stats.save(path)
+            loaded = RunningStats.load(path)
+
+        np.testing.assert_array_equal(loaded.count, (0, 2, 0))
+        np.testing.assert_array_equal(loaded.mean, stats.mean)
+        np.testing.assert_array_equal(loaded.m2, stats.m2)
+        # ohne Spektren gibt es keine Varianz
+        self.assertTrue(np.isnan(loaded.variance()[0]).all())
+
+    def test_spectrum_data_skips_first_repetition(self):
+        data = SpectrumData(1, 3, np.arange(4))
+        for i in range(3):
+            data.store(
+                SpectrumEntry(i, np.full(4, float(i) * 10), (i + 1, i + 1, i + 1), 0, i)
+            )
+
+        self.assertEqual(data.stats.count[0], 3 - SpectrumData.STATS_SKIP_REPETITIONS)
+        np.testing.assert_allclose(
+            data.stats.mean[0],
+            data.measurements[0, SpectrumData.STATS_SKIP_REPETITIONS :].mean(axis=0),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from slay.spectrometer_session import SpectrometerSession
+
+
+class RecordingSpectrometer:
+    def __init__(self):
+        self.calls = []
+
+    def setParam(self, *args):
+        self.calls.append(args[1:])
+
+
+class TestSpectrometerSession(unittest.TestCase):
+
+    def test_skips_unchanged_and_discards_only_on_inttime_change(self):
+        sn = RecordingSpectrometer()
+        session = SpectrometerSession(sn, "spectrometer")
+
+        self.assertTrue(session.set_params(10, 1, 0, 3))
+        self.assertFalse(session.set_params(10, 1, 0, 3))
+        # ohne neue Integrationszeit wird kein Spektrum verworfen
+        self.assertTrue(session.set_params(10, 2, 0, 3))
+        self.assertTrue(session.set_params(20, 2, 0, 3))
+
+        self.assertEqual(
+            sn.calls, [(10, 1, 0, 3, True), (10, 2, 0, 3, False), (20, 2, 0, 3, True)]
+        )
+        self.assertEqual(session.skipped_updates, 1)
+        self.assertEqual(session.discarded_frames, 2)
+        self.assertEqual(session.inttime, 20)
+
+    def test_invalidate_resends(self):
+        sn = RecordingSpectrometer()
+        session = SpectrometerSession(sn, "spectrometer")
+        session.set_params(10, 1, 0, 3)
+        session.invalidate()
+        self.assertTrue(session.set_params(10, 1, 0, 3))
+        self.assertEqual(len(sn.calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
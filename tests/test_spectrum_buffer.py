@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+from slay.spectrum_buffer import SpectrumRingBuffer, SpectrometerReader
+
+
+class TestSpectrumRingBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = SpectrumRingBuffer(4, 8)
+
+    def push(self, n):
+        for i in range(n):
+            self.ring.push(np.full(8, i), (i, i, i + 1), 0, i)
+
+    def test_latest(self):
+        self.assertIsNone(self.ring.latest())
+        self.push(6)
+        entry = self.ring.latest()
+        self.assertEqual(entry.seq, 5)
+        self.assertEqual(entry.index, 5)
+        self.assertEqual(entry.spectrum[0], 5)
+        # eine Kopie, kein View auf den Puffer
+        self.push(4)
+        self.assertEqual(entry.spectrum[0], 5)
+
+    def test_overwritten_entries_are_skipped(self):
+        self.push(3)
+        entries, next_seq = self.ring.read_since(0)
+        self.assertEqual([e.seq for e in entries], [0, 1, 2])
+        self.push(5)
+        # der Leser ist mehr als capacity zurück: 3 und 4 sind verloren
+        entries, next_seq = self.ring.read_since(next_seq)
+        self.assertEqual([e.seq for e in entries], [4, 5, 6, 7])
+        self.assertEqual(next_seq, 8)
+        self.assertIsNone(self.ring.get(2))
+
+
+class TestSpectrometerReader(unittest.TestCase):
+
+    def test_capture(self):
+        ring = SpectrumRingBuffer(4, 8)
+        reader = SpectrometerReader(lambda: np.arange(8), ring)
+        entry = reader.capture(1, 2, trigger_ns=5)
+        self.assertEqual((entry.gradiant, entry.index, entry.seq), (1, 2, 0))
+        np.testing.assert_array_equal(entry.spectrum, np.arange(8))
+        trigger_ns, read_start_ns, read_end_ns = entry.times_ns
+        self.assertEqual(trigger_ns, 5)
+        self.assertLessEqual(read_start_ns, read_end_ns)
+        # ohne Trigger gilt der Beginn des Auslesens
+        self.assertEqual(reader.capture(1, 3).times_ns[0], reader.ring.latest().times_ns[1])
+        reader.stop()
+
+    def test_errors_are_raised_in_capture(self):
+        def read():
+            raise RuntimeError("spectrometer disconnected")
+
+        reader = SpectrometerReader(read, SpectrumRingBuffer(4, 8))
+        with self.assertRaises(RuntimeError):
+            reader.capture(0, 0)
+        reader.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
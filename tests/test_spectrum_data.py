@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import unittest
+from tempfile import TemporaryDirectory
+import numpy as np
+from slay.spectrum_data import SpectrumData
+
+
+class TestSpectrumData(unittest.TestCase):
+
+    def test_in_memory(self):
+        data = SpectrumData(2, 3, np.arange(2048))
+        self.assertEqual(data.measurements.shape, (2, 3, 2048))
+        self.assertFalse(data.is_memmap())
+
+    def test_memmap_is_readable_without_loading(self):
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "messung-measurements.npy")
+            data = SpectrumData(2, 3, np.arange(2048), path)
+            self.assertTrue(data.is_memmap())
+
+            data.measurements[1][2] = np.full(2048, 42.0)
+            data.flush()
+
+            loaded = np.load(path, mmap_mode="r")
+            self.assertIsInstance(loaded, np.memmap)
+            self.assertEqual(loaded.shape, (2, 3, 2048))
+            self.assertEqual(loaded[1, 2, 100], 42.0)
+            self.assertEqual(loaded[0, 0, 100], 0.0)
+            del loaded
+
+    def test_shared_memory_is_written_by_child_process(self):
+        data = SpectrumData(2, 3, np.arange(2048), shared=True)
+        self.assertTrue(data.is_shared())
+
+        def acquire():
+            data.curr_gradiant = 1
+            data.ring.push(np.full(2048, 7.0), (1, 2, 3), 1, 2)
+            data.store(data.ring.latest())
+            data.stop_event.set()
+
+        process = multiprocessing.get_context("fork").Process(target=acquire)
+        process.start()
+        process.join()
+
+        self.assertEqual(process.exitcode, 0)
+        self.assertTrue(data.stop_event.is_set())
+        self.assertEqual(data.curr_gradiant, 1)
+        self.assertEqual(data.measurements[1][2][0], 7.0)
+        self.assertEqual(data.timestamps_ns[1][2][2], 3)
+        self.assertEqual(data.ring.latest().seq, 0)
+        data.release_shared_memory()
+        # bleibt nach dem Freigeben lesbar
+        self.assertEqual(data.measurements[1][2][5], 7.0)
+
+    def test_wall_times_from_anchor(self):
+        data = SpectrumData(1, 2, np.arange(2048))
+        wall_ns, monotonic_ns = data.time_anchor
+        data.ring.push(np.ones(2048), (0, 0, monotonic_ns + 1_500_000_000), 0, 1)
+        data.store(data.ring.latest())
+
+        self.assertAlmostEqual(data.timestamps[0][1], wall_ns / 1e9 + 1.5, places=5)
+        # nicht gemessen
+        self.assertEqual(data.timestamps[0][0], 0)
+        self.assertEqual(SpectrumData.wall_times([0], data.time_anchor)[0], 0)
+
+    def test_compact_dtype_clips_and_flags_overflow(self):
+        data = SpectrumData(1, 2, np.arange(4), dtype="uint16")
+        self.assertEqual(data.measurements.dtype, np.uint16)
+
+        data.ring.push(np.array([0.4, 1.6, 65535.0, 3.0]), (1, 2, 3), 0, 0)
+        data.store(data.ring.latest())
+        data.ring.push(np.array([-5.0, 70000.0, np.nan, 3.0]), (1, 2, 3), 0, 1)
+        data.store(data.ring.latest())
+
+        np.testing.assert_array_equal(data.measurements[0][0], (0, 2, 65535, 3))
+        np.testing.assert_array_equal(data.measurements[0][1], (0, 65535, 0, 3))
+        np.testing.assert_array_equal(data.overflow[0], (False, True))
+
+    def test_float32_keeps_fractions(self):
+        data = SpectrumData(1, 1, np.arange(2), dtype="float32")
+        spectrum, overflow = data.to_storage(np.array([0.25, 1e39]))
+        self.assertEqual(spectrum.dtype, np.float32)
+        self.assertEqual(spectrum[0], 0.25)
+        self.assertTrue(overflow)
+
+    def test_memmap_with_compact_dtype(self):
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "messung-measurements.npy")
+            data = SpectrumData(2, 3, np.arange(2048), path, dtype="uint16")
+            data.measurements[1][2] = 42
+            data.flush()
+
+            loaded = np.load(path, mmap_mode="r")
+            self.assertEqual(loaded.dtype, np.uint16)
+            self.assertEqual(loaded[1, 2, 100], 42)
+            del loaded
+
+    def test_stats_are_scaled_to_inttime(self):
+        data = SpectrumData(1, 4, np.arange(2), inttime=10)
+        # AUTO_EXPOSURE hat die Integrationszeit mitten im Gradienten halbiert
+        for index, (spectrum, inttime) in enumerate(
+            (((0, 0), 10), ((100, 50), 10), ((50, 25), 5), ((100, 50), 10))
+        ):
+            data.measurements[0][index] = spectrum
+            data.inttimes[0][index] = inttime
+            data.update_stats(0, index)
+
+        np.testing.assert_array_equal(data.stats.mean[0], (100, 50))
+        np.testing.assert_array_equal(data.stats.variance()[0], (0, 0))
+        # die Rohdaten bleiben unverändert
+        self.assertEqual(data.measurements[0][2][0], 50)
+
+    def test_unsupported_dtype(self):
+        with self.assertRaises(ValueError):
+            SpectrumData(1, 1, np.arange(2), dtype="int8")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import time
+import unittest
+from slay.virtual import MCU
+
+
+class TestVirtualMCU(unittest.TestCase):
+
+    def setUp(self):
+        self.mcu = MCU()
+        self.mcu.timeout = 1
+
+    def tearDown(self):
+        self.mcu.close()
+
+    def upload_schedule(self, repetitions, on_time=20, off_time=10, sync_delay=5):
+        for name, value in (
+            ("OnTime", on_time),
+            ("OffTim", off_time),
+            ("SyncDl", sync_delay),
+            ("NumRep", repetitions),
+        ):
+            self.mcu.write(f"2{name}={value}\n".encode())
+
+    def test_set_variable(self):
+        self.mcu.write(b"2Dut405=123\n")
+        self.assertEqual(self.mcu.variables["Dut405"], 123)
+
+    def test_set_variables(self):
+        self.mcu.write(b"5Res405=13,Dut405=3030\n")
+        self.assertEqual(self.mcu.variables, {"Res405": 13, "Dut405": 3030})
+        # ein unbekannter Name: nichts wird übernommen
+        self.mcu.write(b"5Dut405=1,Foobar=2\n")
+        self.assertEqual(self.mcu.variables["Dut405"], 3030)
+
+    def test_on_off(self):
+        self.mcu.write(b"1")
+        self.assertTrue(self.mcu.lasers_are_on)
+        self.mcu.write(b"0")
+        self.assertFalse(self.mcu.lasers_are_on)
+
+    def test_schedule(self):
+        self.upload_schedule(3)
+        self.mcu.write(b"4")
+
+        self.assertEqual(self.mcu.read(3), b"SSS")
+        self.assertEqual(self.mcu.read(1), b"E")
+        self.assertFalse(self.mcu.lasers_are_on)
+
+        # jede Wiederholung schaltet an und wieder aus, vor der nächsten. Die Zeitpunkte selbst werden nicht
+        # geprüft, unter Last (z. B. im ganzen Testlauf) verschieben sie sich um mehrere ms
+        self.assertEqual(
+            [event for _, event in self.mcu.events], ["on", "off"] * 3
+        )
+        times = [t for t, _ in self.mcu.events]
+        self.assertEqual(times, sorted(times))
+
+    def test_abort_schedule(self):
+        self.upload_schedule(1000)
+        self.mcu.write(b"4")
+        self.assertEqual(self.mcu.read(1), b"S")
+        self.mcu.write(b"0")
+        self.assertFalse(self.mcu.lasers_are_on)
+
+        self.mcu.reset_input_buffer()
+        time.sleep(0.05)
+        self.assertEqual(self.mcu.in_waiting, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
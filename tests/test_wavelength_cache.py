@@ -0,0 +1,31 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+import numpy as np
+from slay.wavelength_cache import WavelengthCache
+
+
+class TestWavelengthCache(unittest.TestCase):
+
+    def test_roundtrip_per_device(self):
+        wav = np.linspace(285.24, 1149.48, 2048)
+        with TemporaryDirectory() as tmp_dir:
+            cache = WavelengthCache(os.path.join(tmp_dir, "slay"))
+            self.assertIsNone(cache.load(42))
+
+            cache.save(42, wav)
+            cached_wav = cache.load(42)
+            self.assertIsNone(cache.load(7))
+
+        np.testing.assert_array_equal(cached_wav, wav)
+
+    def test_unreadable_file(self):
+        with TemporaryDirectory() as tmp_dir:
+            cache = WavelengthCache(tmp_dir)
+            with open(cache.path(1), "wb") as f:
+                f.write(b"kaputt")
+            self.assertIsNone(cache.load(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
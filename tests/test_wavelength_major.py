@@ -0,0 +1,47 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+import numpy as np
+from slay.wavelength_major import WavelengthMajor
+
+
+class TestWavelengthMajor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "messung" + WavelengthMajor.FILE_SUFFIX)
+        rng = np.random.default_rng(0)
+        self.measurements = rng.integers(0, 65535, size=(2, 7, 16)).astype(np.uint16)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_series_and_band(self):
+        # kleine Blöcke, damit auch der letzte, unvollständige Block geprüft wird
+        wavelength_major = WavelengthMajor.write(self.path, self.measurements, block_rows=3)
+
+        self.assertEqual(wavelength_major.num_pixels, 16)
+        self.assertEqual(wavelength_major.data.dtype, np.uint16)
+        for pixel in (0, 5, 15):
+            np.testing.assert_array_equal(
+                wavelength_major.series(pixel), self.measurements[:, :, pixel]
+            )
+        np.testing.assert_array_equal(
+            wavelength_major.band(4, 9),
+            self.measurements[:, :, 4:9].sum(axis=-1, dtype=float),
+        )
+
+    def test_reads_from_memmap_source(self):
+        source_path = os.path.join(self.tmp_dir.name, "messung-measurements.npy")
+        np.save(source_path, self.measurements)
+        source = np.load(source_path, mmap_mode="r")
+
+        WavelengthMajor.write(self.path, source)
+        loaded = WavelengthMajor(self.path)
+        np.testing.assert_array_equal(loaded.series(3), self.measurements[:, :, 3])
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+        del source, loaded
+
+
+if __name__ == "__main__":
+    unittest.main()